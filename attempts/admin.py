@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Attempt, Answer
+from .models import Attempt, Answer, LeaderboardEntry
 
 
 class AnswerInline(admin.TabularInline):
@@ -23,3 +23,10 @@ class AnswerAdmin(admin.ModelAdmin):
     list_filter = ('attempt__exam', 'created_at')
     search_fields = ('attempt__student__username', 'question__text')
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'total_score', 'exams_taken', 'average_percentage', 'updated_at')
+    search_fields = ('student__username',)
+    readonly_fields = ('student', 'total_score', 'exams_taken', 'average_percentage', 'updated_at')
@@ -0,0 +1,170 @@
+"""Optional write-behind buffer for answer selections.
+
+With ``ANSWER_WRITE_BEHIND`` enabled, answer saves are written to the Django
+cache (one entry per attempt) instead of updating ``attempts_answer`` on every
+click. Buffered answers reach the database when:
+
+- the attempt is finalized or scored (``Attempt.finalize``/``calculate_score``),
+- ``manage.py flush_answer_buffers`` runs its periodic checkpoint, or
+- a save finds the buffer older than ``ANSWER_WRITE_BEHIND_MAX_LAG`` seconds
+  or holding more than ``ANSWER_WRITE_BEHIND_MAX_PENDING`` answers, in which
+  case that request flushes inline.
+
+The two limits bound how much work a cache loss can cost. The buffer has to
+live in a cache shared by every worker and the checkpoint command, for
+example the file-based, database or memcached backends. The per-process
+locmem cache is only suitable for a single process and for tests.
+
+Every read-modify-write of an attempt's buffer, and every flush from reading
+the buffer to removing what was written, runs under a per-attempt lock taken
+with ``cache.add`` (atomic on all shared backends). Concurrent saves of the
+same attempt therefore never overwrite each other's answers, and a flush
+never drops an answer buffered while it was writing.
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _setting(name, default):
+    """Read an ANSWER_WRITE_BEHIND_* tuning knob from settings."""
+    return getattr(settings, f'ANSWER_WRITE_BEHIND_{name}', default)
+
+
+def is_enabled():
+    """Whether answer saves go through the write-behind buffer."""
+    return bool(getattr(settings, 'ANSWER_WRITE_BEHIND', False))
+
+
+def _key(attempt_id):
+    return f'answer-buffer:{attempt_id}'
+
+
+def _lock_key(attempt_id):
+    return f'answer-buffer-lock:{attempt_id}'
+
+
+class BufferLockTimeout(Exception):
+    """Another request held an attempt's buffer lock for too long."""
+
+
+@contextmanager
+def _locked(attempt_id):
+    """Hold the attempt's buffer lock for the duration of the block.
+
+    The lock expires after ``ANSWER_WRITE_BEHIND_LOCK_TIMEOUT`` seconds so a
+    crashed worker cannot block the attempt for good. Waiting longer than
+    ``ANSWER_WRITE_BEHIND_LOCK_WAIT`` seconds raises ``BufferLockTimeout``.
+    """
+    key = _lock_key(attempt_id)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + _setting('LOCK_WAIT', 5)
+    while not cache.add(key, token, _setting('LOCK_TIMEOUT', 30)):
+        if time.monotonic() >= deadline:
+            raise BufferLockTimeout(f'Answer buffer of attempt {attempt_id} is busy')
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        # Do not release a lock that expired and was taken by someone else
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def get_buffer(attempt_id):
+    """Return the raw buffer dict for an attempt, or None."""
+    return cache.get(_key(attempt_id))
+
+
+def buffered_selections(attempt):
+    """Return ``{question_id: choice_id}`` for answers not yet flushed."""
+    buffer = get_buffer(attempt.pk) if is_enabled() else None
+    if not buffer:
+        return {}
+    return {question_id: choice_id for question_id, (choice_id, _) in buffer['answers'].items()}
+
+
+def acknowledged_seq(attempt):
+    """Highest client sequence accepted so far, buffered or persisted."""
+    buffer = get_buffer(attempt.pk) if is_enabled() else None
+    return max(attempt.last_answer_seq, buffer['seq'] if buffer else 0)
+
+
+def buffer_answers(attempt, selections, seq=0, change_seqs=None):
+    """Record answer selections in the cache.
+
+    Takes the same arguments as ``Attempt.apply_answer_batch`` and returns
+    ``(acknowledged_seq, answers_buffered)``. Changes at or below the
+    acknowledged sequence, or older than the buffered change of the same
+    question, are skipped; ``apply_answer_batch`` checks the sequences again
+    against the database when the buffer is flushed. Flushes inline when the
+    buffer exceeds the configured lag or size.
+    """
+    change_seqs = change_seqs or {}
+    with _locked(attempt.pk):
+        now = time.time()
+        buffer = get_buffer(attempt.pk) or {'first_at': now, 'seq': 0, 'answers': {}}
+        acknowledged = max(attempt.last_answer_seq, buffer['seq'])
+        buffered = 0
+        for question_id, choice_id in selections.items():
+            change_seq = change_seqs.get(question_id, 0)
+            if change_seq and (change_seq <= acknowledged or change_seq < buffer['answers'].get(question_id, (None, 0))[1]):
+                continue
+            buffer['answers'][question_id] = (choice_id, change_seq)
+            buffered += 1
+        buffer['seq'] = max(buffer['seq'], seq)
+        cache.set(_key(attempt.pk), buffer, _setting('CACHE_TIMEOUT', 86400))
+
+        too_old = now - buffer['first_at'] >= _setting('MAX_LAG', 30)
+        too_big = len(buffer['answers']) > _setting('MAX_PENDING', 50)
+        if too_old or too_big:
+            _flush_locked(attempt, buffer)
+
+    return max(attempt.last_answer_seq, buffer['seq']), buffered
+
+
+def _flush_locked(attempt, buffer):
+    """Write ``buffer`` to the database and drop it; the caller holds the lock."""
+    if not buffer or not buffer['answers']:
+        return 0, 0.0
+    lag = time.time() - buffer['first_at']
+    selections = {question_id: choice_id for question_id, (choice_id, _) in buffer['answers'].items()}
+    change_seqs = {question_id: change_seq for question_id, (_, change_seq) in buffer['answers'].items() if change_seq}
+    attempt.apply_answer_batch(selections, seq=buffer['seq'], change_seqs=change_seqs)
+    cache.delete(_key(attempt.pk))
+    return len(selections), lag
+
+
+def flush_buffered_answers(attempt):
+    """Write an attempt's buffered answers to the database.
+
+    Returns ``(answers_flushed, lag_seconds)``. Saves of the same attempt
+    wait until the buffer has been written and removed.
+    """
+    with _locked(attempt.pk):
+        return _flush_locked(attempt, get_buffer(attempt.pk))
+
+
+def flush_many(attempts):
+    """Flush the buffers of many attempts, skipping empty ones in one cache round trip.
+
+    Returns ``(attempts_flushed, answers_flushed, max_lag_seconds)``.
+    """
+    attempts = list(attempts)
+    pending = cache.get_many([_key(attempt.pk) for attempt in attempts])
+    flushed_attempts = flushed_answers = 0
+    max_lag = 0.0
+    for attempt in attempts:
+        if _key(attempt.pk) not in pending:
+            continue
+        # Re-read under the lock: the prefetched copy may miss newer saves
+        count, lag = flush_buffered_answers(attempt)
+        if count:
+            flushed_attempts += 1
+            flushed_answers += count
+            max_lag = max(max_lag, lag)
+    return flushed_attempts, flushed_answers, max_lag
@@ -0,0 +1,74 @@
+"""Bulk finalization of attempts whose stored deadline has passed.
+
+Used by the ``expire_attempts`` management command so that abandoned
+attempts get scored without waiting for the student to load a page.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from exams.email_utils import send_exam_completed_email
+from exams.rankings import invalidate_exam_results
+from results.models import AttemptResult
+from . import buffer as answer_buffer
+from .locking import retry_on_lock
+from .models import Attempt, LeaderboardEntry
+
+
+@retry_on_lock
+def finalize_expired_attempts(batch_size=500, now=None, send_emails=True):
+    """Finalize one batch of expired, unsubmitted attempts.
+
+    Attempts are picked in deadline order through the partial index on open
+    attempts and finalized by one set-based UPDATE that also computes their
+    scores, guarded by ``is_submitted = false`` like ``Attempt.finalize()``.
+    Their result snapshots are written in the same transaction, and only
+    the attempts this call actually finalized get snapshots, leaderboard
+    refreshes and emails; ones a concurrent ``finalize()`` won are left to it.
+    Returns ``(picked, finalized)``. Callers keep calling until ``picked`` is
+    0: a batch that lost some attempts to concurrent submits finalizes fewer
+    than it picked even though more expired attempts may be waiting.
+    """
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        ids = list(
+            Attempt.objects.select_for_update(skip_locked=True)
+            .filter(is_submitted=False, deadline__lte=now)
+            .order_by('deadline', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, 0
+        picked = len(ids)
+
+        if answer_buffer.is_enabled():
+            answer_buffer.flush_many(Attempt.objects.filter(id__in=ids))
+
+        # SQLite ignores FOR UPDATE, so a submit may have finalized some of
+        # these since they were picked. A no-op UPDATE takes the write lock;
+        # the attempts still open after it are the ones this call finalizes.
+        Attempt.objects.filter(id__in=ids, is_submitted=False).update(is_submitted=False)
+        ids = list(Attempt.objects.filter(id__in=ids, is_submitted=False).values_list('id', flat=True))
+        if not ids:
+            return picked, 0
+
+        score, correct_count = Attempt.score_expressions()
+        finalized = Attempt.objects.filter(id__in=ids, is_submitted=False).update(
+            is_submitted=True,
+            # The student ran out of time at the deadline, not when we noticed
+            end_time=F('deadline'),
+            score=score,
+            correct_count=correct_count,
+        )
+        attempts = list(Attempt.objects.filter(id__in=ids).select_related('student', 'exam__category'))
+        AttemptResult.capture(attempts)
+        LeaderboardEntry.refresh_students(attempt.student_id for attempt in attempts)
+        invalidate_exam_results(attempt.exam_id for attempt in attempts)
+
+    if send_emails:
+        for attempt in attempts:
+            send_exam_completed_email(attempt)
+
+    return picked, finalized
@@ -0,0 +1,49 @@
+"""Bounded retry of writes that hit SQLite's "database is locked".
+
+SQLite allows one writer at a time. When a burst of answer saves outlasts the
+busy timeout, the losing request gets an OperationalError. ``retry_on_lock``
+re-runs the wrapped write a few times with jittered exponential backoff
+(``DB_LOCK_RETRIES``, ``DB_LOCK_RETRY_BACKOFF``) before letting it surface.
+
+Only whole transactions are retried: inside an outer ``atomic()`` block the
+error is re-raised at once, since the transaction is already broken and
+must be retried by whoever opened it.
+"""
+
+import random
+import sqlite3
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def is_lock_error(exc):
+    return isinstance(exc, (OperationalError, sqlite3.OperationalError)) and any(
+        message in str(exc) for message in LOCK_MESSAGES
+    )
+
+
+def backoff_delays(retries=None, base=None):
+    """Sleep times before each retry: base, 2*base, 4*base, ... each +/-50%."""
+    retries = getattr(settings, 'DB_LOCK_RETRIES', 4) if retries is None else retries
+    base = getattr(settings, 'DB_LOCK_RETRY_BACKOFF', 0.05) if base is None else base
+    return [base * 2 ** number * random.uniform(0.5, 1.5) for number in range(retries)]
+
+
+def retry_on_lock(func):
+    """Decorator: retry ``func`` while it fails with a lock error."""
+    @wraps(func)
+    def inner(*args, **kwargs):
+        delays = backoff_delays()
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except (OperationalError, sqlite3.OperationalError) as exc:
+                if not delays or not is_lock_error(exc) or connection.in_atomic_block:
+                    raise
+            time.sleep(delays.pop(0))
+    return inner
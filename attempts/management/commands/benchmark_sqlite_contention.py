@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from attempts.locking import backoff_delays, is_lock_error
+
+SCHEMA = [
+    'CREATE TABLE attempt (id INTEGER PRIMARY KEY, is_submitted INTEGER NOT NULL DEFAULT 0, last_answer_seq INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE answer (id INTEGER PRIMARY KEY, attempt_id INTEGER NOT NULL, question_id INTEGER NOT NULL, '
+    'choice_id INTEGER, updated_at REAL NOT NULL, UNIQUE (attempt_id, question_id))',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare answer-save throughput on SQLite with the default configuration and with '
+        'the SQLITE_HIGH_CONCURRENCY profile (WAL, BEGIN IMMEDIATE, lock retry)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=16, help='Threads saving answers, one attempt each')
+        parser.add_argument('--readers', type=int, default=4, help='Threads reading answer sheets, like page loads')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+        parser.add_argument('--questions', type=int, default=50, help='Questions per attempt')
+
+    def handle(self, *args, **options):
+        for mode in ('default', 'profile'):
+            with tempfile.TemporaryDirectory() as directory:
+                result = self.run_mode(mode, os.path.join(directory, 'bench.sqlite3'), options)
+            self.stdout.write(
+                f"{mode:>8}: {result['writes']} saves ({result['writes'] / options['seconds']:.0f}/s), "
+                f"{result['failed']} failed with 'database is locked', {result['retries']} retried, "
+                f"save latency p50 {result['p50']:.2f} ms / p95 {result['p95']:.2f} ms, "
+                f"{result['reads'] / options['seconds']:.0f} reads/s"
+            )
+
+    def connect(self, mode, path):
+        if mode == 'default':
+            # Django's defaults: rollback journal, 5 second busy timeout, deferred transactions
+            conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(path, timeout=settings.SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+            for pragma in settings.SQLITE_CONCURRENCY_PRAGMAS:
+                conn.execute(pragma)
+        return conn
+
+    def run_mode(self, mode, path, options):
+        conn = self.connect(mode, path)
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.executemany('INSERT INTO attempt (id) VALUES (?)', [(i,) for i in range(options['writers'])])
+        conn.close()
+
+        begin = 'BEGIN' if mode == 'default' else 'BEGIN IMMEDIATE'
+        stop = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        totals = {'writes': 0, 'failed': 0, 'retries': 0, 'reads': 0, 'latencies': []}
+
+        def save_answers(attempt_id):
+            db = self.connect(mode, path)
+            writes = failed = retries = 0
+            latencies = []
+            seq = 0
+            while time.monotonic() < stop:
+                seq += 1
+                started = time.perf_counter()
+                delays = backoff_delays() if mode == 'profile' else []
+                while True:
+                    try:
+                        # The answer-save transaction: read the attempt, upsert the answer, advance its sequence
+                        db.execute(begin)
+                        db.execute('SELECT is_submitted FROM attempt WHERE id = ?', (attempt_id,)).fetchone()
+                        db.execute(
+                            'INSERT INTO answer (attempt_id, question_id, choice_id, updated_at) VALUES (?, ?, ?, ?) '
+                            'ON CONFLICT (attempt_id, question_id) DO UPDATE SET choice_id = excluded.choice_id, updated_at = excluded.updated_at',
+                            (attempt_id, seq % options['questions'], seq, time.time()),
+                        )
+                        db.execute('UPDATE attempt SET last_answer_seq = MAX(last_answer_seq, ?) WHERE id = ?', (seq, attempt_id))
+                        db.execute('COMMIT')
+                        writes += 1
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        break
+                    except sqlite3.OperationalError as exc:
+                        if db.in_transaction:
+                            db.execute('ROLLBACK')
+                        if not is_lock_error(exc):
+                            raise
+                        if not delays:
+                            failed += 1
+                            break
+                        retries += 1
+                        time.sleep(delays.pop(0))
+            db.close()
+            with lock:
+                totals['writes'] += writes
+                totals['failed'] += failed
+                totals['retries'] += retries
+                totals['latencies'] += latencies
+
+        def read_answers(reader_id):
+            db = self.connect(mode, path)
+            reads = 0
+            while time.monotonic() < stop:
+                try:
+                    db.execute('SELECT question_id, choice_id FROM answer WHERE attempt_id = ?', (reads % options['writers'],)).fetchall()
+                    reads += 1
+                except sqlite3.OperationalError as exc:
+                    if not is_lock_error(exc):
+                        raise
+            db.close()
+            with lock:
+                totals['reads'] += reads
+
+        threads = [threading.Thread(target=save_answers, args=(i,)) for i in range(options['writers'])]
+        threads += [threading.Thread(target=read_answers, args=(i,)) for i in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        latencies = sorted(totals['latencies']) or [0]
+        totals['p50'] = statistics.median(latencies)
+        totals['p95'] = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        return totals
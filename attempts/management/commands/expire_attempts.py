@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from attempts.expiry import finalize_expired_attempts
+
+
+class Command(BaseCommand):
+    help = 'Finalize and score attempts whose deadline has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Attempts finalized per transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds to sleep between sweeps in --loop mode')
+        parser.add_argument('--no-email', action='store_true', help='Do not send completion emails')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        send_emails = not options['no_email']
+
+        while True:
+            total = 0
+            while True:
+                picked, finalized = finalize_expired_attempts(batch_size=batch_size, send_emails=send_emails)
+                total += finalized
+                if not picked:
+                    break
+
+            if total or not options['loop']:
+                self.stdout.write(f'Finalized {total} expired attempt(s)')
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
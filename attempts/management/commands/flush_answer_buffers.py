@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from attempts import buffer as answer_buffer
+from attempts.models import Attempt
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint write-behind answer buffers from the cache into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Open attempts looked up per cache round trip')
+        parser.add_argument('--loop', action='store_true', help='Keep running, checkpointing every --interval seconds')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between checkpoints in --loop mode')
+
+    def handle(self, *args, **options):
+        if not answer_buffer.is_enabled():
+            self.stdout.write('ANSWER_WRITE_BEHIND is disabled; answers are already written directly')
+            return
+
+        batch_size = options['batch_size']
+
+        while True:
+            started = time.monotonic()
+            totals = [0, 0, 0.0]
+            batch = []
+            open_attempts = Attempt.objects.filter(is_submitted=False).only('id', 'last_answer_seq')
+            for attempt in open_attempts.iterator(chunk_size=batch_size):
+                batch.append(attempt)
+                if len(batch) >= batch_size:
+                    self._flush(batch, totals)
+                    batch = []
+            if batch:
+                self._flush(batch, totals)
+
+            self.stdout.write(
+                f'Flushed {totals[1]} answer(s) for {totals[0]} attempt(s) in '
+                f'{time.monotonic() - started:.2f}s; max lag {totals[2]:.1f}s'
+            )
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _flush(self, batch, totals):
+        attempts, answers, max_lag = answer_buffer.flush_many(batch)
+        totals[0] += attempts
+        totals[1] += answers
+        totals[2] = max(totals[2], max_lag)
@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attempts.provisioning import provision_attempts
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = 'Create unstarted attempts and answer rows for a roster before an exam opens'
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--group', default='Student', help='Provision every active member of this group (default: Student)')
+        parser.add_argument('--usernames-file', help='Provision the usernames listed one per line in this file instead of a group')
+        parser.add_argument('--batch-size', type=int, default=500, help='Students provisioned per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            exam = Exam.objects.get(pk=options['exam_id'])
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {options['exam_id']} does not exist")
+
+        students = User.objects.filter(is_active=True)
+        if options['usernames_file']:
+            with open(options['usernames_file']) as fh:
+                usernames = {line.strip() for line in fh if line.strip()}
+            students = students.filter(username__in=usernames)
+            missing = usernames - set(students.values_list('username', flat=True))
+            if missing:
+                self.stderr.write(f"Unknown username(s) skipped: {', '.join(sorted(missing))}")
+        else:
+            students = students.filter(groups__name=options['group'])
+
+        if exam.start_time <= timezone.now():
+            self.stderr.write('Warning: this exam has already opened')
+
+        student_ids = students.order_by('pk').values_list('pk', flat=True)
+        attempts, answers = provision_attempts(exam, student_ids, batch_size=options['batch_size'])
+        self.stdout.write(f'Provisioned {attempts} attempt(s) and {answers} answer row(s) for "{exam.title}"')
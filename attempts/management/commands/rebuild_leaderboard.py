@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from attempts.models import Attempt, LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized global leaderboard from submitted attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Students recomputed per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        student_ids = list(
+            Attempt.objects.filter(is_submitted=True).values_list('student_id', flat=True).distinct().order_by('student_id')
+        )
+        # Entries of students without submitted attempts any more
+        stale = LeaderboardEntry.objects.exclude(student_id__in=User.objects.filter(attempts__is_submitted=True)).delete()[0]
+
+        total = 0
+        for start in range(0, len(student_ids), batch_size):
+            total += LeaderboardEntry.refresh_students(student_ids[start:start + batch_size])
+        self.stdout.write(f'Rebuilt {total} leaderboard entr{"y" if total == 1 else "ies"}, removed {stale} stale')
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:57
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_deadlines(apps, schema_editor):
+    Attempt = apps.get_model('attempts', 'Attempt')
+    batch = []
+    for attempt in Attempt.objects.filter(deadline__isnull=True).select_related('exam').iterator(chunk_size=1000):
+        attempt.deadline = attempt.start_time + datetime.timedelta(minutes=attempt.exam.duration_minutes)
+        batch.append(attempt)
+        if len(batch) >= 1000:
+            Attempt.objects.bulk_update(batch, ['deadline'])
+            batch = []
+    if batch:
+        Attempt.objects.bulk_update(batch, ['deadline'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attempts', '0001_initial'),
+        ('exams', '0005_question_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='deadline',
+            field=models.DateTimeField(blank=True, help_text='start_time + exam duration, stored so expiry checks never join to Exam', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(condition=models.Q(('is_submitted', False)), fields=['deadline'], name='attempt_open_deadline_idx'),
+        ),
+        migrations.RunPython(backfill_deadlines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:03
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_correct_count(apps, schema_editor):
+    Attempt = apps.get_model('attempts', 'Attempt')
+    Answer = apps.get_model('attempts', 'Answer')
+    correct = (
+        Answer.objects.filter(attempt=models.OuterRef('pk'), selected_choice__is_correct=True)
+        .values('attempt')
+        .annotate(total=models.Count('id'))
+        .values('total')
+    )
+    Attempt.objects.filter(is_submitted=True).update(correct_count=Coalesce(models.Subquery(correct), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attempts', '0002_attempt_deadline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='correct_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_correct_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attempts', '0003_attempt_correct_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='last_answer_seq',
+            field=models.PositiveBigIntegerField(default=0, help_text='Highest client sequence number applied by the batch answer sync'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attempts', '0004_attempt_last_answer_seq'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attempt',
+            name='start_time',
+            field=models.DateTimeField(blank=True, help_text='Empty until the student starts a pre-provisioned attempt', null=True),
+        ),
+    ]
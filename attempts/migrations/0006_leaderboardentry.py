@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Greatest
+
+
+def backfill_leaderboard(apps, schema_editor):
+    Attempt = apps.get_model('attempts', 'Attempt')
+    LeaderboardEntry = apps.get_model('attempts', 'LeaderboardEntry')
+    percentage = models.ExpressionWrapper(
+        models.F('score') * 100.0 / Greatest(models.F('exam__total_marks'), 1),
+        output_field=models.FloatField(),
+    )
+    rows = (
+        Attempt.objects.filter(is_submitted=True)
+        .values('student_id')
+        .annotate(total_score=models.Sum('score'), exams_taken=models.Count('id'), average_percentage=models.Avg(percentage))
+        .order_by()
+    )
+    LeaderboardEntry.objects.bulk_create(
+        [
+            LeaderboardEntry(
+                student_id=row['student_id'],
+                total_score=row['total_score'] or 0,
+                exams_taken=row['exams_taken'],
+                average_percentage=round(row['average_percentage'] or 0, 2),
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attempts', '0005_attempt_start_time_nullable'),
+        ('exams', '0008_exam_question_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_score', models.PositiveIntegerField(default=0)),
+                ('exams_taken', models.PositiveIntegerField(default=0)),
+                ('average_percentage', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_score', '-average_percentage', 'student'], name='leaderboard_rank_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
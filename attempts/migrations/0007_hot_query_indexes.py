@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attempts', '0006_leaderboardentry'),
+        ('exams', '0013_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(condition=models.Q(('is_submitted', True)), fields=['exam', '-score'], name='attempt_exam_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['student', '-end_time'], name='attempt_student_recent_idx'),
+        ),
+    ]
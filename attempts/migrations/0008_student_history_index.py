@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attempts', '0007_hot_query_indexes'),
+        ('exams', '0013_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['student', '-created_at', '-id'], name='attempt_student_history_idx'),
+        ),
+    ]
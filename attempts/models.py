@@ -1,53 +1,223 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 from exams.models import Exam, Question, Choice
+from exams.rankings import invalidate_exam_results
+from . import buffer as answer_buffer
+from .locking import retry_on_lock
 
 
 class Attempt(models.Model):
     """Model for storing student exam attempts"""
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attempts')
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='attempts')
-    start_time = models.DateTimeField()
+    start_time = models.DateTimeField(null=True, blank=True, help_text="Empty until the student starts a pre-provisioned attempt")
     end_time = models.DateTimeField(null=True, blank=True)
     is_submitted = models.BooleanField(default=False)
     score = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    last_answer_seq = models.PositiveBigIntegerField(default=0, help_text="Highest client sequence number applied by the batch answer sync")
+    deadline = models.DateTimeField(null=True, blank=True, help_text="start_time + exam duration, stored so expiry checks never join to Exam")
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Keyset ordering of the profile's exam history; the last key is unique
+    HISTORY_ORDER = ('-created_at', '-id')
     
     class Meta:
         unique_together = ('student', 'exam')  # One attempt per exam per student
+        indexes = [
+            # Range scan used by the expiry sweeper over open attempts only
+            models.Index(fields=['deadline'], name='attempt_open_deadline_idx', condition=models.Q(is_submitted=False)),
+            # Exam leaderboards and score distributions: submitted attempts by score
+            models.Index(fields=['exam', '-score'], name='attempt_exam_rank_idx', condition=models.Q(is_submitted=True)),
+            # Dashboard "recent attempts" of one student
+            models.Index(fields=['student', '-end_time'], name='attempt_student_recent_idx'),
+            # Profile exam history, keyset-paginated in HISTORY_ORDER
+            models.Index(fields=['student', '-created_at', '-id'], name='attempt_student_history_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.exam.title}"
+
+    @classmethod
+    def recent_for(cls, student, limit=5):
+        """The student's latest started attempts, for the dashboard"""
+        return (
+            cls.objects.filter(student=student, start_time__isnull=False)
+            .select_related('exam')
+            .order_by('-end_time', '-start_time')[:limit]
+        )
+
+    @classmethod
+    def history_for(cls, student):
+        """The student's started attempts, to be paginated in ``HISTORY_ORDER``"""
+        return cls.objects.filter(student=student, start_time__isnull=False).select_related('exam', 'result')
+
+    def save(self, *args, **kwargs):
+        if self.start_time and self.deadline is None:
+            self.deadline = self.compute_deadline()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'deadline'}
+        super().save(*args, **kwargs)
+
+    def has_started(self):
+        """Pre-provisioned attempts exist before the student clicks start"""
+        return self.start_time is not None
+
+    @classmethod
+    def start(cls, student, exam, now=None):
+        """Start (or resume) a student's attempt and make sure it has answer rows.
+
+        Safe to call concurrently: the attempt is created with get_or_create and
+        a pre-provisioned attempt only has its clock stamped, once.
+        """
+        now = now or timezone.now()
+        deadline = now + timezone.timedelta(minutes=exam.duration_minutes)
+        attempt, created = cls.objects.get_or_create(
+            student=student,
+            exam=exam,
+            defaults={'start_time': now, 'deadline': deadline},
+        )
+        if not created and attempt.start_time is None:
+            # Pre-provisioned: the answer rows already exist, only stamp the clock
+            if cls.objects.filter(pk=attempt.pk, start_time__isnull=True).update(start_time=now, deadline=deadline):
+                attempt.start_time, attempt.deadline = now, deadline
+            else:
+                attempt.refresh_from_db(fields=['start_time', 'deadline'])
+        elif created:
+            Answer.objects.bulk_create(
+                [Answer(attempt=attempt, question_id=question_id) for question_id in exam.questions.values_list('id', flat=True)],
+                ignore_conflicts=True,
+            )
+        return attempt
+
+    def compute_deadline(self):
+        """Return the moment this attempt runs out of time"""
+        return self.start_time + timezone.timedelta(minutes=self.exam.duration_minutes)
     
     def is_expired(self):
-        """Check if attempt has expired based on exam duration"""
-        if not self.start_time:
+        """Check if attempt has expired based on the stored deadline"""
+        if not self.deadline:
             return False
-        expected_end_time = self.start_time + timezone.timedelta(minutes=self.exam.duration_minutes)
-        return timezone.now() > expected_end_time
+        return timezone.now() > self.deadline
     
     def time_remaining(self):
         """Get remaining time in seconds"""
-        if self.is_submitted:
+        if self.is_submitted or not self.deadline:
             return 0
-        expected_end_time = self.start_time + timezone.timedelta(minutes=self.exam.duration_minutes)
-        remaining = expected_end_time - timezone.now()
+        remaining = self.deadline - timezone.now()
         return max(0, int(remaining.total_seconds()))
     
+    @staticmethod
+    def score_expressions():
+        """Return (score, correct_count) expressions over an attempt's answers.
+
+        Both are correlated subqueries joining Answer -> Choice -> Question, so
+        they can be used in a single UPDATE or annotate() on Attempt.
+        """
+        correct = Answer.objects.filter(
+            attempt=models.OuterRef('pk'),
+            selected_choice__is_correct=True,
+        ).values('attempt')
+        score = models.Subquery(correct.annotate(total=models.Sum('question__marks')).values('total'))
+        correct_count = models.Subquery(correct.annotate(total=models.Count('id')).values('total'))
+        return Coalesce(score, 0), Coalesce(correct_count, 0)
+
     def calculate_score(self):
         """Calculate and update the score for this attempt"""
-        correct_answers = 0
-        total_marks = 0
-        
-        for answer in self.answers.all():
-            if answer.selected_choice and answer.selected_choice.is_correct:
-                correct_answers += 1
-                total_marks += answer.question.marks
-        
-        self.score = total_marks
-        self.save()
-        return total_marks
+        if answer_buffer.is_enabled():
+            answer_buffer.flush_buffered_answers(self)
+        totals = Answer.objects.filter(attempt=self, selected_choice__is_correct=True).aggregate(
+            score=models.Sum('question__marks'),
+            correct=models.Count('id'),
+        )
+        self.score = totals['score'] or 0
+        self.correct_count = totals['correct']
+        self.save(update_fields=['score', 'correct_count'])
+        if self.is_submitted:
+            # results.models imports this module at load time
+            from results.models import AttemptResult
+            AttemptResult.capture([self], replace=True)
+            LeaderboardEntry.refresh_students([self.student_id])
+            invalidate_exam_results([self.exam_id])
+        return self.score
+
+    @retry_on_lock
+    def apply_answer_batch(self, selections, seq=0, change_seqs=None):
+        """Upsert many answers at once and advance the acknowledged sequence.
+
+        ``selections`` maps question ids to choice ids (or None to clear).
+        ``change_seqs`` optionally maps question ids to the client sequence of
+        their change; changes at or below the acknowledged sequence are stale
+        and skipped. The check runs with the attempt row locked, so an older
+        batch racing a newer one cannot overwrite it. All rows are written
+        with one INSERT ... ON CONFLICT DO UPDATE.
+
+        Returns ``(acknowledged_seq, answers_written)``, or None if the
+        attempt was already submitted and nothing was written.
+        """
+        with transaction.atomic():
+            # A no-op UPDATE locks the attempt (the row on PostgreSQL, the
+            # database on SQLite) before its sequence is read
+            if not Attempt.objects.filter(pk=self.pk, is_submitted=False).update(
+                last_answer_seq=models.F('last_answer_seq'),
+            ):
+                return None
+            acknowledged = Attempt.objects.values_list('last_answer_seq', flat=True).get(pk=self.pk)
+            if change_seqs:
+                selections = {
+                    question_id: choice_id
+                    for question_id, choice_id in selections.items()
+                    if change_seqs.get(question_id, acknowledged + 1) > acknowledged
+                }
+            if selections:
+                Answer.objects.bulk_create(
+                    [
+                        Answer(attempt=self, question_id=question_id, selected_choice_id=choice_id)
+                        for question_id, choice_id in selections.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['attempt', 'question'],
+                    update_fields=['selected_choice', 'updated_at'],
+                )
+            if seq > acknowledged:
+                Attempt.objects.filter(pk=self.pk).update(last_answer_seq=seq)
+            self.last_answer_seq = max(acknowledged, seq)
+        return self.last_answer_seq, len(selections)
+
+    @retry_on_lock
+    def finalize(self, end_time=None):
+        """Submit and score this attempt exactly once.
+
+        The score is computed inside the same conditional UPDATE that flips
+        ``is_submitted``, so concurrent submits cannot double-score. Returns
+        True only for the caller that actually finalized the attempt, which is
+        then responsible for side effects such as the completion email. The
+        winner also stores the attempt's ``AttemptResult`` snapshot, in the
+        same transaction, so a retried finalize never half-applies.
+        """
+        # results.models imports this module at load time
+        from results.models import AttemptResult
+
+        if answer_buffer.is_enabled():
+            answer_buffer.flush_buffered_answers(self)
+        score, correct_count = Attempt.score_expressions()
+        with transaction.atomic():
+            finalized = Attempt.objects.filter(pk=self.pk, is_submitted=False).update(
+                is_submitted=True,
+                end_time=end_time or timezone.now(),
+                score=score,
+                correct_count=correct_count,
+            )
+            self.refresh_from_db(fields=['is_submitted', 'end_time', 'score', 'correct_count'])
+            if finalized:
+                AttemptResult.capture([self])
+                LeaderboardEntry.refresh_students([self.student_id])
+        if finalized:
+            invalidate_exam_results([self.exam_id])
+        return bool(finalized)
 
 
 class Answer(models.Model):
@@ -63,3 +233,85 @@ class Answer(models.Model):
     
     def __str__(self):
         return f"{self.attempt.student.username} - {self.question.exam.title} - Q{self.question.id}"
+
+
+class LeaderboardEntry(models.Model):
+    """Materialized global leaderboard row, one per student with submitted attempts.
+
+    Rows are refreshed for the affected student whenever one of their attempts
+    is finalized, so the global leaderboard never aggregates attempt history
+    on a page view. ``manage.py rebuild_leaderboard`` recomputes every row.
+    """
+    student = models.OneToOneField(User, on_delete=models.CASCADE, related_name='leaderboard_entry')
+    total_score = models.PositiveIntegerField(default=0)
+    exams_taken = models.PositiveIntegerField(default=0)
+    average_percentage = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Rank order: total score, then average percentage, then the older account
+    RANK_ORDER = ('-total_score', '-average_percentage', 'student_id')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_score', '-average_percentage', 'student'], name='leaderboard_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.total_score}"
+
+    @classmethod
+    def ranked(cls):
+        return cls.objects.select_related('student').order_by(*cls.RANK_ORDER)
+
+    @classmethod
+    def refresh_students(cls, student_ids):
+        """Recompute the rows of the given students from their submitted attempts.
+
+        Only the listed students' attempts are read, and the result is written
+        with one upsert, so calling this twice for the same finalization is
+        harmless.
+        """
+        student_ids = set(student_ids)
+        if not student_ids:
+            return 0
+        percentage = models.ExpressionWrapper(
+            models.F('score') * 100.0 / Greatest(models.F('exam__total_marks'), 1),
+            output_field=models.FloatField(),
+        )
+        rows = (
+            Attempt.objects.filter(student_id__in=student_ids, is_submitted=True)
+            .values('student_id')
+            .annotate(
+                total_score=models.Sum('score'),
+                exams_taken=models.Count('id'),
+                average_percentage=models.Avg(percentage),
+            )
+            .order_by()
+        )
+        entries = [
+            cls(
+                student_id=row['student_id'],
+                total_score=row['total_score'] or 0,
+                exams_taken=row['exams_taken'],
+                average_percentage=round(row['average_percentage'] or 0, 2),
+            )
+            for row in rows
+        ]
+        cls.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=['total_score', 'exams_taken', 'average_percentage', 'updated_at'],
+        )
+        # Students whose submitted attempts were all removed drop off the board
+        cls.objects.filter(student_id__in=student_ids - {entry.student_id for entry in entries}).delete()
+        return len(entries)
+
+    def rank(self):
+        """1-based position on the leaderboard, answered by an indexed count"""
+        ahead = LeaderboardEntry.objects.filter(
+            models.Q(total_score__gt=self.total_score)
+            | models.Q(total_score=self.total_score, average_percentage__gt=self.average_percentage)
+            | models.Q(total_score=self.total_score, average_percentage=self.average_percentage, student_id__lt=self.student_id)
+        ).count()
+        return ahead + 1
@@ -0,0 +1,63 @@
+"""Bulk pre-provisioning of attempts ahead of an exam's start time.
+
+When a whole roster starts an exam at the same moment, creating each attempt
+and one answer row per question inside the start request turns the start
+click into the most write-heavy request of the exam. Provisioning creates
+those rows beforehand, in batches, so starting only has to stamp
+``start_time`` and ``deadline`` on an existing row (see ``Attempt.start``).
+"""
+
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Attempt, Answer
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def provision_attempts(exam, student_ids, batch_size=500):
+    """Create unstarted attempts and blank answers for a roster of students.
+
+    Students who already have an attempt are left alone, and answers that
+    already exist are skipped, so the function can be re-run after questions
+    are added or the roster grows. Returns ``(attempts_created, answers_created)``
+    counted from the rows that did not exist before.
+    """
+    question_ids = list(exam.questions.values_list('id', flat=True))
+    attempts_created = answers_created = 0
+
+    for chunk in _chunked(student_ids, batch_size):
+        with transaction.atomic():
+            existing = set(
+                Attempt.objects.filter(exam=exam, student_id__in=chunk).values_list('student_id', flat=True)
+            )
+            Attempt.objects.bulk_create(
+                [Attempt(exam=exam, student_id=student_id) for student_id in chunk if student_id not in existing],
+                ignore_conflicts=True,
+            )
+            attempts_created += len(set(chunk) - existing)
+
+            # Only unstarted attempts are topped up; started ones create their
+            # own answer rows as the student works through the exam
+            attempt_ids = list(
+                Attempt.objects.filter(exam=exam, student_id__in=chunk, start_time__isnull=True)
+                .values_list('id', flat=True)
+            )
+            answered = set(
+                Answer.objects.filter(attempt_id__in=attempt_ids).values_list('attempt_id', 'question_id')
+            )
+            new_answers = [
+                Answer(attempt_id=attempt_id, question_id=question_id)
+                for attempt_id in attempt_ids
+                for question_id in question_ids
+                if (attempt_id, question_id) not in answered
+            ]
+            Answer.objects.bulk_create(new_answers, batch_size=batch_size, ignore_conflicts=True)
+            answers_created += len(new_answers)
+
+    return attempts_created, answers_created
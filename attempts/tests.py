@@ -1,10 +1,23 @@
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, skipUnlessDBFeature
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db import IntegrityError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from io import StringIO
+from unittest import mock
+import json
+import threading
+import time
 
-from exams.models import Exam
-from .models import Attempt
+from exams.models import Exam, Question, Choice
+from .models import Attempt, Answer
+from . import buffer as answer_buffer
+from .buffer import buffered_selections
+from .expiry import finalize_expired_attempts
+from .locking import retry_on_lock
 
 
 class AttemptModelTests(TestCase):
@@ -46,3 +59,387 @@ class AttemptModelTests(TestCase):
 		)
 		self.assertEqual(attempt.time_remaining(), 0)
 
+	def test_deadline_stored_on_create(self):
+		now = timezone.now()
+		attempt = Attempt.objects.create(student=self.user, exam=self.exam, start_time=now)
+		self.assertEqual(attempt.deadline, now + timezone.timedelta(minutes=30))
+
+		attempt = Attempt.objects.get(pk=attempt.pk)
+		with self.assertNumQueries(0):
+			self.assertFalse(attempt.is_expired())
+			self.assertGreater(attempt.time_remaining(), 0)
+
+	def test_duration_change_restamps_open_attempts(self):
+		now = timezone.now()
+		attempt = Attempt.objects.create(student=self.user, exam=self.exam, start_time=now)
+		self.exam.duration_minutes = 60
+		self.exam.save()
+		self.exam.sync_attempt_deadlines()
+
+		attempt.refresh_from_db()
+		self.assertEqual(attempt.deadline, now + timezone.timedelta(minutes=60))
+
+
+class ExpireAttemptsCommandTests(TestCase):
+	def setUp(self):
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Sweep Test",
+			description="",
+			duration_minutes=10,
+			start_time=now - timezone.timedelta(hours=1),
+			end_time=now + timezone.timedelta(hours=1),
+			is_published=True,
+		)
+		question = Question.objects.create(exam=self.exam, text="Q1", marks=3)
+		self.correct = Choice.objects.create(question=question, text="A", is_correct=True)
+
+		self.expired = []
+		for i in range(3):
+			user = User.objects.create_user(username=f"expired{i}", password="test123")
+			attempt = Attempt.objects.create(student=user, exam=self.exam, start_time=now - timezone.timedelta(minutes=20))
+			Answer.objects.create(attempt=attempt, question=question, selected_choice=self.correct if i == 0 else None)
+			self.expired.append(attempt)
+
+		user = User.objects.create_user(username="running", password="test123")
+		self.running = Attempt.objects.create(student=user, exam=self.exam, start_time=now)
+
+	def test_sweeper_finalizes_only_expired_attempts(self):
+		out = StringIO()
+		call_command('expire_attempts', '--batch-size', '2', '--no-email', stdout=out)
+		self.assertIn('Finalized 3 expired attempt(s)', out.getvalue())
+
+		for attempt in self.expired:
+			attempt.refresh_from_db()
+			self.assertTrue(attempt.is_submitted)
+			self.assertEqual(attempt.end_time, attempt.deadline)
+		self.assertEqual(self.expired[0].score, 3)
+		self.assertEqual(self.expired[1].score, 0)
+
+		self.running.refresh_from_db()
+		self.assertFalse(self.running.is_submitted)
+
+	@override_settings(ANSWER_WRITE_BEHIND=True)
+	def test_attempt_submitted_meanwhile_gets_no_side_effects(self):
+		def student_submits(attempts):
+			# The student's own submit wins the race after the sweeper picked the ids
+			Attempt.objects.get(pk=self.expired[0].pk).finalize()
+			return 0, 0, 0.0
+
+		with mock.patch('attempts.expiry.answer_buffer.flush_many', side_effect=student_submits), \
+				mock.patch('attempts.expiry.send_exam_completed_email') as send_email, \
+				mock.patch('attempts.expiry.LeaderboardEntry.refresh_students') as refresh:
+			self.assertEqual(finalize_expired_attempts(), (3, 2))
+
+		emailed = sorted(call.args[0].pk for call in send_email.call_args_list)
+		self.assertEqual(emailed, sorted(attempt.pk for attempt in self.expired[1:]))
+		self.assertEqual(sorted(refresh.call_args.args[0]), sorted(attempt.student_id for attempt in self.expired[1:]))
+		self.expired[0].refresh_from_db()
+		self.assertNotEqual(self.expired[0].end_time, self.expired[0].deadline)
+
+	@override_settings(ANSWER_WRITE_BEHIND=True)
+	def test_sweep_continues_past_batch_shortened_by_submit(self):
+		def student_submits(attempts):
+			attempts = list(attempts)
+			if self.expired[0] in attempts:
+				Attempt.objects.get(pk=self.expired[0].pk).finalize()
+			return 0, 0, 0.0
+
+		out = StringIO()
+		with mock.patch('attempts.expiry.answer_buffer.flush_many', side_effect=student_submits):
+			call_command('expire_attempts', '--batch-size', '2', '--no-email', stdout=out)
+		self.assertIn('Finalized 2 expired attempt(s)', out.getvalue())
+		self.assertFalse(Attempt.objects.filter(is_submitted=False, deadline__lte=timezone.now()).exists())
+
+	def test_sweeper_is_a_noop_when_nothing_expired(self):
+		call_command('expire_attempts', '--no-email', stdout=StringIO())
+		out = StringIO()
+		call_command('expire_attempts', '--no-email', stdout=out)
+		self.assertIn('Finalized 0 expired attempt(s)', out.getvalue())
+
+
+@override_settings(ANSWER_WRITE_BEHIND=True, ANSWER_WRITE_BEHIND_MAX_PENDING=50, ANSWER_WRITE_BEHIND_MAX_LAG=60)
+class WriteBehindAnswerTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username="student", password="test123")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Buffer Test",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(minutes=5),
+			end_time=now + timezone.timedelta(minutes=25),
+			is_published=True,
+		)
+		self.question = Question.objects.create(exam=self.exam, text="Q1", marks=2)
+		self.correct = Choice.objects.create(question=self.question, text="A", is_correct=True)
+		self.attempt = Attempt.objects.create(student=self.user, exam=self.exam, start_time=now)
+		Answer.objects.create(attempt=self.attempt, question=self.question)
+		self.client.login(username="student", password="test123")
+
+	def _save(self):
+		return self.client.post(
+			reverse('student:save_answer', args=[self.exam.id]),
+			data=json.dumps({'question_id': self.question.id, 'choice_id': self.correct.id}),
+			content_type='application/json',
+		).json()
+
+	def _stored_choice(self):
+		return Answer.objects.get(attempt=self.attempt, question=self.question).selected_choice_id
+
+	def test_save_goes_to_buffer_until_submit(self):
+		self.assertTrue(self._save()['success'])
+		self.assertIsNone(self._stored_choice())
+		self.assertEqual(buffered_selections(self.attempt), {self.question.id: self.correct.id})
+
+		self.assertTrue(self.attempt.finalize())
+		self.assertEqual(self._stored_choice(), self.correct.id)
+		self.assertEqual(self.attempt.score, 2)
+		self.assertEqual(buffered_selections(self.attempt), {})
+
+	def test_checkpoint_command_flushes_open_attempts(self):
+		self._save()
+		out = StringIO()
+		call_command('flush_answer_buffers', stdout=out)
+		self.assertIn('Flushed 1 answer(s) for 1 attempt(s)', out.getvalue())
+		self.assertEqual(self._stored_choice(), self.correct.id)
+
+	@override_settings(ANSWER_WRITE_BEHIND_MAX_PENDING=0)
+	def test_size_limit_flushes_inline(self):
+		self._save()
+		self.assertEqual(self._stored_choice(), self.correct.id)
+		self.assertEqual(buffered_selections(self.attempt), {})
+
+	def _run_together(self, *targets):
+		threads = [threading.Thread(target=target) for target in targets]
+		for thread in threads:
+			thread.start()
+			time.sleep(0.01)
+		for thread in threads:
+			thread.join()
+
+	def test_concurrent_saves_keep_both_answers(self):
+		read_buffer = answer_buffer.get_buffer
+
+		def slow_read(attempt_id):
+			# Both saves read the buffer before either writes it back, unless the lock serializes them
+			buffer = read_buffer(attempt_id)
+			time.sleep(0.05)
+			return buffer
+
+		with mock.patch.object(answer_buffer, 'get_buffer', slow_read):
+			self._run_together(
+				lambda: answer_buffer.buffer_answers(self.attempt, {101: 1}, seq=1),
+				lambda: answer_buffer.buffer_answers(self.attempt, {102: 2}, seq=2),
+			)
+		self.assertEqual(buffered_selections(self.attempt), {101: 1, 102: 2})
+		self.assertEqual(answer_buffer.acknowledged_seq(self.attempt), 2)
+
+	def test_save_during_flush_is_not_dropped(self):
+		answer_buffer.buffer_answers(self.attempt, {101: 1}, seq=1)
+		written = []
+
+		def slow_write(selections, seq=0, change_seqs=None):
+			time.sleep(0.05)
+			written.append(dict(selections))
+			return seq, len(selections)
+
+		with mock.patch.object(self.attempt, 'apply_answer_batch', slow_write):
+			self._run_together(
+				lambda: answer_buffer.flush_buffered_answers(self.attempt),
+				lambda: answer_buffer.buffer_answers(self.attempt, {102: 2}, seq=2),
+				lambda: answer_buffer.buffer_answers(self.attempt, {103: 3}, seq=3),
+			)
+		self.assertEqual(written, [{101: 1}])
+		self.assertEqual(buffered_selections(self.attempt), {102: 2, 103: 3})
+
+	def test_older_change_does_not_replace_buffered_one(self):
+		answer_buffer.buffer_answers(self.attempt, {101: 2}, seq=5, change_seqs={101: 5})
+		self.assertEqual(answer_buffer.buffer_answers(self.attempt, {101: 1}, seq=4, change_seqs={101: 4}), (5, 0))
+		self.assertEqual(buffered_selections(self.attempt), {101: 2})
+
+	@override_settings(ANSWER_WRITE_BEHIND_LOCK_WAIT=0)
+	def test_busy_buffer_rejects_save(self):
+		cache.add(answer_buffer._lock_key(self.attempt.pk), 'other-worker')
+		with self.assertRaises(answer_buffer.BufferLockTimeout):
+			answer_buffer.buffer_answers(self.attempt, {101: 1})
+		self.assertEqual(buffered_selections(self.attempt), {})
+
+
+class ProvisionAttemptsTests(TestCase):
+	def setUp(self):
+		from django.contrib.auth.models import Group
+		group = Group.objects.create(name="Student")
+		self.students = []
+		for name in ("s1", "s2", "s3"):
+			user = User.objects.create_user(username=name, password="test123")
+			user.groups.add(group)
+			self.students.append(user)
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Surge",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(minutes=5),
+			end_time=now + timezone.timedelta(minutes=55),
+			is_published=True,
+		)
+		for i in range(2):
+			q = Question.objects.create(exam=self.exam, text=f"Q{i}", marks=1)
+			Choice.objects.create(question=q, text="A", is_correct=True)
+
+	def test_command_provisions_roster_and_is_idempotent(self):
+		out = StringIO()
+		call_command('provision_attempts', str(self.exam.id), '--batch-size', '2', stdout=out, stderr=StringIO())
+		self.assertIn("Provisioned 3 attempt(s) and 6 answer row(s)", out.getvalue())
+		self.assertEqual(Attempt.objects.filter(exam=self.exam, start_time__isnull=True).count(), 3)
+
+		out = StringIO()
+		call_command('provision_attempts', str(self.exam.id), stdout=out, stderr=StringIO())
+		self.assertIn("Provisioned 0 attempt(s) and 0 answer row(s)", out.getvalue())
+		self.assertEqual(Answer.objects.filter(attempt__exam=self.exam).count(), 6)
+
+	def test_start_only_stamps_provisioned_attempt(self):
+		call_command('provision_attempts', str(self.exam.id), stdout=StringIO(), stderr=StringIO())
+		student = self.students[0]
+		provisioned = Attempt.objects.get(student=student, exam=self.exam)
+		self.assertIsNone(provisioned.deadline)
+
+		self.client.login(username="s1", password="test123")
+		response = self.client.get(reverse('student:exam_detail', args=[self.exam.id]))
+		self.assertEqual(response.status_code, 200)
+
+		response = self.client.post(reverse('student:start_exam', args=[self.exam.id]))
+		self.assertRedirects(response, reverse('student:take_exam', args=[self.exam.id]), fetch_redirect_response=False)
+
+		attempt = Attempt.objects.get(pk=provisioned.pk)
+		self.assertIsNotNone(attempt.start_time)
+		self.assertEqual(attempt.deadline, attempt.start_time + timezone.timedelta(minutes=30))
+		self.assertEqual(attempt.answers.count(), 2)
+
+	def test_repeated_start_keeps_first_clock(self):
+		first = Attempt.start(self.students[0], self.exam)
+		second = Attempt.start(self.students[0], self.exam, now=timezone.now() + timezone.timedelta(minutes=1))
+		self.assertEqual(first.pk, second.pk)
+		self.assertEqual(second.start_time, first.start_time)
+		self.assertEqual(Answer.objects.filter(attempt=first).count(), 2)
+
+
+@override_settings(DB_LOCK_RETRIES=3, DB_LOCK_RETRY_BACKOFF=0.01)
+@mock.patch('attempts.locking.time.sleep')
+class RetryOnLockTests(SimpleTestCase):
+	def flaky(self, failures, message="database is locked"):
+		calls = []
+
+		@retry_on_lock
+		def write():
+			calls.append(1)
+			if len(calls) <= failures:
+				raise OperationalError(message)
+			return "saved"
+		return write, calls
+
+	def test_lock_errors_are_retried_with_growing_backoff(self, sleep):
+		write, calls = self.flaky(2)
+		with mock.patch('attempts.locking.random.uniform', return_value=1):
+			self.assertEqual(write(), "saved")
+		self.assertEqual(len(calls), 3)
+		self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.01, 0.02])
+
+	def test_gives_up_after_configured_retries(self, sleep):
+		write, calls = self.flaky(10)
+		with self.assertRaises(OperationalError):
+			write()
+		self.assertEqual(len(calls), 4)
+
+	def test_other_errors_are_not_retried(self, sleep):
+		write, calls = self.flaky(1, message="no such table: answer")
+		with self.assertRaises(OperationalError):
+			write()
+		self.assertEqual(len(calls), 1)
+
+	def test_not_retried_inside_outer_transaction(self, sleep):
+		write, calls = self.flaky(1)
+		with mock.patch('attempts.locking.connection') as connection:
+			connection.in_atomic_block = True
+			with self.assertRaises(OperationalError):
+				write()
+		self.assertEqual(len(calls), 1)
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class ConcurrentWritePathTests(TransactionTestCase):
+	"""Row locking and conditional updates across real connections (PostgreSQL)."""
+
+	def setUp(self):
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Concurrent",
+			description="",
+			duration_minutes=10,
+			start_time=now - timezone.timedelta(hours=1),
+			end_time=now + timezone.timedelta(hours=1),
+			is_published=True,
+		)
+		question = Question.objects.create(exam=self.exam, text="Q1", marks=2)
+		correct = Choice.objects.create(question=question, text="A", is_correct=True)
+		self.attempts = []
+		for i in range(2):
+			user = User.objects.create_user(username=f"racer{i}", password="test123")
+			attempt = Attempt.start(user, self.exam, now=now - timezone.timedelta(minutes=20))
+			Answer.objects.filter(attempt=attempt).update(selected_choice=correct)
+			self.attempts.append(attempt)
+
+	def run_in_threads(self, target, count):
+		barrier = threading.Barrier(count)
+		results = []
+
+		def worker():
+			try:
+				barrier.wait()
+				results.append(target())
+			finally:
+				connection.close()
+
+		threads = [threading.Thread(target=worker) for _ in range(count)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		return results
+
+	def test_concurrent_submits_finalize_once(self):
+		attempt_id = self.attempts[0].pk
+		results = self.run_in_threads(lambda: Attempt.objects.get(pk=attempt_id).finalize(), 4)
+
+		self.assertEqual(sorted(results), [False, False, False, True])
+		attempt = Attempt.objects.get(pk=attempt_id)
+		self.assertEqual((attempt.score, attempt.correct_count), (2, 1))
+		self.assertEqual(attempt.result.score, 2)
+
+	def test_sweeper_skips_rows_locked_by_another_worker(self):
+		locked, other = self.attempts
+		holding = threading.Event()
+		release = threading.Event()
+
+		def hold_lock():
+			try:
+				with transaction.atomic():
+					list(Attempt.objects.select_for_update().filter(pk=locked.pk))
+					holding.set()
+					release.wait(10)
+			finally:
+				connection.close()
+
+		holder = threading.Thread(target=hold_lock)
+		holder.start()
+		holding.wait(10)
+		try:
+			self.assertEqual(finalize_expired_attempts(send_emails=False), (1, 1))
+		finally:
+			release.set()
+			holder.join()
+
+		self.assertTrue(Attempt.objects.get(pk=other.pk).is_submitted)
+		self.assertFalse(Attempt.objects.get(pk=locked.pk).is_submitted)
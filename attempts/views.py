@@ -3,11 +3,12 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from django.utils import timezone
 import json
 
-from .models import Attempt, Answer
+from .models import Attempt
+from . import buffer as answer_buffer
 from exams.models import Question, Choice
+from exams.email_utils import send_exam_completed_email
 
 
 @csrf_exempt
@@ -27,32 +28,29 @@ def save_answer(request):
             attempt = Attempt.objects.get(
                 student=request.user, 
                 exam=question.exam, 
-                is_submitted=False
+                is_submitted=False,
+                start_time__isnull=False
             )
         except Attempt.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'No active attempt found'})
         
         # Check if attempt is expired
         if attempt.is_expired():
-            attempt.is_submitted = True
-            attempt.end_time = timezone.now()
-            attempt.calculate_score()
+            if attempt.finalize():
+                send_exam_completed_email(attempt)
             return JsonResponse({'success': False, 'error': 'Exam time expired'})
         
-        # Get or create answer
-        answer, created = Answer.objects.get_or_create(
-            attempt=attempt,
-            question=question
-        )
-        
-        # Update the selected choice
-        if choice_id:
-            choice = get_object_or_404(Choice, id=choice_id, question=question)
-            answer.selected_choice = choice
-        else:
-            answer.selected_choice = None
+        if answer_buffer.is_enabled():
+            if choice_id:
+                get_object_or_404(Choice, id=choice_id, question=question)
+            answer_buffer.buffer_answers(attempt, {question.id: int(choice_id) if choice_id else None})
+            return JsonResponse({'success': True})
+
+        choice = get_object_or_404(Choice, id=choice_id, question=question) if choice_id else None
         
-        answer.save()
+        # One upsert, retried if SQLite reports the database as locked
+        if attempt.apply_answer_batch({question.id: choice.id if choice else None}) is None:
+            return JsonResponse({'success': False, 'error': 'Exam already submitted'})
         
         return JsonResponse({'success': True})
         
@@ -10,12 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def _env_flag(name, default=False):
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes')
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
 
@@ -50,6 +56,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'exams.replica.ReplicaPinningMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -83,6 +90,86 @@ DATABASES = {
     }
 }
 
+# Opt-in SQLite concurrency profile (SQLITE_HIGH_CONCURRENCY=1). WAL lets page
+# reads run while an answer is being written, every transaction takes the write
+# lock up front (BEGIN IMMEDIATE) so two writers never deadlock upgrading a read
+# lock, and `timeout` is the busy timeout in seconds. Measure it with
+# `manage.py benchmark_sqlite_contention`.
+SQLITE_HIGH_CONCURRENCY = _env_flag('SQLITE_HIGH_CONCURRENCY')
+SQLITE_CONCURRENCY_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA mmap_size = 134217728',  # 128 MiB
+    'PRAGMA cache_size = -20000',  # ~20 MiB page cache per connection
+    'PRAGMA temp_store = MEMORY',
+]
+SQLITE_BUSY_TIMEOUT = 5  # seconds
+
+if SQLITE_HIGH_CONCURRENCY:
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': '; '.join(SQLITE_CONCURRENCY_PRAGMAS),
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_BUSY_TIMEOUT,
+    }
+
+# PostgreSQL profile for multi-worker deployments (DATABASE_ENGINE=postgresql),
+# configured from POSTGRES_* variables. Needs `pip install "psycopg[binary,pool]"`.
+# Either keep connections open per worker for POSTGRES_CONN_MAX_AGE seconds
+# (checked before reuse), or set POSTGRES_POOL=1 to share a psycopg pool per
+# process instead; Django does not allow both at once.
+if os.environ.get('DATABASE_ENGINE', 'sqlite') == 'postgresql':
+    POSTGRES_POOL = _env_flag('POSTGRES_POOL')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'exam_platform'),
+            'USER': os.environ.get('POSTGRES_USER', 'exam_platform'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if POSTGRES_POOL else int(os.environ.get('POSTGRES_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'sslmode': os.environ.get('POSTGRES_SSLMODE', 'prefer'),
+                'connect_timeout': int(os.environ.get('POSTGRES_CONNECT_TIMEOUT', 5)),
+                'application_name': os.environ.get('POSTGRES_APPLICATION_NAME', 'exam_platform'),
+            },
+        }
+    }
+    if POSTGRES_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.environ.get('POSTGRES_POOL_TIMEOUT', 10)),  # seconds to wait for a free connection
+        }
+
+# Read replica for leaderboards, admin statistics and exports (see exams/replica.py).
+# Set POSTGRES_REPLICA_HOST (PostgreSQL profile) or SQLITE_REPLICA_NAME (a
+# replicated copy of the SQLite file) to enable it. After a POST, PUT, PATCH or
+# DELETE, a browser reads from the primary for DATABASE_REPLICA_PIN_SECONDS.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' and os.environ.get('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        HOST=os.environ['POSTGRES_REPLICA_HOST'],
+        PORT=os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        OPTIONS=dict(DATABASES['default']['OPTIONS']),
+        TEST={'MIRROR': 'default'},
+    )
+elif DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' and os.environ.get('SQLITE_REPLICA_NAME'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=os.environ['SQLITE_REPLICA_NAME'],
+        TEST={'MIRROR': 'default'},
+    )
+DATABASE_REPLICA_ALIAS = 'replica' if 'replica' in DATABASES else None
+DATABASE_REPLICA_PIN_SECONDS = 10
+DATABASE_ROUTERS = ['exams.replica.ReplicaRouter']
+
+# "database is locked" errors on the answer-save and submit paths are retried
+# this many times with jittered exponential backoff (see attempts/locking.py)
+DB_LOCK_RETRIES = 4
+DB_LOCK_RETRY_BACKOFF = 0.05  # seconds before the first retry
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -130,7 +217,52 @@ LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Exam content snapshots served to students during an exam (see exams/snapshots.py)
+EXAM_SNAPSHOT_LOCAL_SIZE = 64  # snapshots kept in each process's LRU
+EXAM_SNAPSHOT_CACHE_TIMEOUT = 3600  # seconds in the shared Django cache
+
+# Score distributions of closed exams used for rank/percentile lookups (see exams/rankings.py)
+EXAM_RANKING_CACHE_TIMEOUT = 3600
+# Admin exam statistics (see exams/stats.py); also dropped whenever an attempt is finalized
+EXAM_STATS_CACHE_TIMEOUT = 60
+# Item analysis (difficulty, discrimination, point-biserial, alpha; needs numpy, see exams/item_analysis.py)
+EXAM_ITEM_ANALYSIS_CACHE_TIMEOUT = 600
+
+# Conditional GET on read-mostly pages (see exams/conditional.py). Part of every
+# ETag, so changing it on deploy makes browsers drop pages rendered by old templates.
+CONDITIONAL_GET_VERSION = ''
+
+# Write-behind answer buffer (see attempts/buffer.py). When enabled, answer
+# saves go to the cache and are checkpointed by `manage.py flush_answer_buffers`,
+# on submit, or inline once a buffer is older/larger than the limits below.
+# Requires a cache shared by all workers (not the default per-process locmem).
+ANSWER_WRITE_BEHIND = False
+ANSWER_WRITE_BEHIND_MAX_LAG = 30  # seconds
+ANSWER_WRITE_BEHIND_MAX_PENDING = 50  # buffered answers per attempt
+ANSWER_WRITE_BEHIND_CACHE_TIMEOUT = 86400  # seconds
+ANSWER_WRITE_BEHIND_LOCK_TIMEOUT = 30  # seconds before an abandoned buffer lock expires
+ANSWER_WRITE_BEHIND_LOCK_WAIT = 5  # seconds a save waits for the buffer lock
+
 # Email (development defaults)
 # In development, emails are printed to the console. Override these in production.
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'no-reply@example.com'
+
+# Outbox: views only queue emails; `manage.py send_queued_emails` delivers them.
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF_SECONDS = 60
+EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = 3600
+EMAIL_OUTBOX_LEASE_SECONDS = 300
+
+# Exam-published notifications: one personalized email per student, sent by
+# `manage.py send_exam_notifications` in checkpointed chunks.
+EMAIL_FANOUT_CHUNK_SIZE = 500
+EMAIL_FANOUT_RATE_LIMIT = 0  # messages per second, 0 = unlimited
+EMAIL_FANOUT_STALE_SECONDS = 300  # raised to two chunks' worth when rate limited
+
+# CSV question uploads (see exams/question_import.py). Larger files are stored
+# and imported by `manage.py run_question_imports` while the page polls progress.
+QUESTION_IMPORT_SYNC_MAX_BYTES = 1024 * 1024
+QUESTION_IMPORT_CHUNK_SIZE = 500
+QUESTION_IMPORT_STALE_SECONDS = 300  # a running job not updated for this long is resumed
+QUESTION_IMPORT_MAX_ERRORS = 1000  # rejected rows kept in the job's report
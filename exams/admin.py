@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Exam, Question, Choice
+from .models import Exam, Question, Choice, QueuedEmail, ExamNotificationFanout, QuestionImportJob
 
 
 class ChoiceInline(admin.TabularInline):
@@ -15,12 +15,17 @@ class QuestionInline(admin.TabularInline):
 
 @admin.register(Exam)
 class ExamAdmin(admin.ModelAdmin):
-    list_display = ('title', 'duration_minutes', 'start_time', 'end_time', 'is_published', 'total_questions')
+    list_display = ('title', 'duration_minutes', 'start_time', 'end_time', 'is_published', 'question_count', 'total_marks')
     list_filter = ('is_published', 'start_time', 'created_at')
     search_fields = ('title', 'description')
     date_hierarchy = 'start_time'
     inlines = [QuestionInline]
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'duration_minutes' in form.changed_data:
+            obj.sync_attempt_deadlines()
+
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
@@ -43,3 +48,25 @@ class ChoiceAdmin(admin.ModelAdmin):
     def text_preview(self, obj):
         return obj.text[:30] + "..." if len(obj.text) > 30 else obj.text
     text_preview.short_description = 'Choice Text'
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+
+
+@admin.register(ExamNotificationFanout)
+class ExamNotificationFanoutAdmin(admin.ModelAdmin):
+    list_display = ('exam', 'status', 'sent_count', 'updated_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('last_user_id', 'sent_count', 'created_at', 'updated_at', 'finished_at')
+
+
+@admin.register(QuestionImportJob)
+class QuestionImportJobAdmin(admin.ModelAdmin):
+    list_display = ('exam', 'status', 'rows_processed', 'total_rows', 'questions_created', 'rejected_rows', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('total_rows', 'rows_processed', 'questions_created', 'rejected_rows', 'errors', 'created_at', 'updated_at', 'finished_at')
@@ -12,7 +12,11 @@ urlpatterns = [
     path('exams/<int:exam_id>/questions/', admin_views.admin_question_list, name='question_list'),
     path('exams/<int:exam_id>/questions/create/', admin_views.admin_question_create, name='question_create'),
     path('exams/<int:exam_id>/questions/bulk-upload/', admin_views.admin_question_bulk_upload, name='question_bulk_upload'),
+    path('exams/<int:exam_id>/questions/imports/<int:job_id>/', admin_views.admin_question_import_job, name='question_import_job'),
+    path('exams/<int:exam_id>/questions/imports/<int:job_id>/status/', admin_views.admin_question_import_status, name='question_import_status'),
     path('questions/<int:question_id>/edit/', admin_views.admin_question_edit, name='question_edit'),
     path('exams/<int:exam_id>/attempts/', admin_views.admin_attempt_list, name='attempt_list'),
+    path('exams/<int:exam_id>/attempts/export/', admin_views.admin_attempt_export, name='attempt_export'),
+    path('exams/<int:exam_id>/answers/export/', admin_views.admin_answer_export, name='answer_export'),
     path('exams/<int:exam_id>/toggle-publish/', admin_views.admin_toggle_publish, name='toggle_publish'),
 ]
\ No newline at end of file
@@ -5,13 +5,20 @@ from django.forms import formset_factory
 from django.utils import timezone
 from django.contrib.auth.models import User, Group
 from django.http import JsonResponse
-import csv
-from io import StringIO, TextIOWrapper
+from django.db.models import Count, Q
+from io import TextIOWrapper
 
-from .models import Exam, Question, Choice, Category
+from .models import Exam, Question, Choice, Category, QuestionImportJob
 from .forms import ExamForm, QuestionForm, ChoiceForm, QuestionBulkUploadForm
 from .email_utils import send_exam_published_email
-from attempts.models import Attempt, Answer
+from .question_import import import_questions, should_run_in_background, ImportFormatError
+from .stats import get_exam_stats
+from .pagination import keyset_paginate
+from .exports import streaming_csv_response, export_filename, attempt_rows, answer_grid_rows
+from .item_analysis import get_item_analysis
+from .replica import read_from_replica
+from .signals import batched_exam_bookkeeping
+from attempts.models import Attempt
 
 
 EXAM_ADMIN_GROUP = 'ExamAdmin'
@@ -27,13 +34,14 @@ def is_exam_admin(user):
 
 
 @user_passes_test(is_exam_admin)
+@read_from_replica
 def admin_dashboard(request):
     """Admin dashboard with statistics"""
     total_students = User.objects.filter(is_staff=False).count()
     total_exams = Exam.objects.count()
-    total_attempts = Attempt.objects.count()
+    total_attempts = Attempt.objects.filter(start_time__isnull=False).count()
     
-    recent_attempts = Attempt.objects.select_related('student', 'exam').order_by('-created_at')[:10]
+    recent_attempts = Attempt.objects.filter(start_time__isnull=False).select_related('student', 'exam').order_by('-created_at')[:10]
     
     context = {
         'total_students': total_students,
@@ -47,8 +55,10 @@ def admin_dashboard(request):
 
 @user_passes_test(is_exam_admin)
 def admin_exam_list(request):
-    """List all exams for admin"""
-    exams = Exam.objects.all().order_by('-created_at')
+    """List all exams for admin, one keyset page at a time"""
+    exams = Exam.objects.select_related('category').annotate(
+        attempt_count=Count('attempts', filter=Q(attempts__start_time__isnull=False)),
+    )
 
     category_id = request.GET.get('category')
     if category_id:
@@ -57,7 +67,7 @@ def admin_exam_list(request):
     categories = Category.objects.all()
 
     return render(request, 'admin/exam_list.html', {
-        'exams': exams,
+        'exams': keyset_paginate(request, exams, ('-created_at', '-id')),
         'categories': categories,
         'selected_category_id': category_id,
     })
@@ -87,6 +97,8 @@ def admin_exam_edit(request, exam_id):
         form = ExamForm(request.POST, instance=exam)
         if form.is_valid():
             exam = form.save()
+            if 'duration_minutes' in form.changed_data:
+                exam.sync_attempt_deadlines()
             messages.success(request, f'Exam "{exam.title}" updated successfully!')
             return redirect('admin-panel:exam_list')
     else:
@@ -101,13 +113,16 @@ def admin_exam_edit(request, exam_id):
 
 @user_passes_test(is_exam_admin)
 def admin_question_list(request, exam_id):
-    """List questions for an exam"""
+    """List questions for an exam, one keyset page at a time"""
     exam = get_object_or_404(Exam, id=exam_id)
-    questions = exam.questions.all().order_by('id')
-    
+    questions = keyset_paginate(request, exam.questions.prefetch_related('choices'), ('id',))
+    # Questions are numbered across pages, so count the ones before this page
+    first_number = exam.questions.filter(id__lt=questions.object_list[0].id).count() if questions else 0
+
     return render(request, 'admin/question_list.html', {
         'exam': exam,
-        'questions': questions
+        'questions': questions,
+        'first_number': first_number,
     })
 
 
@@ -115,130 +130,88 @@ def admin_question_list(request, exam_id):
 def admin_question_bulk_upload(request, exam_id):
     """Bulk upload questions for an exam from a CSV file.
 
-    Expected CSV columns (header row required):
-    - question (text)
-    - option1, option2, option3, option4
-    - correct (1-4 or exact option text)
-    - marks (optional, default 1)
-    - explanation (optional)
-    - time_limit_seconds (optional integer)
+    The file is streamed through ``question_import.import_questions`` (see
+    there for the expected columns). Rows that fail validation are listed
+    back on the page with their line numbers.
     """
 
     exam = get_object_or_404(Exam, id=exam_id)
+    report = None
 
     if request.method == 'POST':
         form = QuestionBulkUploadForm(request.POST, request.FILES)
         if form.is_valid():
             upload = form.cleaned_data['file']
-            clear_existing = form.cleaned_data['clear_existing']
-
-            # Decode uploaded file
-            try:
-                if isinstance(upload, TextIOWrapper):
-                    text = upload.read()
-                else:
-                    text = upload.read().decode('utf-8')
-            except Exception:
-                messages.error(request, 'Could not read the uploaded file. Please ensure it is a UTF-8 encoded CSV.')
-                return redirect('admin-panel:question_bulk_upload', exam_id=exam.id)
-
-            reader = csv.DictReader(StringIO(text))
-            required_columns = {'question', 'option1', 'option2', 'option3', 'option4', 'correct'}
-            missing = required_columns - set(reader.fieldnames or [])
-            if missing:
-                messages.error(request, f'Missing required columns in CSV: {", ".join(sorted(missing))}')
-                return redirect('admin-panel:question_bulk_upload', exam_id=exam.id)
-
-            if clear_existing:
-                exam.questions.all().delete()
-
-            created = 0
-            skipped = 0
-
-            for idx, row in enumerate(reader, start=2):  # start=2 accounts for header
-                question_text = (row.get('question') or '').strip()
-                if not question_text:
-                    skipped += 1
-                    continue
-
-                options = [
-                    (row.get('option1') or '').strip(),
-                    (row.get('option2') or '').strip(),
-                    (row.get('option3') or '').strip(),
-                    (row.get('option4') or '').strip(),
-                ]
-
-                if not all(options):
-                    skipped += 1
-                    continue
-
-                correct_raw = (row.get('correct') or '').strip()
-                correct_index = None
-
-                if correct_raw.isdigit():
-                    num = int(correct_raw)
-                    if 1 <= num <= 4:
-                        correct_index = num - 1
-                else:
-                    # Try to match by option text (case-insensitive)
-                    lower_options = [o.lower() for o in options]
-                    try:
-                        correct_index = lower_options.index(correct_raw.lower())
-                    except ValueError:
-                        correct_index = None
-
-                if correct_index is None:
-                    skipped += 1
-                    continue
-
-                marks_raw = (row.get('marks') or '').strip()
-                try:
-                    marks = int(marks_raw) if marks_raw else 1
-                except ValueError:
-                    marks = 1
-
-                explanation = (row.get('explanation') or '').strip()
-                tls_raw = (row.get('time_limit_seconds') or '').strip()
-                time_limit_seconds = None
-                if tls_raw:
-                    try:
-                        time_limit_seconds = int(tls_raw)
-                    except ValueError:
-                        time_limit_seconds = None
-
-                # Create question
-                question = Question.objects.create(
+            if should_run_in_background(upload):
+                # Large banks are stored and imported by run_question_imports
+                job = QuestionImportJob.objects.create(
                     exam=exam,
-                    text=question_text,
-                    marks=marks,
-                    explanation=explanation,
-                    time_limit_seconds=time_limit_seconds,
+                    file=upload,
+                    clear_existing=form.cleaned_data['clear_existing'],
+                    created_by=request.user,
                 )
+                messages.info(request, 'The file is being imported in the background. This page shows its progress.')
+                return redirect('admin-panel:question_import_job', exam_id=exam.id, job_id=job.id)
 
-                # Create choices
-                for i, opt_text in enumerate(options):
-                    Choice.objects.create(
-                        question=question,
-                        text=opt_text,
-                        is_correct=(i == correct_index),
-                    )
+            stream = TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                created, errors = import_questions(exam, stream, clear_existing=form.cleaned_data['clear_existing'])
+            except ImportFormatError as exc:
+                messages.error(request, str(exc))
+                return redirect('admin-panel:question_bulk_upload', exam_id=exam.id)
 
-                created += 1
+            if not errors:
+                messages.success(request, f'Imported {created} question(s) for "{exam.title}".')
+                return redirect('admin-panel:question_list', exam_id=exam.id)
 
-            messages.success(
+            messages.warning(
                 request,
-                f'Imported {created} question(s) for "{exam.title}". Skipped {skipped} row(s) due to missing/invalid data.'
+                f'Imported {created} question(s) for "{exam.title}". {len(errors)} row(s) were not imported, see below.'
             )
-            return redirect('admin-panel:question_list', exam_id=exam.id)
+            report = {'created': created, 'errors': errors}
+            form = QuestionBulkUploadForm()
     else:
         form = QuestionBulkUploadForm()
 
     return render(request, 'admin/question_bulk_upload.html', {
         'exam': exam,
         'form': form,
+        'report': report,
+    })
+
+
+def _import_job_progress(job):
+    return {
+        'success': True,
+        'status': job.status,
+        'finished': job.is_finished(),
+        'total_rows': job.total_rows,
+        'rows_processed': job.rows_processed,
+        'questions_created': job.questions_created,
+        'rejected_rows': job.rejected_rows,
+        'errors': job.errors[:100],
+        'error_message': job.error_message,
+    }
+
+
+@user_passes_test(is_exam_admin)
+def admin_question_import_job(request, exam_id, job_id):
+    """Progress page for a background question import"""
+    job = get_object_or_404(QuestionImportJob.objects.select_related('exam'), id=job_id, exam_id=exam_id)
+    return render(request, 'admin/question_import_job.html', {
+        'exam': job.exam,
+        'job': job,
+        'progress': _import_job_progress(job),
     })
 
 
+@user_passes_test(is_exam_admin)
+def admin_question_import_status(request, exam_id, job_id):
+    """JSON progress of a background question import, polled by the progress page"""
+    job = get_object_or_404(QuestionImportJob, id=job_id, exam_id=exam_id)
+    return JsonResponse(_import_job_progress(job))
+
+
 @user_passes_test(is_exam_admin)
 def admin_question_create(request, exam_id):
     """Create new question for exam"""
@@ -300,20 +273,22 @@ def admin_question_edit(request, question_id):
         choice_formset = ChoiceFormSet(request.POST)
         
         if question_form.is_valid() and choice_formset.is_valid():
-            question = question_form.save()
-            
-            # Delete existing choices
-            question.choices.all().delete()
-            
-            # Save new choices
-            correct_choices = 0
-            for choice_form in choice_formset:
-                if choice_form.cleaned_data and choice_form.cleaned_data.get('text'):
-                    choice = choice_form.save(commit=False)
-                    choice.question = question
-                    choice.save()
-                    if choice.is_correct:
-                        correct_choices += 1
+            # Bump the exam's content version once for the question and all its choices
+            with batched_exam_bookkeeping():
+                question = question_form.save()
+
+                # Delete existing choices
+                question.choices.all().delete()
+
+                # Save new choices
+                correct_choices = 0
+                for choice_form in choice_formset:
+                    if choice_form.cleaned_data and choice_form.cleaned_data.get('text'):
+                        choice = choice_form.save(commit=False)
+                        choice.question = question
+                        choice.save()
+                        if choice.is_correct:
+                            correct_choices += 1
             
             # Validate that exactly one choice is correct
             if correct_choices != 1:
@@ -341,69 +316,58 @@ def admin_question_edit(request, question_id):
 
 @user_passes_test(is_exam_admin)
 def admin_attempt_list(request, exam_id):
-    """List attempts for an exam"""
+    """List started attempts for an exam, one keyset page at a time"""
     exam = get_object_or_404(Exam, id=exam_id)
-    attempts = Attempt.objects.filter(exam=exam).select_related('student').order_by('-created_at')
-    
+    attempts = keyset_paginate(
+        request,
+        Attempt.objects.filter(exam=exam, start_time__isnull=False).select_related('student'),
+        ('-created_at', '-id'),
+    )
+
     return render(request, 'admin/attempt_list.html', {
         'exam': exam,
-        'attempts': attempts
+        'attempts': attempts,
+        # Exam-wide totals come from the cached statistics aggregate
+        'summary': get_exam_stats(exam),
     })
 
 
-@user_passes_test(is_exam_admin)
-def admin_exam_stats(request, exam_id):
-    """Detailed statistics and analytics for a single exam"""
-    exam = get_object_or_404(Exam, id=exam_id)
-
-    attempts_qs = Attempt.objects.filter(exam=exam)
-    submitted_attempts = attempts_qs.filter(is_submitted=True)
-
-    total_attempts = attempts_qs.count()
-    total_submitted = submitted_attempts.count()
+def _wants_gzip(request):
+    return request.GET.get('gzip') in ('1', 'true', 'yes')
 
-    avg_score = None
-    pass_rate = None
-    if total_submitted:
-        from django.db.models import Avg
 
-        stats = submitted_attempts.aggregate(avg=Avg('score'))
-        avg_score = stats['avg'] or 0
-
-        # Passing threshold mirrors result_detail (60%)
-        passing_score = exam.total_marks() * 0.6
-        passed_count = submitted_attempts.filter(score__gte=passing_score).count()
-        pass_rate = (passed_count / total_submitted) * 100 if total_submitted else None
+@user_passes_test(is_exam_admin)
+@read_from_replica
+def admin_attempt_export(request, exam_id):
+    """Stream every started attempt of an exam as CSV (``?gzip=1`` to compress)"""
+    exam = get_object_or_404(Exam, id=exam_id)
+    return streaming_csv_response(attempt_rows(exam), export_filename(exam, 'attempts'), compress=_wants_gzip(request))
 
-    # Per-question difficulty: how many students answered correctly vs attempted
-    question_stats = []
-    questions = exam.questions.all().order_by('id')
 
-    for question in questions:
-        q_answers = Answer.objects.filter(attempt__exam=exam, question=question, attempt__is_submitted=True)
-        attempted = q_answers.exclude(selected_choice__isnull=True).count()
-        correct = q_answers.filter(selected_choice__is_correct=True).count()
+@user_passes_test(is_exam_admin)
+@read_from_replica
+def admin_answer_export(request, exam_id):
+    """Stream the attempt x question answer grid of an exam as CSV (``?gzip=1`` to compress)"""
+    exam = get_object_or_404(Exam, id=exam_id)
+    return streaming_csv_response(answer_grid_rows(exam), export_filename(exam, 'answers'), compress=_wants_gzip(request))
 
-        difficulty = None
-        if attempted:
-            difficulty = (correct / attempted) * 100
 
-        question_stats.append({
-            'question': question,
-            'attempted': attempted,
-            'correct': correct,
-            'difficulty': difficulty,
-        })
+@user_passes_test(is_exam_admin)
+@read_from_replica
+def admin_exam_stats(request, exam_id):
+    """Detailed statistics and analytics for a single exam"""
+    exam = get_object_or_404(Exam, id=exam_id)
 
-    context = {
-        'exam': exam,
-        'total_attempts': total_attempts,
-        'total_submitted': total_submitted,
-        'avg_score': avg_score,
-        'pass_rate': pass_rate,
-        'question_stats': question_stats,
-    }
+    context = {'exam': exam}
+    context.update(get_exam_stats(exam))
 
+    # Item analysis needs numpy; the page simply omits it when it is missing
+    analysis = get_item_analysis(exam)
+    if analysis is not None:
+        by_question = {item['question_id']: item for item in analysis['items']}
+        for row in context['question_stats']:
+            row['analysis'] = by_question.get(row['question']['id'])
+    context['item_analysis'] = analysis
     return render(request, 'admin/exam_stats.html', context)
 
 
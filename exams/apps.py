@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ExamsConfig(AppConfig):
     name = 'exams'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,74 @@
+"""Conditional GET (ETag / Last-Modified) for read-mostly pages.
+
+A view decorated with ``conditional_page(stamp)`` first calls
+``stamp(request, *args, **kwargs)``, a cheap function that returns the
+version stamps the page is rendered from (an attempt's ``end_time``, an
+exam's ``updated_at`` and ``content_version``, ...) and optionally a
+Last-Modified time. The ETag is a hash of those stamps, the viewing user and
+``CONDITIONAL_GET_VERSION``, so a matching ``If-None-Match`` is answered
+with 304 before the view runs any of its own queries. Returning None from the
+stamp function skips validation and renders the view as usual.
+
+Pages are marked ``Cache-Control: private, no-cache``: browsers keep them but
+revalidate on every visit, and shared caches never store them.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(request, name, stamps):
+    """Hash ``stamps`` together with the page name and the viewing user."""
+    user = getattr(request, 'user', None)
+    parts = (
+        getattr(settings, 'CONDITIONAL_GET_VERSION', ''),
+        name,
+        user.pk if user is not None and user.is_authenticated else None,
+        user.is_staff if user is not None and user.is_authenticated else False,
+    ) + tuple(stamps)
+    digest = hashlib.md5(repr(parts).encode('utf-8'), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
+
+def _has_pending_messages(request):
+    # len() does not mark the messages as read, iterating would
+    return bool(len(get_messages(request)))
+
+
+def conditional_page(stamp):
+    """Answer GET/HEAD with 304 when the page's version stamps are unchanged.
+
+    ``stamp`` returns None (no validation) or ``(stamps, last_modified)``
+    where ``stamps`` is a tuple of plain values and ``last_modified`` a
+    datetime or None.
+    """
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _has_pending_messages(request):
+                return view(request, *args, **kwargs)
+            validators = stamp(request, *args, **kwargs)
+            if validators is None:
+                return view(request, *args, **kwargs)
+
+            stamps, last_modified = validators
+            etag = make_etag(request, view.__name__, stamps)
+            last_modified = last_modified.timestamp() if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    # Redirects and errors are not what the stamps describe
+                    return response
+            response.headers.setdefault('ETag', etag)
+            if last_modified is not None:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return inner
+    return decorator
@@ -1,6 +1,13 @@
+import time
+
 from django.conf import settings
-from django.core.mail import send_mail
-from django.contrib.auth.models import Group
+from django.core.mail import EmailMessage, get_connection, send_mass_mail
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import QueuedEmail, ExamNotificationFanout
 
 
 STUDENT_GROUP_NAME = 'Student'
@@ -11,24 +18,115 @@ def _get_from_email() -> str:
     return getattr(settings, 'DEFAULT_FROM_EMAIL', 'no-reply@example.com')
 
 
-def send_exam_published_email(exam):
-    """Notify all students that a new exam has been published.
+def _outbox_setting(name, default):
+    """Read an EMAIL_OUTBOX_* tuning knob from settings."""
+    return getattr(settings, f'EMAIL_OUTBOX_{name}', default)
+
+
+def _fanout_setting(name, default):
+    """Read an EMAIL_FANOUT_* tuning knob from settings."""
+    return getattr(settings, f'EMAIL_FANOUT_{name}', default)
+
+
+def enqueue_email(subject, message, recipients, from_email=None):
+    """Queue an email for the outbox worker.
+
+    This is a single INSERT, so it is cheap enough to call from request
+    handlers and rolls back together with the surrounding transaction.
+    """
+    return QueuedEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or _get_from_email(),
+        recipients=list(recipients),
+    )
+
+
+def _claim_batch(batch_size, now):
+    """Lease a batch of due emails so concurrent workers skip them."""
+    lease = timezone.timedelta(seconds=_outbox_setting('LEASE_SECONDS', 300))
+    with transaction.atomic():
+        ids = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=QueuedEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if ids:
+            QueuedEmail.objects.filter(id__in=ids).update(next_attempt_at=now + lease)
+    return list(QueuedEmail.objects.filter(id__in=ids).order_by('id'))
+
 
-    This uses the Student group; if the group does not exist or there are
-    no recipients with an email address, it quietly does nothing.
+def _record_failure(email, error, now):
+    """Schedule a retry with exponential backoff, or give up."""
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= _outbox_setting('MAX_ATTEMPTS', 5):
+        email.status = QueuedEmail.STATUS_FAILED
+    else:
+        delay = _outbox_setting('BACKOFF_SECONDS', 60) * (2 ** (email.attempts - 1))
+        delay = min(delay, _outbox_setting('MAX_BACKOFF_SECONDS', 3600))
+        email.next_attempt_at = now + timezone.timedelta(seconds=delay)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def deliver_queued_emails(batch_size=100):
+    """Send one batch of due outbox emails over a single SMTP connection.
+
+    Returns a ``(sent, failed)`` tuple for the batch.
     """
+    now = timezone.now()
+    batch = _claim_batch(batch_size, now)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
     try:
-        student_group = Group.objects.get(name=STUDENT_GROUP_NAME)
-    except Group.DoesNotExist:
-        return
+        connection.open()
+    except Exception as exc:
+        for email in batch:
+            _record_failure(email, exc, now)
+        return 0, len(batch)
 
-    recipients = list(
-        student_group.user_set.exclude(email='').values_list('email', flat=True)
-    )
+    try:
+        for email in batch:
+            message = EmailMessage(
+                email.subject,
+                email.body,
+                email.from_email,
+                email.recipients,
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                _record_failure(email, exc, now)
+                failed += 1
+                continue
+
+            email.status = QueuedEmail.STATUS_SENT
+            email.attempts += 1
+            email.sent_at = timezone.now()
+            email.save(update_fields=['status', 'attempts', 'sent_at'])
+            sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def send_exam_published_email(exam):
+    """Notify all students that a new exam has been published.
+
+    Only a fan-out record is written here; ``manage.py send_exam_notifications``
+    then emails each student in the Student group individually.
+    """
+    return ExamNotificationFanout.objects.create(exam=exam)
 
-    if not recipients:
-        return
 
+def _published_email_content(exam):
+    """Return the shared (subject, body) of an exam-published email."""
     subject = f"New exam published: {exam.title}"
     lines = [
         f"A new exam has been published on NovaExam.",
@@ -43,15 +141,124 @@ def send_exam_published_email(exam):
     lines.append("")
     lines.append("You can view available exams from your dashboard.")
 
-    message = "\n".join(lines)
+    return subject, "\n".join(lines)
+
+
+class FanoutTakenOver(Exception):
+    """Another worker reclaimed the fan-out and moved its checkpoint on."""
+
+
+def _fanout_stale_seconds():
+    """Seconds without a heartbeat after which a running fan-out is reclaimed.
+
+    Never less than two rate-limited chunks, so a throttled worker is not
+    mistaken for a dead one.
+    """
+    stale = _fanout_setting('STALE_SECONDS', 300)
+    rate_limit = _fanout_setting('RATE_LIMIT', 0)
+    if rate_limit:
+        stale = max(stale, 2 * _fanout_setting('CHUNK_SIZE', 500) / rate_limit)
+    return stale
+
+
+def _save_fanout_progress(fanout, **changes):
+    """Write ``changes`` and a heartbeat, unless another worker moved the checkpoint."""
+    updated = ExamNotificationFanout.objects.filter(pk=fanout.pk, last_user_id=fanout.last_user_id).update(
+        updated_at=timezone.now(),
+        **changes,
+    )
+    if not updated:
+        raise FanoutTakenOver(f'Fan-out #{fanout.pk} was resumed by another worker')
+
+
+def claim_fanout():
+    """Pick the next pending fan-out, or a running one whose worker died."""
+    now = timezone.now()
+    stale_before = now - timezone.timedelta(seconds=_fanout_stale_seconds())
+    with transaction.atomic():
+        fanout = (
+            # of=('self',): lock only the fan-out row, not the joined exam/category
+            # (PostgreSQL refuses FOR UPDATE on the nullable side of an outer join)
+            ExamNotificationFanout.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(
+                Q(status=ExamNotificationFanout.STATUS_PENDING)
+                | Q(status=ExamNotificationFanout.STATUS_RUNNING, updated_at__lt=stale_before)
+            )
+            .select_related('exam__category')
+            .order_by('id')
+            .first()
+        )
+        if fanout is not None:
+            fanout.status = ExamNotificationFanout.STATUS_RUNNING
+            fanout.save(update_fields=['status', 'updated_at'])
+    return fanout
 
-    send_mail(
-        subject,
-        message,
-        _get_from_email(),
-        recipients,
-        fail_silently=True,
+
+def run_fanout(fanout, chunk_size=None, rate_limit=None, backend=None):
+    """Email every student with an address, resuming after ``last_user_id``.
+
+    Recipients are streamed in id order, ``chunk_size`` at a time, and each
+    chunk goes out through ``send_mass_mail`` on one shared connection. The
+    checkpoint is saved after every chunk, so a crash re-sends at most one
+    chunk. ``rate_limit`` caps messages per second (0 or None = unlimited);
+    while throttled, the worker refreshes ``updated_at`` so the fan-out does
+    not look stale. Checkpoints only apply if ``last_user_id`` is still the
+    one this worker saw; otherwise ``FanoutTakenOver`` stops it.
+    Returns the number of messages sent by this call.
+    """
+    chunk_size = chunk_size or _fanout_setting('CHUNK_SIZE', 500)
+    if rate_limit is None:
+        rate_limit = _fanout_setting('RATE_LIMIT', 0)
+
+    recipients = (
+        User.objects.filter(groups__name=STUDENT_GROUP_NAME, id__gt=fanout.last_user_id)
+        .exclude(email='')
+        .order_by('id')
+        .values_list('id', 'username', 'email')
     )
+    subject, body = _published_email_content(fanout.exam)
+    from_email = _get_from_email()
+
+    sent = 0
+    heartbeat = _fanout_stale_seconds() / 3
+    started = time.monotonic()
+    connection = get_connection(backend=backend, fail_silently=False)
+    connection.open()
+    try:
+        for chunk in _chunked(recipients.iterator(chunk_size=chunk_size), chunk_size):
+            datatuple = [
+                (subject, f"Hi {username},\n\n{body}", from_email, [email])
+                for _, username, email in chunk
+            ]
+            sent += send_mass_mail(datatuple, connection=connection)
+
+            _save_fanout_progress(fanout, last_user_id=chunk[-1][0], sent_count=F('sent_count') + len(chunk))
+            fanout.last_user_id = chunk[-1][0]
+            fanout.sent_count += len(chunk)
+
+            if rate_limit:
+                while (ahead := sent / rate_limit - (time.monotonic() - started)) > 0:
+                    time.sleep(min(ahead, heartbeat))
+                    _save_fanout_progress(fanout)
+    finally:
+        connection.close()
+
+    fanout.status = ExamNotificationFanout.STATUS_DONE
+    fanout.finished_at = timezone.now()
+    _save_fanout_progress(fanout, status=fanout.status, finished_at=fanout.finished_at)
+    return sent
+
+
+def _chunked(iterable, size):
+    """Yield lists of up to ``size`` items without materializing the input."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
 def send_exam_completed_email(attempt):
@@ -60,12 +267,17 @@ def send_exam_completed_email(attempt):
     if not student.email:
         return
 
+    # results.models imports attempts.models, which imports exams modules at load time
+    from results.models import AttemptResult
+
     exam = attempt.exam
-    total_questions = exam.total_questions()
-    total_marks = exam.total_marks()
-    score = attempt.score or 0
-    percentage = (score / total_marks * 100) if total_marks else 0
-    passed = percentage >= 60
+    result = AttemptResult.for_attempt(attempt)
+    if result is None:
+        return
+    score = result.score
+    total_marks = result.total_marks
+    percentage = result.percentage
+    passed = result.passed
 
     subject = f"Exam completed: {exam.title}"
 
@@ -88,10 +300,4 @@ def send_exam_completed_email(attempt):
 
     message = "\n".join(lines)
 
-    send_mail(
-        subject,
-        message,
-        _get_from_email(),
-        [student.email],
-        fail_silently=True,
-    )
+    enqueue_email(subject, message, [student.email])
@@ -0,0 +1,127 @@
+"""Streaming CSV exports of an exam's attempts and answers.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and written
+one at a time into a ``StreamingHttpResponse``, so memory use does not depend
+on how many attempts or answers an exam has. With ``compress=True`` the CSV is
+gzipped on the fly and served as a ``.csv.gz`` download.
+"""
+
+import csv
+import zlib
+from itertools import groupby
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.text import slugify
+
+from .models import Choice
+
+ITERATOR_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_ITERATOR_CHUNK_SIZE', ITERATOR_CHUNK_SIZE)
+
+
+def _gzip(lines):
+    # wbits=31 produces a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(wbits=31)
+    for line in lines:
+        data = compressor.compress(line.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_csv_response(rows, filename, compress=False):
+    """Build a StreamingHttpResponse writing ``rows`` as CSV."""
+    writer = csv.writer(Echo())
+    lines = (writer.writerow(row) for row in rows)
+    if compress:
+        response = StreamingHttpResponse(_gzip(lines), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_filename(exam, kind):
+    return f'{slugify(exam.title) or "exam"}-{exam.pk}-{kind}.csv'
+
+
+def _isoformat(value):
+    return value.isoformat() if value else ''
+
+
+def attempt_rows(exam):
+    """Header plus one row per started attempt, in attempt id order."""
+    yield [
+        'attempt_id', 'username', 'first_name', 'last_name', 'email',
+        'start_time', 'end_time', 'submitted', 'score', 'total_marks', 'correct_answers', 'percentage',
+    ]
+    total_marks = exam.total_marks
+    attempts = (
+        exam.attempts.filter(start_time__isnull=False)
+        .order_by('id')
+        .values_list(
+            'id', 'student__username', 'student__first_name', 'student__last_name', 'student__email',
+            'start_time', 'end_time', 'is_submitted', 'score', 'correct_count',
+        )
+        .iterator(chunk_size=_chunk_size())
+    )
+    for attempt_id, username, first, last, email, start, end, submitted, score, correct in attempts:
+        percentage = round(score / total_marks * 100, 2) if submitted and total_marks else ''
+        yield [
+            attempt_id, username, first, last, email,
+            _isoformat(start), _isoformat(end), int(submitted),
+            score if submitted else '', total_marks, correct if submitted else '', percentage,
+        ]
+
+
+def answer_grid_rows(exam):
+    """Header plus one row per started attempt with one column per question.
+
+    Each cell is the 1-based position of the selected option (as in the
+    question upload format) or empty when the question was not answered.
+    Answers are streamed in ``(attempt, question)`` order and grouped per
+    attempt as they arrive.
+    """
+    # attempts.models imports exams modules at load time
+    from attempts.models import Answer
+
+    question_ids = list(exam.questions.order_by('id').values_list('id', flat=True))
+    column = {question_id: index for index, question_id in enumerate(question_ids)}
+
+    option_number = {}
+    position = {}
+    choices = Choice.objects.filter(question__exam=exam).order_by('question_id', 'id').values_list('id', 'question_id')
+    for choice_id, question_id in choices:
+        position[question_id] = position.get(question_id, 0) + 1
+        option_number[choice_id] = position[question_id]
+
+    yield ['attempt_id', 'username', 'submitted', 'score'] + [f'q{question_id}' for question_id in question_ids]
+
+    answers = (
+        Answer.objects.filter(attempt__exam=exam, attempt__start_time__isnull=False)
+        .order_by('attempt_id', 'question_id')
+        .values_list(
+            'attempt_id', 'attempt__student__username', 'attempt__is_submitted', 'attempt__score',
+            'question_id', 'selected_choice_id',
+        )
+        .iterator(chunk_size=_chunk_size())
+    )
+    for (attempt_id, username, submitted, score), group in groupby(answers, key=lambda row: row[:4]):
+        cells = [''] * len(question_ids)
+        for *_, question_id, choice_id in group:
+            index = column.get(question_id)
+            if index is not None and choice_id is not None:
+                cells[index] = option_number.get(choice_id, '')
+        yield [attempt_id, username, int(submitted), score if submitted else ''] + cells
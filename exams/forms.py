@@ -5,7 +5,7 @@ from .models import Exam, Question, Choice, Category
 class ExamForm(forms.ModelForm):
     class Meta:
         model = Exam
-        fields = ['category', 'title', 'description', 'duration_minutes', 'start_time', 'end_time', 'is_published']
+        fields = ['category', 'title', 'description', 'duration_minutes', 'start_time', 'end_time', 'is_published', 'single_page_delivery']
         widgets = {
             'category': forms.Select(attrs={'class': 'form-control'}),
             'title': forms.TextInput(attrs={'class': 'form-control'}),
@@ -14,6 +14,7 @@ class ExamForm(forms.ModelForm):
             'start_time': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
             'end_time': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
             'is_published': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'single_page_delivery': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
     def __init__(self, *args, **kwargs):
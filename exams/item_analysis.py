@@ -0,0 +1,170 @@
+"""Classical item analysis of submitted attempts, computed with NumPy.
+
+The submitted answers of an exam are streamed once out of ``Answer`` into a
+dense attempts x questions 0/1 matrix, and every statistic is then an array
+operation over that matrix:
+
+- difficulty: share of attempts answering the item correctly,
+- upper/lower difficulty: the same share within the top and bottom 27% of
+  attempts by total score, and their difference, the discrimination index,
+- point-biserial: correlation of the item with the rest of the score
+  (the total minus the item itself),
+- Cronbach's alpha for the exam as a whole.
+
+NumPy is an optional dependency; ``is_available()`` reports whether it is
+installed and callers skip the analysis when it is not. Results are cached
+like the other exam statistics and dropped when an attempt is finalized.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .replica import use_primary
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+# Share of attempts in each of the upper and lower groups (Kelley's 27%)
+GROUP_FRACTION = 0.27
+STREAM_CHUNK_SIZE = 20000
+
+
+def is_available():
+    return np is not None
+
+
+def cache_key(exam_id):
+    return f'exam-item-analysis:{exam_id}'
+
+
+def build_response_matrix(exam):
+    """Return ``(attempt_ids, question_ids, marks, matrix)`` for submitted attempts.
+
+    ``matrix[i, j]`` is 1 when attempt ``i`` answered question ``j``
+    correctly. Answers are read with one streamed query and placed with
+    vectorized index lookups.
+    """
+    # attempts.models imports exams modules at load time
+    from attempts.models import Answer
+
+    attempt_ids = np.fromiter(
+        exam.attempts.filter(is_submitted=True).order_by('id').values_list('id', flat=True),
+        dtype=np.int64,
+    )
+    question_rows = list(exam.questions.order_by('id').values_list('id', 'marks'))
+    question_ids = np.array([question_id for question_id, _ in question_rows], dtype=np.int64)
+    marks = np.array([mark for _, mark in question_rows], dtype=np.float64)
+    matrix = np.zeros((len(attempt_ids), len(question_ids)), dtype=np.int8)
+    if not len(attempt_ids) or not len(question_ids):
+        return attempt_ids, question_ids, marks, matrix
+
+    correct = (
+        Answer.objects.filter(attempt__exam=exam, attempt__is_submitted=True, selected_choice__is_correct=True)
+        .values_list('attempt_id', 'question_id')
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    buffer = []
+    for pair in correct:
+        buffer.append(pair)
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            _fill(matrix, attempt_ids, question_ids, buffer)
+            buffer = []
+    _fill(matrix, attempt_ids, question_ids, buffer)
+    return attempt_ids, question_ids, marks, matrix
+
+
+def _fill(matrix, attempt_ids, question_ids, pairs):
+    if not pairs:
+        return
+    pairs = np.asarray(pairs, dtype=np.int64)
+    rows = np.searchsorted(attempt_ids, pairs[:, 0]).clip(max=len(attempt_ids) - 1)
+    cols = np.searchsorted(question_ids, pairs[:, 1]).clip(max=len(question_ids) - 1)
+    # Skip rows for attempts submitted or questions added after the ids were read
+    known = (attempt_ids[rows] == pairs[:, 0]) & (question_ids[cols] == pairs[:, 1])
+    matrix[rows[known], cols[known]] = 1
+
+
+def _safe(value, digits=3):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def analyze_matrix(matrix, marks):
+    """Compute item statistics for a 0/1 response matrix.
+
+    Returns ``(alpha, items)`` where ``items`` holds one dict per column.
+    """
+    n_attempts, n_items = matrix.shape
+    if not n_attempts or not n_items:
+        return None, []
+
+    responses = matrix.astype(np.float32)
+    weighted = responses * marks.astype(np.float32)
+    totals = weighted.sum(axis=1)
+
+    difficulty = responses.mean(axis=0)
+
+    group_size = max(1, int(round(n_attempts * GROUP_FRACTION)))
+    order = np.argsort(totals, kind='stable')
+    lower = responses[order[:group_size]].mean(axis=0)
+    upper = responses[order[-group_size:]].mean(axis=0)
+
+    # Correlate each item with the rest score so it is not correlated with itself
+    rest = totals[:, None] - weighted
+    item_dev = responses - difficulty
+    rest_dev = rest - rest.mean(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        point_biserial = (item_dev * rest_dev).sum(axis=0) / np.sqrt(
+            (item_dev ** 2).sum(axis=0) * (rest_dev ** 2).sum(axis=0)
+        )
+
+    alpha = None
+    total_variance = totals.var(ddof=1) if n_attempts > 1 else 0
+    if n_items > 1 and total_variance > 0:
+        item_variance = weighted.var(axis=0, ddof=1).sum()
+        alpha = round(float(n_items / (n_items - 1) * (1 - item_variance / total_variance)), 3)
+
+    items = [
+        {
+            'difficulty': _safe(difficulty[j]),
+            'upper': _safe(upper[j]),
+            'lower': _safe(lower[j]),
+            'discrimination': _safe(upper[j] - lower[j]),
+            'point_biserial': _safe(point_biserial[j]),
+        }
+        for j in range(n_items)
+    ]
+    return alpha, items
+
+
+def compute_item_analysis(exam):
+    attempt_ids, question_ids, marks, matrix = build_response_matrix(exam)
+    alpha, items = analyze_matrix(matrix, marks)
+    for question_id, item in zip(question_ids.tolist(), items):
+        item['question_id'] = question_id
+    return {
+        'attempts': int(len(attempt_ids)),
+        'questions': int(len(question_ids)),
+        'alpha': alpha,
+        'items': items,
+    }
+
+
+def get_item_analysis(exam):
+    """Cached ``compute_item_analysis``, or None when NumPy is not installed."""
+    if not is_available():
+        return None
+    key = cache_key(exam.pk)
+    cached = cache.get(key)
+    if cached is not None and cached['content_version'] == exam.content_version:
+        return cached['analysis']
+    with use_primary():
+        analysis = compute_item_analysis(exam)
+    cache.set(
+        key,
+        {'content_version': exam.content_version, 'analysis': analysis},
+        getattr(settings, 'EXAM_ITEM_ANALYSIS_CACHE_TIMEOUT', 600),
+    )
+    return analysis
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import item_analysis
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = 'Print classical item analysis (difficulty, discrimination, point-biserial, alpha) for an exam'
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--no-cache', action='store_true', help='Recompute instead of reading the cached analysis')
+
+    def handle(self, *args, **options):
+        if not item_analysis.is_available():
+            raise CommandError('Item analysis requires numpy (pip install numpy)')
+        try:
+            exam = Exam.objects.get(pk=options['exam_id'])
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {options['exam_id']} does not exist")
+
+        started = time.monotonic()
+        if options['no_cache']:
+            analysis = item_analysis.compute_item_analysis(exam)
+        else:
+            analysis = item_analysis.get_item_analysis(exam)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            f"{exam.title}: {analysis['attempts']} attempt(s) x {analysis['questions']} question(s), "
+            f"alpha={analysis['alpha']} ({elapsed:.2f}s)"
+        )
+        self.stdout.write(f"{'question':>10} {'p':>6} {'upper':>6} {'lower':>6} {'D':>6} {'r_pb':>6}")
+        for item in analysis['items']:
+            values = [item[name] for name in ('difficulty', 'upper', 'lower', 'discrimination', 'point_biserial')]
+            self.stdout.write(f"{item['question_id']:>10} " + ' '.join(
+                f'{value:>6.3f}' if value is not None else f"{'-':>6}" for value in values
+            ))
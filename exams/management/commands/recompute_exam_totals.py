@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = 'Verify and repair the stored question count and total marks of every exam'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report mismatches; exit with an error if any are found')
+
+    def handle(self, *args, **options):
+        exams = Exam.objects.annotate(
+            counted=Count('questions'),
+            marks=Sum('questions__marks'),
+        ).order_by('id')
+
+        mismatched = 0
+        for exam in exams:
+            actual_marks = exam.marks or 0
+            if exam.question_count == exam.counted and exam.total_marks == actual_marks:
+                continue
+
+            mismatched += 1
+            self.stdout.write(
+                f'{exam.title} (#{exam.id}): stored {exam.question_count} questions / {exam.total_marks} marks, '
+                f'actual {exam.counted} / {actual_marks}'
+            )
+            if not options['check']:
+                Exam.objects.filter(pk=exam.pk).update(question_count=exam.counted, total_marks=actual_marks)
+
+        if options['check'] and mismatched:
+            raise CommandError(f'{mismatched} exam(s) have stale question totals')
+
+        action = 'found' if options['check'] else 'repaired'
+        self.stdout.write(f'{mismatched} mismatched exam(s) {action}')
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from exams.question_import import claim_import_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = 'Import stored CSV question uploads, resuming jobs whose worker stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows committed per transaction (default QUESTION_IMPORT_CHUNK_SIZE)')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when nothing is queued in --loop mode')
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_import_job()
+            if job is None:
+                if not options['loop']:
+                    self.stdout.write('No question imports to run')
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            started = time.monotonic()
+            try:
+                run_import_job(job, chunk_size=options['chunk_size'])
+            except Exception as exc:
+                # The checkpoint is kept; the job is picked up again once stale
+                self.stderr.write(f'Import #{job.pk} for "{job.exam.title}" stopped after {job.rows_processed} row(s): {exc}')
+                if not options['loop']:
+                    break
+                continue
+
+            self.stdout.write(
+                f'Import #{job.pk} for "{job.exam.title}" {job.status}: {job.questions_created} question(s), '
+                f'{job.rejected_rows} rejected row(s) in {time.monotonic() - started:.2f}s'
+            )
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from exams.email_utils import claim_fanout, run_fanout
+
+
+class Command(BaseCommand):
+    help = 'Email every student about newly published exams, in resumable chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None, help='Recipients per send_mass_mail call (default EMAIL_FANOUT_CHUNK_SIZE)')
+        parser.add_argument('--rate-limit', type=float, default=None, help='Maximum messages per second (default EMAIL_FANOUT_RATE_LIMIT, 0 = unlimited)')
+        parser.add_argument('--backend', default=None, help='Email backend to send through, e.g. django.core.mail.backends.locmem.EmailBackend')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling every --interval seconds')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds to sleep when nothing is queued in --loop mode')
+
+    def handle(self, *args, **options):
+        while True:
+            fanout = claim_fanout()
+            if fanout is None:
+                if not options['loop']:
+                    self.stdout.write('No exam notifications to send')
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            started = time.monotonic()
+            try:
+                sent = run_fanout(
+                    fanout,
+                    chunk_size=options['chunk_size'],
+                    rate_limit=options['rate_limit'],
+                    backend=options['backend'],
+                )
+            except Exception as exc:
+                # The checkpoint is kept; the fan-out is picked up again once stale
+                self.stderr.write(f'Fan-out for "{fanout.exam.title}" stopped after {fanout.sent_count} message(s): {exc}')
+                if not options['loop']:
+                    break
+                continue
+
+            elapsed = time.monotonic() - started
+            rate = sent / elapsed if elapsed else 0
+            self.stdout.write(
+                f'Fan-out for "{fanout.exam.title}": {sent} message(s) in {elapsed:.2f}s ({rate:.0f} msg/s)'
+            )
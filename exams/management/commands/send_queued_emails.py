@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from exams.email_utils import deliver_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per SMTP connection')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when the outbox is empty in --loop mode')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = deliver_queued_emails(batch_size=batch_size)
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < batch_size:
+                    break
+
+            if total_sent or total_failed or not options['loop']:
+                self.stdout.write(f'Sent {total_sent} email(s), {total_failed} failed')
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
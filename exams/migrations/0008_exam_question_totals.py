@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:01
+
+from django.db import migrations, models
+
+
+def backfill_question_totals(apps, schema_editor):
+    Exam = apps.get_model('exams', 'Exam')
+    exams = Exam.objects.annotate(
+        counted=models.Count('questions'),
+        marks=models.Sum('questions__marks'),
+    )
+    for exam in exams:
+        Exam.objects.filter(pk=exam.pk).update(question_count=exam.counted, total_marks=exam.marks or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0007_examnotificationfanout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='total_marks',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_question_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0009_exam_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='single_page_delivery',
+            field=models.BooleanField(default=False, help_text='Load the whole exam in one request and navigate between questions in the browser'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0012_exam_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='choice',
+            index=models.Index(condition=models.Q(('is_correct', True)), fields=['question'], name='choice_correct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-created_at'], name='exam_published_recent_idx'),
+        ),
+    ]
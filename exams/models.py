@@ -23,10 +23,44 @@ class Exam(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     is_published = models.BooleanField(default=False)
+    single_page_delivery = models.BooleanField(default=False, help_text="Load the whole exam in one request and navigate between questions in the browser")
+    # Denormalized from Question rows; see refresh_question_totals()
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    total_marks = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped whenever questions or choices change; keys cached content snapshots
+    content_version = models.PositiveIntegerField(default=1, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Version stamp of the exam row itself, used by conditional GET validators
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Student dashboard: published exams, newest first. Partial, because a
+            # boolean filter is compiled to a bare column test that SQLite only
+            # matches against an index condition, not a key column
+            models.Index(fields=['-created_at'], name='exam_published_recent_idx', condition=models.Q(is_published=True)),
+        ]
     
+    # Only ever written with UPDATEs by exams.signals and the import code
+    DENORMALIZED_FIELDS = ('question_count', 'total_marks', 'content_version')
+
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        # A full-row save of an existing exam would write back the copies read
+        # at the start of the request, undoing concurrent F() updates
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def published_recent(cls):
+        """Published exams, newest first, for the student dashboard"""
+        return cls.objects.filter(is_published=True).select_related('category').order_by('-created_at')
     
     def is_active(self):
         """Check if exam is currently active"""
@@ -35,11 +69,38 @@ class Exam(models.Model):
     
     def total_questions(self):
         """Get total number of questions in this exam"""
-        return self.questions.count()
-    
-    def total_marks(self):
-        """Get total marks for this exam"""
-        return sum(q.marks for q in self.questions.all())
+        return self.question_count
+
+    def refresh_question_totals(self):
+        """Recompute the stored question count and total marks from Question rows"""
+        totals = self.questions.aggregate(count=models.Count('id'), marks=models.Sum('marks'))
+        self.question_count = totals['count']
+        self.total_marks = totals['marks'] or 0
+        Exam.objects.filter(pk=self.pk).update(question_count=self.question_count, total_marks=self.total_marks)
+
+    def bump_content_version(self):
+        """Invalidate cached content snapshots of this exam"""
+        Exam.objects.filter(pk=self.pk).update(content_version=models.F('content_version') + 1)
+        self.content_version += 1
+
+    def sync_attempt_deadlines(self):
+        """Re-stamp the stored deadline of open attempts after the duration changes"""
+        return self.attempts.filter(is_submitted=False, start_time__isnull=False).update(
+            deadline=models.F('start_time') + timezone.timedelta(minutes=self.duration_minutes)
+        )
+
+
+class ExamContentQuerySet(models.QuerySet):
+    """Deletes refresh each affected exam once instead of once per row"""
+
+    def delete(self):
+        # exams.signals imports this module at load time
+        from .signals import batched_exam_bookkeeping
+        with batched_exam_bookkeeping():
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
 
 
 class Question(models.Model):
@@ -51,13 +112,21 @@ class Question(models.Model):
     time_limit_seconds = models.PositiveIntegerField(null=True, blank=True, help_text="Optional per-question time limit in seconds")
     explanation = models.TextField(blank=True, help_text="Optional explanation shown after the exam is submitted")
     created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ExamContentQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.exam.title} - Q{self.id}"
+
+    # The exam's question_count, total_marks and content_version are kept up to date by exams.signals
     
     def get_correct_choice(self):
         """Get the correct choice for this question"""
-        return self.choices.filter(is_correct=True).first()
+        return self.correct_choices().first()
+
+    def correct_choices(self):
+        """Queryset of the options marked correct"""
+        return self.choices.filter(is_correct=True)
 
 
 class Choice(models.Model):
@@ -65,6 +134,110 @@ class Choice(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='choices')
     text = models.CharField(max_length=500)
     is_correct = models.BooleanField(default=False)
+
+    objects = ExamContentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Correct-option lookups per question (scoring, snapshots, get_correct_choice)
+            models.Index(fields=['question'], name='choice_correct_idx', condition=models.Q(is_correct=True)),
+        ]
     
     def __str__(self):
         return f"{self.question.exam.title} - Q{self.question.id} - {self.text[:50]}"
+
+    @classmethod
+    def correct_for_exams(cls, exam_ids):
+        """Correct options of every question in the given exams"""
+        return cls.objects.filter(question__exam_id__in=exam_ids, is_correct=True)
+
+
+
+class QueuedEmail(models.Model):
+    """Outbox row for an email that a worker delivers outside the request"""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever scan rows that are still waiting to go out
+            models.Index(fields=['next_attempt_at'], name='queuedemail_pending_idx', condition=models.Q(status='pending')),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+
+class ExamNotificationFanout(models.Model):
+    """Checkpointed delivery of one "exam published" email per student"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+    ]
+
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='notification_fanouts')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    last_user_id = models.PositiveBigIntegerField(default=0, help_text="Highest recipient id already sent; the resume point")
+    sent_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.exam.title} fan-out ({self.status})"
+
+
+class QuestionImportJob(models.Model):
+    """A CSV question upload stored on disk and imported by a background worker"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='import_jobs')
+    file = models.FileField(upload_to='question_imports/')
+    clear_existing = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_processed = models.PositiveIntegerField(default=0, help_text="Data rows already committed; the resume point")
+    questions_created = models.PositiveIntegerField(default=0)
+    rejected_rows = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="Rejected rows as {line, error}, capped at QUESTION_IMPORT_MAX_ERRORS")
+    error_message = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.exam.title} import #{self.pk} ({self.status})"
+
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
@@ -0,0 +1,127 @@
+"""Keyset (cursor) pagination for list views.
+
+Instead of OFFSET, each page is fetched with a WHERE clause on the ordering
+keys of the last (or first) row of the previous page, so every page costs the
+same index range scan no matter how deep the reader goes. The cursor is a
+signed token carrying those key values; a tampered or stale cursor simply
+shows the first page.
+"""
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 25
+CURSOR_SALT = 'exams.pagination'
+
+
+class KeysetPage:
+    """One page of results plus links to its neighbours."""
+
+    def __init__(self, object_list, next_url=None, previous_url=None):
+        self.object_list = object_list
+        self.next_url = next_url
+        self.previous_url = previous_url
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_url is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_url is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def _keys(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _encode(obj, keys, direction):
+    values = []
+    for name, _ in keys:
+        value = getattr(obj, name)
+        values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+    return signing.dumps({'d': direction, 'k': values}, salt=CURSOR_SALT, compress=True)
+
+
+def _decode(model, keys, token):
+    try:
+        data = signing.loads(token, salt=CURSOR_SALT)
+        values = [model._meta.get_field(name).to_python(value) for (name, _), value in zip(keys, data['k'])]
+    except (signing.BadSignature, ValidationError, KeyError, TypeError, ValueError):
+        return None, None
+    if len(values) != len(keys) or data.get('d') not in ('n', 'p'):
+        return None, None
+    return data['d'], values
+
+
+def _after(keys, values, backwards):
+    """Rows strictly after ``values`` in the ordering (before, if backwards)."""
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(keys, values):
+        lookup = 'lt' if descending != backwards else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _url(request, param, token):
+    params = request.GET.copy()
+    params[param] = token
+    return f'?{params.urlencode()}'
+
+
+def page_queryset(queryset, ordering, values=None, per_page=None):
+    """The query for the page after the row with key ``values`` (first page if None).
+
+    Fetches one extra row to tell whether there is a next page.
+    """
+    per_page = per_page or PAGE_SIZE
+    if values is not None:
+        queryset = queryset.filter(_after(_keys(ordering), values, False))
+    return queryset.order_by(*ordering)[:per_page + 1]
+
+
+def keyset_paginate(request, queryset, ordering, per_page=None, param='cursor'):
+    """Return the KeysetPage of ``queryset`` selected by ``request.GET[param]``.
+
+    ``ordering`` lists local model fields, e.g. ``('-created_at', '-id')``; the
+    last key must be unique so every row has a distinct position.
+    """
+    per_page = per_page or PAGE_SIZE
+    keys = _keys(ordering)
+    direction, values = None, None
+    token = request.GET.get(param)
+    if token:
+        direction, values = _decode(queryset.model, keys, token)
+
+    backwards = direction == 'p'
+    if backwards:
+        reverse_ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+        rows = list(queryset.filter(_after(keys, values, True)).order_by(*reverse_ordering)[:per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_previous, has_next = more, True
+    else:
+        rows = list(page_queryset(queryset, ordering, values, per_page))
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = values is not None
+
+    next_url = _url(request, param, _encode(rows[-1], keys, 'n')) if has_next and rows else None
+    previous_url = _url(request, param, _encode(rows[0], keys, 'p')) if has_previous and rows else None
+    return KeysetPage(rows, next_url=next_url, previous_url=previous_url)
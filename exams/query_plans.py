@@ -0,0 +1,73 @@
+"""EXPLAIN-based checks that hot queries are answered through an index.
+
+``full_table_scans(queryset)`` runs EXPLAIN for the queryset on its database
+and returns the tables the plan reads row by row without an index. Tests use
+``QueryPlanAssertions.assertIndexed`` on each hot query shape, so dropping or
+renaming an index, or changing a filter so it no longer matches one, fails
+the suite instead of surfacing in the slow-query log.
+
+On PostgreSQL, sequential scans and explicit sorts are disabled while
+explaining. Otherwise the planner would prefer them on the tiny tables of a
+test database, so the check asks whether an index *can* serve the query, in
+its requested order where there is one. SQLite, with no
+statistics gathered, picks a usable index by itself. On other databases the
+plan is not parsed and ``assertIndexed`` skips the test.
+"""
+
+import re
+
+from django.db import connections
+
+SQLITE_SCAN = re.compile(r'\bSCAN (\S+)(.*)$')
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+SUPPORTED_VENDORS = ('postgresql', 'sqlite')
+
+
+def explain(queryset):
+    """Return the query plan of ``queryset`` as text."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with connection.cursor() as cursor:
+        cursor.execute('SET enable_seqscan = off')
+        cursor.execute('SET enable_sort = off')
+        try:
+            return queryset.explain()
+        finally:
+            cursor.execute('RESET enable_seqscan')
+            cursor.execute('RESET enable_sort')
+
+
+def full_table_scans(queryset):
+    """Tables the plan of ``queryset`` scans without using an index.
+
+    Returns None on databases whose plans are not parsed.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor not in SUPPORTED_VENDORS:
+        return None
+    plan = explain(queryset)
+    if vendor == 'postgresql':
+        return POSTGRES_SEQ_SCAN.findall(plan)
+    if vendor == 'sqlite':
+        tables = []
+        for line in plan.splitlines():
+            match = SQLITE_SCAN.search(line)
+            # Subqueries show up as "SCAN (subquery-N)"; "USING ..." means an index drives the scan
+            if match and not match.group(1).startswith('(') and 'USING' not in match.group(2):
+                tables.append(match.group(1))
+        return tables
+
+
+class QueryPlanAssertions:
+    """TestCase mixin for checking the plans of hot queries."""
+
+    def assertIndexed(self, queryset, index=None):
+        """Fail if the plan scans a whole table, or does not mention ``index``."""
+        scans = full_table_scans(queryset)
+        if scans is None:
+            self.skipTest(f'No query plan parser for {connections[queryset.db].vendor}')
+        self.assertEqual(scans, [], f'Full table scan of {", ".join(scans)}:\n{explain(queryset)}')
+        if index is not None:
+            plan = explain(queryset)
+            self.assertIn(index, plan, f'Plan does not use {index}:\n{plan}')
@@ -0,0 +1,267 @@
+"""CSV question import used by the admin bulk upload.
+
+The file is parsed as a stream, validated row by row, and inserted in chunks
+with ``bulk_create`` (one INSERT for the questions and one for their choices
+per chunk). The whole import runs in one transaction, so a database error or
+an undecodable byte halfway through leaves the exam exactly as it was.
+Invalid rows are not imported and are reported with their line number.
+
+Uploads larger than ``QUESTION_IMPORT_SYNC_MAX_BYTES`` are stored as a
+``QuestionImportJob`` instead and imported by ``manage.py
+run_question_imports``, which commits chunk by chunk with a resume point so a
+crashed worker can pick the job up again; the upload page polls its progress.
+
+Expected CSV columns (header row required):
+- question (text)
+- option1, option2, option3, option4
+- correct (1-4 or exact option text)
+- marks (optional, default 1)
+- explanation (optional)
+- time_limit_seconds (optional integer)
+"""
+
+import csv
+from io import TextIOWrapper
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Question, Choice, QuestionImportJob
+
+REQUIRED_COLUMNS = {'question', 'option1', 'option2', 'option3', 'option4', 'correct'}
+OPTION_COLUMNS = ('option1', 'option2', 'option3', 'option4')
+CHUNK_SIZE = 500
+
+
+class ImportFormatError(ValueError):
+    """The file cannot be imported at all (unreadable or missing columns)."""
+
+
+class ImportJobTakenOver(Exception):
+    """Another worker reclaimed the job and moved its checkpoint on."""
+
+
+def _optional_int(raw, name):
+    raw = (raw or '').strip()
+    if not raw:
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f'{name} must be a whole number, got "{raw}"')
+    if value < 0:
+        raise ValueError(f'{name} cannot be negative')
+    return value
+
+
+def parse_row(row):
+    """Validate one CSV row and return the question it describes.
+
+    Raises ValueError with a message suitable for the error report.
+    """
+    question_text = (row.get('question') or '').strip()
+    if not question_text:
+        raise ValueError('question is empty')
+
+    options = [(row.get(column) or '').strip() for column in OPTION_COLUMNS]
+    empty = [column for column, text in zip(OPTION_COLUMNS, options) if not text]
+    if empty:
+        raise ValueError(f'{", ".join(empty)} empty')
+
+    correct_raw = (row.get('correct') or '').strip()
+    if correct_raw.isdigit():
+        correct_index = int(correct_raw) - 1
+        if not 0 <= correct_index < len(options):
+            raise ValueError(f'correct must be between 1 and {len(options)}, got {correct_raw}')
+    else:
+        # Match by option text (case-insensitive)
+        lower_options = [option.lower() for option in options]
+        if correct_raw.lower() not in lower_options:
+            raise ValueError(f'correct "{correct_raw}" does not match any option')
+        correct_index = lower_options.index(correct_raw.lower())
+
+    marks = _optional_int(row.get('marks'), 'marks')
+    return {
+        'text': question_text,
+        'options': options,
+        'correct_index': correct_index,
+        'marks': 1 if marks is None else marks,
+        'explanation': (row.get('explanation') or '').strip(),
+        'time_limit_seconds': _optional_int(row.get('time_limit_seconds'), 'time_limit_seconds'),
+    }
+
+
+def read_rows(stream):
+    """Yield ``(line_number, row)`` pairs from a text stream of CSV.
+
+    Raises ImportFormatError if required columns are missing.
+    """
+    reader = csv.DictReader(stream)
+    missing = REQUIRED_COLUMNS - set(reader.fieldnames or [])
+    if missing:
+        raise ImportFormatError(f'Missing required columns in CSV: {", ".join(sorted(missing))}')
+    # line_num points at the last physical line of the record just read
+    return ((reader.line_num, row) for row in reader)
+
+
+def _insert(exam, parsed):
+    """Insert validated questions and their choices with two bulk INSERTs."""
+    questions = Question.objects.bulk_create([
+        Question(
+            exam=exam,
+            text=item['text'],
+            marks=item['marks'],
+            explanation=item['explanation'],
+            time_limit_seconds=item['time_limit_seconds'],
+        )
+        for item in parsed
+    ])
+    Choice.objects.bulk_create([
+        Choice(question=question, text=text, is_correct=(index == item['correct_index']))
+        for question, item in zip(questions, parsed)
+        for index, text in enumerate(item['options'])
+    ])
+    return len(questions)
+
+
+def import_questions(exam, stream, clear_existing=False, chunk_size=CHUNK_SIZE):
+    """Import questions from a CSV text stream into ``exam``.
+
+    Returns ``(created, errors)`` where ``errors`` is a list of
+    ``{'line': n, 'error': message}`` for the rows that were not imported.
+    """
+    try:
+        rows = read_rows(stream)
+        with transaction.atomic():
+            return _import_rows(exam, rows, clear_existing, chunk_size)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ImportFormatError(f'Could not read the uploaded file. Please ensure it is a UTF-8 encoded CSV. ({exc})')
+
+
+def _import_chunk(exam, chunk):
+    """Validate and insert one chunk of ``(line, row)`` pairs."""
+    parsed = []
+    errors = []
+    for line, row in chunk:
+        try:
+            parsed.append(parse_row(row))
+        except ValueError as exc:
+            errors.append({'line': line, 'error': str(exc)})
+    created = _insert(exam, parsed) if parsed else 0
+    return created, errors
+
+
+def _import_rows(exam, rows, clear_existing, chunk_size):
+    created = 0
+    errors = []
+    if clear_existing:
+        exam.questions.all().delete()
+
+    while chunk := list(islice(rows, chunk_size)):
+        chunk_created, chunk_errors = _import_chunk(exam, chunk)
+        created += chunk_created
+        errors += chunk_errors
+
+    # bulk_create bypasses Question.save(), so update the cached totals once
+    exam.refresh_question_totals()
+    exam.bump_content_version()
+    return created, errors
+
+
+def _job_setting(name, default):
+    """Read a QUESTION_IMPORT_* tuning knob from settings."""
+    return getattr(settings, f'QUESTION_IMPORT_{name}', default)
+
+
+def should_run_in_background(upload):
+    """Uploads larger than QUESTION_IMPORT_SYNC_MAX_BYTES become import jobs."""
+    return upload.size > _job_setting('SYNC_MAX_BYTES', 1024 * 1024)
+
+
+def _open_job_file(job):
+    handle = job.file.storage.open(job.file.name, 'rb')
+    return TextIOWrapper(handle, encoding='utf-8-sig', newline='')
+
+
+def claim_import_job():
+    """Pick the next pending import job, or a running one whose worker died."""
+    now = timezone.now()
+    stale_before = now - timezone.timedelta(seconds=_job_setting('STALE_SECONDS', 300))
+    with transaction.atomic():
+        job = (
+            # Lock the job row only; the joined exam stays editable
+            QuestionImportJob.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(
+                Q(status=QuestionImportJob.STATUS_PENDING)
+                | Q(status=QuestionImportJob.STATUS_RUNNING, updated_at__lt=stale_before)
+            )
+            .select_related('exam')
+            .order_by('id')
+            .first()
+        )
+        if job is not None:
+            job.status = QuestionImportJob.STATUS_RUNNING
+            job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def run_import_job(job, chunk_size=None):
+    """Import a stored upload, committing one chunk at a time.
+
+    Each chunk's questions and the job's checkpoint (``rows_processed``,
+    counts and errors) are saved in the same transaction, so re-running a job
+    after a crash skips exactly the rows that were already imported and never
+    duplicates questions. ``clear_existing`` is applied together with the
+    first chunk. Files that cannot be read at all mark the job as failed.
+
+    A job that looked stale can be reclaimed while its first worker is still
+    running. Each chunk therefore starts by advancing ``rows_processed`` with
+    a conditional UPDATE from the value this worker last saw; the worker that
+    loses the race gets ``ImportJobTakenOver`` and its chunk is rolled back.
+    """
+    chunk_size = chunk_size or _job_setting('CHUNK_SIZE', CHUNK_SIZE)
+    exam = job.exam
+    jobs = QuestionImportJob.objects.filter(pk=job.pk)
+    try:
+        if job.total_rows is None:
+            total = 0
+            with _open_job_file(job) as stream:
+                for total, _ in enumerate(read_rows(stream), start=1):
+                    if total % chunk_size == 0:
+                        # Counting a huge file must not make the job look stale
+                        jobs.update(updated_at=timezone.now())
+            job.total_rows = total
+            job.save(update_fields=['total_rows', 'updated_at'])
+
+        with _open_job_file(job) as stream:
+            rows = islice(read_rows(stream), job.rows_processed, None)
+            while chunk := list(islice(rows, chunk_size)):
+                with transaction.atomic():
+                    if not jobs.filter(rows_processed=job.rows_processed).update(
+                        rows_processed=job.rows_processed + len(chunk),
+                        updated_at=timezone.now(),
+                    ):
+                        raise ImportJobTakenOver(f'Import #{job.pk} was resumed by another worker')
+                    if job.clear_existing and job.rows_processed == 0:
+                        exam.questions.all().delete()
+                    created, errors = _import_chunk(exam, chunk)
+                    job.rows_processed += len(chunk)
+                    job.questions_created += created
+                    job.rejected_rows += len(errors)
+                    # Keep the stored report bounded for very dirty files
+                    job.errors += errors[:max(0, _job_setting('MAX_ERRORS', 1000) - len(job.errors))]
+                    job.save(update_fields=['questions_created', 'rejected_rows', 'errors'])
+    except (ImportFormatError, UnicodeDecodeError, csv.Error) as exc:
+        job.status = QuestionImportJob.STATUS_FAILED
+        job.error_message = str(exc)
+    else:
+        job.status = QuestionImportJob.STATUS_DONE
+
+    exam.refresh_question_totals()
+    exam.bump_content_version()
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'finished_at', 'updated_at'])
+    return job
@@ -0,0 +1,136 @@
+"""Per-exam ranks and percentiles for submitted attempts.
+
+Leaderboard pages annotate rank, dense rank and percentile with window
+functions, so positions are computed by the database over every submitted
+attempt, not just the rows on the page. While an exam is open, a single
+student's position comes from indexed counts of the attempts above their score,
+run on whichever database the request is routed to. Once an exam has closed
+(its window and the longest attempt after it have ended) the sorted score
+distribution is loaded once, kept in the Django cache and searched with
+bisect; finalizing an attempt drops it.
+"""
+
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import DenseRank, PercentRank, Rank
+from django.utils import timezone
+
+from .item_analysis import cache_key as item_analysis_cache_key
+from .replica import use_primary
+from .stats import cache_key as stats_cache_key
+
+
+def _cache_key(exam_id):
+    return f'exam-score-distribution:{exam_id}'
+
+
+def is_closed(exam, now=None):
+    """Whether no attempt of this exam can still be submitted."""
+    now = now or timezone.now()
+    return now > exam.end_time + timezone.timedelta(minutes=exam.duration_minutes)
+
+
+def ranked_attempts(exam):
+    """Submitted attempts ordered by score with rank, dense_rank and percentile.
+
+    ``percentile`` is the share of the other attempts scoring at or below this
+    one, from 0 (last) to 100 (first). Slicing the queryset keeps the window
+    computed over all submitted attempts.
+    """
+    by_score = F('score').desc()
+    return (
+        exam.attempts.filter(is_submitted=True)
+        .select_related('student')
+        .annotate(
+            rank=Window(Rank(), order_by=by_score),
+            dense_rank=Window(DenseRank(), order_by=by_score),
+            percent_rank=Window(PercentRank(), order_by=by_score),
+        )
+        .order_by('-score', 'student__username')
+    )
+
+
+def submitted_scores(exam):
+    """Scores of the exam's submitted attempts, ascending"""
+    return exam.attempts.filter(is_submitted=True).order_by('score').values_list('score', flat=True)
+
+
+def attempts_above(exam, score):
+    """Submitted attempts of the exam scoring more than ``score``"""
+    return exam.attempts.filter(is_submitted=True, score__gt=score)
+
+
+def position_in_order(attempt):
+    """0-based row index of an attempt in ``ranked_attempts`` order."""
+    exam_attempts = attempt.exam.attempts.filter(is_submitted=True)
+    return (
+        exam_attempts.filter(score__gt=attempt.score).count()
+        + exam_attempts.filter(score=attempt.score, student__username__lt=attempt.student.username).count()
+    )
+
+
+def get_score_distribution(exam):
+    """Return ``(scores, distinct_scores)``, both sorted ascending.
+
+    Cached only after the exam has closed, when the scores can no longer change.
+    """
+    closed = is_closed(exam)
+    if closed:
+        distribution = cache.get(_cache_key(exam.pk))
+        if distribution is not None:
+            return distribution
+
+    # Read what gets cached from the primary: replica rows may predate the last submissions
+    with use_primary():
+        scores = list(submitted_scores(exam))
+    distinct_scores = sorted(set(scores))
+    distribution = (scores, distinct_scores)
+    if closed:
+        cache.set(_cache_key(exam.pk), distribution, getattr(settings, 'EXAM_RANKING_CACHE_TIMEOUT', 3600))
+    return distribution
+
+
+def score_position(distribution, score):
+    """Rank, dense rank and percentile of ``score`` by binary search."""
+    scores, distinct_scores = distribution
+    total = len(scores)
+    rank = total - bisect_right(scores, score) + 1
+    dense_rank = len(distinct_scores) - bisect_right(distinct_scores, score) + 1
+    return _position(rank, dense_rank, total)
+
+
+def counted_position(exam, score):
+    """Rank, dense rank and percentile of ``score`` from three indexed counts."""
+    above = attempts_above(exam, score)
+    rank = above.count() + 1
+    dense_rank = above.values('score').distinct().count() + 1
+    return _position(rank, dense_rank, exam.attempts.filter(is_submitted=True).count())
+
+
+def exam_position(exam, score):
+    """Position of ``score`` in the exam: counted while open, from the cached distribution once closed."""
+    if is_closed(exam):
+        return score_position(get_score_distribution(exam), score)
+    return counted_position(exam, score)
+
+
+def _position(rank, dense_rank, total):
+    # Same definition as PercentRank over score descending
+    percentile = 100.0 if total <= 1 else round(100 * (1 - (rank - 1) / (total - 1)), 1)
+    return {
+        'rank': rank,
+        'dense_rank': dense_rank,
+        'percentile': percentile,
+        'total': total,
+    }
+
+
+def invalidate_exam_results(exam_ids):
+    """Drop cached result aggregates after attempts of these exams are finalized."""
+    keys = []
+    for exam_id in set(exam_ids):
+        keys += [_cache_key(exam_id), stats_cache_key(exam_id), item_analysis_cache_key(exam_id)]
+    cache.delete_many(keys)
@@ -0,0 +1,115 @@
+"""Read-replica routing for heavy read-only pages.
+
+Views decorated with ``read_from_replica`` send their reads to the
+``DATABASE_REPLICA_ALIAS`` database (leaderboards, admin statistics and
+dashboard counts, CSV exports), so these scans do not compete with answer
+writes on the primary. Everything else, and every write, uses ``default``.
+
+Replicas lag behind the primary. To keep read-your-writes (a student opening
+their result right after submitting), ``ReplicaPinningMiddleware`` sets a
+short-lived cookie after any unsafe request; while it is present, the
+decorated views of that browser read from the primary. Reads inside an open
+transaction on the primary also stay on the primary.
+
+Pages that redirect on stale state, like the result page bouncing an
+unsubmitted attempt back to the exam, are not routed at all: attempts are
+also finalized during GETs and by the sweeper, which set no pin cookie.
+Results stored in the shared cache (score distributions, exam statistics,
+item analysis) are computed inside ``use_primary()``, so a lagging replica
+cannot keep stale numbers cached for the cache timeout.
+
+Without a configured replica alias, routing is a no-op.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'replica_pin'
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_alias():
+    return getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+
+
+class ReplicaRouter:
+    """Route reads to the replica while a ``read_from_replica`` view runs."""
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias and _use_replica.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the schema through replication
+        return db != replica_alias()
+
+
+def _iterate_on_replica(content):
+    previous = _use_replica.get()
+    _use_replica.set(True)
+    try:
+        yield from content
+    finally:
+        _use_replica.set(previous)
+
+
+def read_from_replica(view):
+    """Run a read-only view (and its streamed body) against the replica."""
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        if not replica_alias() or PIN_COOKIE in request.COOKIES:
+            return view(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+        if response.streaming:
+            # Streamed rows are read after the view has returned
+            response.streaming_content = _iterate_on_replica(response.streaming_content)
+        return response
+    return inner
+
+
+@contextmanager
+def use_primary():
+    """Send the block's reads to the primary, even inside a replica-routed view."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaPinningMiddleware:
+    """Pin a browser's replica reads to the primary for a while after it writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if replica_alias() and request.method in UNSAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,129 @@
+"""Keep the denormalized exam columns in step with question and choice rows.
+
+``Exam.question_count``, ``Exam.total_marks`` and ``Exam.content_version``
+are maintained from ``post_save``/``post_delete`` receivers rather than
+``save()``/``delete()`` overrides, so queryset deletes (the admin "delete
+selected" action, ``clear_existing`` imports) and cascades are covered too.
+Moving a question to another exam refreshes both exams. ``QuerySet.update()``
+and ``bulk_create()`` send no signals; their callers refresh the totals and
+bump the version themselves.
+
+Inside ``batched_exam_bookkeeping()`` the receivers only note which exams
+changed, and each exam is refreshed once when the block ends. Question and
+choice querysets delete inside such a block, so deleting a whole question
+bank costs a few statements rather than several per row. Questions deleted
+together with their exam, and choices deleted together with their question,
+are skipped altogether.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Choice, Exam, Question
+
+_batch = ContextVar('exam_bookkeeping_batch', default=None)
+
+
+def _apply(totals=(), versions=(), questions=()):
+    """Refresh the totals of exams ``totals`` and bump the versions of exams
+    ``versions`` and of the exams owning ``questions``, each once."""
+    for exam_id in sorted(totals):
+        Exam(pk=exam_id).refresh_question_totals()
+    if versions or questions:
+        changed = Q(pk__in=set(versions))
+        if questions:
+            changed |= Q(questions__id__in=set(questions))
+        Exam.objects.filter(changed).update(content_version=F('content_version') + 1)
+
+
+def _schedule(totals=(), versions=(), questions=()):
+    batch = _batch.get()
+    if batch is None:
+        _apply(totals, versions, questions)
+    else:
+        batch['totals'].update(totals)
+        batch['versions'].update(versions)
+        batch['questions'].update(questions)
+
+
+@contextmanager
+def batched_exam_bookkeeping():
+    """Run the block in one transaction, refreshing each changed exam once at its end.
+
+    Nested blocks join the outermost one.
+    """
+    if _batch.get() is not None:
+        yield
+        return
+    batch = {'totals': set(), 'versions': set(), 'questions': set()}
+    token = _batch.set(batch)
+    try:
+        with transaction.atomic():
+            yield
+            _apply(**batch)
+    finally:
+        _batch.reset(token)
+
+
+def _deleted_with(origin, *models):
+    """Whether a delete started from an instance or queryset of ``models``."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+@receiver(pre_save, sender=Question)
+def remember_question_exam(sender, instance, raw=False, **kwargs):
+    """Note which exam an existing question belonged to before this save."""
+    instance._previous_exam_id = None
+    if not raw and not instance._state.adding:
+        instance._previous_exam_id = (
+            Question.objects.filter(pk=instance.pk).values_list('exam_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Question)
+def update_totals_after_question_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created and _batch.get() is None:
+        Exam.objects.filter(pk=instance.exam_id).update(
+            question_count=F('question_count') + 1,
+            total_marks=F('total_marks') + instance.marks,
+            content_version=F('content_version') + 1,
+        )
+        if Question.exam.is_cached(instance):
+            instance.exam.question_count += 1
+            instance.exam.total_marks += instance.marks
+            instance.exam.content_version += 1
+        return
+    exam_ids = {instance.exam_id}
+    previous_exam_id = getattr(instance, '_previous_exam_id', None)
+    if previous_exam_id is not None:
+        exam_ids.add(previous_exam_id)
+    _schedule(totals=exam_ids, versions=exam_ids)
+
+
+@receiver(post_delete, sender=Question)
+def update_totals_after_question_delete(sender, instance, origin=None, **kwargs):
+    if origin is not None and _deleted_with(origin, Exam):
+        return
+    _schedule(totals=[instance.exam_id], versions=[instance.exam_id])
+
+
+@receiver(post_save, sender=Choice)
+def bump_version_after_choice_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _schedule(questions=[instance.question_id])
+
+
+@receiver(post_delete, sender=Choice)
+def bump_version_after_choice_delete(sender, instance, origin=None, **kwargs):
+    # Choices deleted with their question are covered by the question's receiver
+    if origin is not None and _deleted_with(origin, Question, Exam):
+        return
+    _schedule(questions=[instance.question_id])
@@ -0,0 +1,79 @@
+"""Versioned, answer-free snapshots of exam content for delivery views.
+
+A snapshot is a plain dict of an exam's questions and choices, without
+``is_correct`` or explanations, keyed by ``Exam.content_version``. Lookups go
+through a small in-process LRU first and the Django cache second, so during a
+live exam the question bank is read from the database once per version
+rather than once per page view. Admin edits bump the version, which makes
+every cached copy of the previous version unreachable.
+"""
+
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Exam, Choice
+
+
+def _cache_key(exam_id, version, created_stamp):
+    # created_at guards against an id being reused after a rolled-back insert
+    return f'exam-snapshot:{exam_id}:{version}:{created_stamp}'
+
+
+def build_exam_snapshot(exam):
+    """Serialize an exam's questions and choices in two queries."""
+    questions = []
+    by_id = {}
+    for question in exam.questions.order_by('id'):
+        item = {
+            'id': question.id,
+            'text': question.text,
+            'marks': question.marks,
+            'image_url': question.image.url if question.image else '',
+            'time_limit_seconds': question.time_limit_seconds,
+            'choices': [],
+        }
+        questions.append(item)
+        by_id[question.id] = item
+
+    choices = (
+        Choice.objects.filter(question__exam=exam)
+        .order_by('question_id', 'id')
+        .values_list('id', 'question_id', 'text')
+    )
+    for choice_id, question_id, text in choices:
+        by_id[question_id]['choices'].append({'id': choice_id, 'text': text})
+
+    return {
+        'exam_id': exam.id,
+        'version': exam.content_version,
+        'questions': questions,
+    }
+
+
+@lru_cache(maxsize=getattr(settings, 'EXAM_SNAPSHOT_LOCAL_SIZE', 64))
+def _load_snapshot(exam_id, version, created_stamp):
+    key = _cache_key(exam_id, version, created_stamp)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        exam = Exam.objects.get(pk=exam_id)
+        snapshot = build_exam_snapshot(exam)
+        if snapshot['version'] != version:
+            # Edited while we were reading; don't share it under the old version key
+            return snapshot
+        cache.set(key, snapshot, getattr(settings, 'EXAM_SNAPSHOT_CACHE_TIMEOUT', 3600))
+    return snapshot
+
+
+def get_exam_snapshot(exam):
+    """Return the cached snapshot for the exam's current content version.
+
+    The returned dict is shared between requests and must not be mutated.
+    """
+    return _load_snapshot(exam.id, exam.content_version, exam.created_at.timestamp())
+
+
+def clear_local_snapshots():
+    """Drop this process's in-memory snapshots (the shared cache is untouched)."""
+    _load_snapshot.cache_clear()
@@ -0,0 +1,100 @@
+"""Aggregated exam statistics for the admin analytics page.
+
+Every per-question and per-choice count comes from one grouped query over
+``Answer``, and the attempt totals from one aggregate over ``Attempt``, so
+the cost of a page load does not grow with the number of questions. Results
+are cached for ``EXAM_STATS_CACHE_TIMEOUT`` seconds and dropped whenever an
+attempt of the exam is finalized (see ``rankings.invalidate_exam_results``).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q
+
+from .models import Choice
+from .replica import use_primary
+
+# Passing threshold mirrors result_detail (60%)
+PASS_RATIO = 0.6
+
+
+def cache_key(exam_id):
+    return f'exam-stats:{exam_id}'
+
+
+def compute_exam_stats(exam):
+    """Return attempt totals plus per-question and per-choice counts."""
+    # attempts.models imports this module (through rankings) at load time
+    from attempts.models import Answer
+
+    totals = exam.attempts.filter(start_time__isnull=False).aggregate(
+        total_attempts=Count('id'),
+        total_submitted=Count('id', filter=Q(is_submitted=True)),
+        avg_score=Avg('score', filter=Q(is_submitted=True)),
+        passed=Count('id', filter=Q(is_submitted=True, score__gte=exam.total_marks * PASS_RATIO)),
+    )
+
+    questions = {}
+    for question_id, text in exam.questions.order_by('id').values_list('id', 'text'):
+        questions[question_id] = {
+            'question': {'id': question_id, 'text': text},
+            'attempted': 0,
+            'correct': 0,
+            'difficulty': None,
+            'choices': [],
+        }
+    choices = {}
+    for choice_id, question_id, text, is_correct in (
+        Choice.objects.filter(question__exam=exam).order_by('question_id', 'id')
+        .values_list('id', 'question_id', 'text', 'is_correct')
+    ):
+        choice = {'id': choice_id, 'text': text, 'is_correct': is_correct, 'selected': 0, 'share': None}
+        questions[question_id]['choices'].append(choice)
+        choices[choice_id] = choice
+
+    selections = (
+        Answer.objects.filter(attempt__exam=exam, attempt__is_submitted=True, selected_choice__isnull=False)
+        .values('question_id', 'selected_choice_id')
+        .annotate(selected=Count('id'))
+        .order_by()
+    )
+    for row in selections:
+        item = questions.get(row['question_id'])
+        choice = choices.get(row['selected_choice_id'])
+        if item is None or choice is None:
+            continue
+        choice['selected'] = row['selected']
+        item['attempted'] += row['selected']
+        if choice['is_correct']:
+            item['correct'] += row['selected']
+
+    for item in questions.values():
+        if item['attempted']:
+            item['difficulty'] = (item['correct'] / item['attempted']) * 100
+            for choice in item['choices']:
+                choice['share'] = (choice['selected'] / item['attempted']) * 100
+
+    total_submitted = totals['total_submitted']
+    return {
+        'total_attempts': totals['total_attempts'],
+        'total_submitted': total_submitted,
+        'avg_score': (totals['avg_score'] or 0) if total_submitted else None,
+        'pass_rate': (totals['passed'] / total_submitted) * 100 if total_submitted else None,
+        'question_stats': list(questions.values()),
+    }
+
+
+def get_exam_stats(exam):
+    """Cached ``compute_exam_stats``; recomputed after question edits."""
+    key = cache_key(exam.pk)
+    cached = cache.get(key)
+    if cached is not None and cached['content_version'] == exam.content_version:
+        return cached['stats']
+    with use_primary():
+        stats = compute_exam_stats(exam)
+    cache.set(
+        key,
+        {'content_version': exam.content_version, 'stats': stats},
+        getattr(settings, 'EXAM_STATS_CACHE_TIMEOUT', 60),
+    )
+    return stats
@@ -1,9 +1,39 @@
-from django.test import TestCase
-from django.contrib.auth.models import User
+from django.test import TestCase, SimpleTestCase, RequestFactory
+from django.contrib.auth.models import User, Group
 from django.utils import timezone
+from django.urls import reverse
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command, CommandError
+from django.db import router
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import override_settings
+from io import StringIO
+from unittest import mock
+import json
+import unittest
 
-from .models import Exam, Question, Choice, Category
-from attempts.models import Attempt, Answer
+from .models import Exam, Question, Choice, Category, QueuedEmail, ExamNotificationFanout, QuestionImportJob
+from . import email_utils
+from .email_utils import (
+	enqueue_email,
+	deliver_queued_emails,
+	send_exam_completed_email,
+	send_exam_published_email,
+	claim_fanout,
+	run_fanout,
+	FanoutTakenOver,
+)
+from .snapshots import build_exam_snapshot, get_exam_snapshot
+from . import rankings
+from .stats import compute_exam_stats
+from . import item_analysis
+from .replica import read_from_replica, use_primary, ReplicaPinningMiddleware, ReplicaRouter, PIN_COOKIE
+from .pagination import page_queryset
+from .query_plans import QueryPlanAssertions, full_table_scans
+from attempts.models import Attempt, Answer, LeaderboardEntry
 
 
 class ExamModelTests(TestCase):
@@ -101,3 +131,1243 @@ class AttemptScoreTests(TestCase):
 		self.assertEqual(score, 3)
 		self.assertEqual(self.attempt.score, 3)
 
+	def test_calculate_score_uses_constant_queries(self):
+		Answer.objects.create(attempt=self.attempt, question=self.q1_correct.question, selected_choice=self.q1_correct)
+		Answer.objects.create(attempt=self.attempt, question=self.q2_correct.question, selected_choice=self.q2_correct)
+
+		with self.assertNumQueries(2):
+			self.attempt.calculate_score()
+		self.assertEqual(self.attempt.correct_count, 2)
+
+	def test_finalize_scores_exactly_once(self):
+		Answer.objects.create(attempt=self.attempt, question=self.q2_correct.question, selected_choice=self.q2_correct)
+
+		self.assertTrue(self.attempt.finalize())
+		self.assertTrue(self.attempt.is_submitted)
+		self.assertEqual((self.attempt.score, self.attempt.correct_count), (2, 1))
+		first_end_time = self.attempt.end_time
+
+		# A second (racing) submit is a no-op and leaves the result untouched
+		stale = Attempt.objects.get(pk=self.attempt.pk)
+		self.assertFalse(stale.finalize())
+		self.assertEqual(stale.end_time, first_end_time)
+		self.assertEqual(stale.score, 2)
+
+	def test_double_submit_queues_one_email(self):
+		self.user.email = "student@example.com"
+		self.user.save()
+		self.client.login(username="student", password="test123")
+		url = reverse('student:submit_exam', args=[self.exam.id])
+
+		self.client.post(url)
+		self.client.post(url)
+		self.assertEqual(QueuedEmail.objects.filter(recipients=["student@example.com"]).count(), 1)
+
+
+class StudentDashboardTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username="student", password="test123")
+		self.now = timezone.now()
+		self.client.login(username="student", password="test123")
+
+	def _create_exam(self, title):
+		exam = Exam.objects.create(
+			title=title,
+			description="",
+			duration_minutes=30,
+			start_time=self.now - timezone.timedelta(minutes=5),
+			end_time=self.now + timezone.timedelta(minutes=25),
+			is_published=True,
+		)
+		Question.objects.create(exam=exam, text="Q1", marks=2)
+		return exam
+
+	def _dashboard_queries(self):
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+
+		with CaptureQueriesContext(connection) as ctx:
+			response = self.client.get(reverse('student:dashboard'))
+		self.assertEqual(response.status_code, 200)
+		return len(ctx.captured_queries), response
+
+	def test_query_count_does_not_grow_with_exam_count(self):
+		first = self._create_exam("Exam 1")
+		Attempt.objects.create(student=self.user, exam=first, start_time=self.now)
+		baseline, _ = self._dashboard_queries()
+
+		for i in range(2, 8):
+			exam = self._create_exam(f"Exam {i}")
+			if i % 2:
+				Attempt.objects.create(student=self.user, exam=exam, start_time=self.now, is_submitted=True)
+
+		queries, _ = self._dashboard_queries()
+		self.assertEqual(queries, baseline)
+
+	def test_statuses_resolved_per_exam(self):
+		available = self._create_exam("Available Exam")
+		in_progress = self._create_exam("Running Exam")
+		completed = self._create_exam("Done Exam")
+		Attempt.objects.create(student=self.user, exam=in_progress, start_time=self.now)
+		Attempt.objects.create(student=self.user, exam=completed, start_time=self.now, is_submitted=True)
+
+		_, response = self._dashboard_queries()
+		statuses = {item['exam'].id: item['status'] for item in response.context['exam_statuses']}
+		self.assertEqual(statuses[available.id], 'Available')
+		self.assertEqual(statuses[in_progress.id], 'In Progress')
+		self.assertEqual(statuses[completed.id], 'Completed')
+
+	def test_expired_attempt_is_auto_submitted(self):
+		exam = self._create_exam("Expired Exam")
+		attempt = Attempt.objects.create(
+			student=self.user,
+			exam=exam,
+			start_time=self.now - timezone.timedelta(minutes=31),
+		)
+
+		_, response = self._dashboard_queries()
+		attempt.refresh_from_db()
+		self.assertTrue(attempt.is_submitted)
+		self.assertEqual(response.context['exam_statuses'][0]['status'], 'Completed')
+
+
+class FailingEmailBackend(BaseEmailBackend):
+	def send_messages(self, email_messages):
+		raise ConnectionError("relay unavailable")
+
+
+class EmailOutboxTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username="student", password="test123", email="student@example.com")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Outbox Test",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(minutes=5),
+			end_time=now + timezone.timedelta(minutes=25),
+			is_published=True,
+		)
+		self.attempt = Attempt.objects.create(student=self.user, exam=self.exam, start_time=now, is_submitted=True)
+
+	def test_completion_email_is_queued_not_sent(self):
+		send_exam_completed_email(self.attempt)
+		self.assertEqual(len(mail.outbox), 0)
+		queued = QueuedEmail.objects.get()
+		self.assertEqual(queued.recipients, ["student@example.com"])
+		self.assertEqual(queued.status, QueuedEmail.STATUS_PENDING)
+
+	def test_worker_delivers_and_marks_sent(self):
+		send_exam_completed_email(self.attempt)
+		out = StringIO()
+		call_command('send_queued_emails', stdout=out)
+
+		self.assertIn('Sent 1 email(s), 0 failed', out.getvalue())
+		self.assertEqual(len(mail.outbox), 1)
+		self.assertEqual(mail.outbox[0].to, ["student@example.com"])
+		self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.STATUS_SENT)
+
+	@override_settings(EMAIL_BACKEND='exams.tests.FailingEmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+	def test_failures_back_off_then_give_up(self):
+		queued = enqueue_email("Subject", "Body", ["student@example.com"])
+
+		self.assertEqual(deliver_queued_emails(), (0, 1))
+		queued.refresh_from_db()
+		self.assertEqual(queued.status, QueuedEmail.STATUS_PENDING)
+		self.assertEqual(queued.attempts, 1)
+		self.assertGreater(queued.next_attempt_at, timezone.now())
+		self.assertIn("relay unavailable", queued.last_error)
+
+		# Not due yet, so the next run leaves it alone
+		self.assertEqual(deliver_queued_emails(), (0, 0))
+
+		QueuedEmail.objects.filter(pk=queued.pk).update(next_attempt_at=timezone.now())
+		self.assertEqual(deliver_queued_emails(), (0, 1))
+		queued.refresh_from_db()
+		self.assertEqual(queued.status, QueuedEmail.STATUS_FAILED)
+
+
+class ExamPublishedFanoutTests(TestCase):
+	def setUp(self):
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Fanout Test",
+			description="",
+			duration_minutes=30,
+			start_time=now,
+			end_time=now + timezone.timedelta(hours=1),
+			is_published=True,
+		)
+		group = Group.objects.create(name='Student')
+		for i in range(5):
+			user = User.objects.create_user(username=f"student{i}", password="test123", email=f"student{i}@example.com")
+			user.groups.add(group)
+		no_email = User.objects.create_user(username="noemail", password="test123")
+		no_email.groups.add(group)
+
+	def test_each_student_gets_a_personal_message(self):
+		fanout = send_exam_published_email(self.exam)
+		self.assertEqual(len(mail.outbox), 0)
+
+		sent = run_fanout(claim_fanout(), chunk_size=2)
+		self.assertEqual(sent, 5)
+		self.assertEqual([m.to for m in mail.outbox], [[f"student{i}@example.com"] for i in range(5)])
+		self.assertIn("Hi student0,", mail.outbox[0].body)
+
+		fanout.refresh_from_db()
+		self.assertEqual(fanout.status, ExamNotificationFanout.STATUS_DONE)
+		self.assertEqual(fanout.sent_count, 5)
+		self.assertIsNone(claim_fanout())
+
+	def test_resumes_after_checkpoint(self):
+		fanout = send_exam_published_email(self.exam)
+		third = User.objects.get(username="student2")
+		ExamNotificationFanout.objects.filter(pk=fanout.pk).update(last_user_id=third.id, sent_count=3)
+
+		out = StringIO()
+		call_command('send_exam_notifications', '--chunk-size', '10', stdout=out)
+		self.assertIn('2 message(s)', out.getvalue())
+		self.assertEqual([m.to for m in mail.outbox], [["student3@example.com"], ["student4@example.com"]])
+
+	@override_settings(EMAIL_FANOUT_STALE_SECONDS=3, EMAIL_FANOUT_CHUNK_SIZE=2)
+	def test_throttled_worker_keeps_fanout_fresh(self):
+		send_exam_published_email(self.exam)
+		fanout = claim_fanout()
+		clock = [0.0]
+		sleeps = []
+
+		def fake_sleep(seconds):
+			sleeps.append(seconds)
+			clock[0] += seconds
+
+		with mock.patch('exams.email_utils.time', mock.Mock(monotonic=lambda: clock[0], sleep=fake_sleep)), \
+				mock.patch('exams.email_utils._save_fanout_progress', wraps=email_utils._save_fanout_progress) as save:
+			self.assertEqual(run_fanout(fanout, chunk_size=2, rate_limit=1), 5)
+
+		# Stale after two throttled chunks (4s), so heartbeats come at least every 4/3s
+		self.assertEqual(email_utils._fanout_stale_seconds(), 3)
+		with override_settings(EMAIL_FANOUT_RATE_LIMIT=1):
+			self.assertEqual(email_utils._fanout_stale_seconds(), 4)
+		self.assertEqual(sum(sleeps), 5)
+		self.assertLessEqual(max(sleeps), 4 / 3)
+		self.assertGreater(save.call_count, len(sleeps))
+
+	def test_worker_stops_when_fanout_is_taken_over(self):
+		fanout = send_exam_published_email(self.exam)
+
+		def resumed_meanwhile(datatuple, connection=None):
+			# Another worker reclaimed the fan-out and checkpointed past this chunk
+			ExamNotificationFanout.objects.filter(pk=fanout.pk).update(last_user_id=10**6)
+			return len(datatuple)
+
+		with mock.patch('exams.email_utils.send_mass_mail', side_effect=resumed_meanwhile) as send:
+			with self.assertRaises(FanoutTakenOver):
+				run_fanout(claim_fanout(), chunk_size=2)
+		self.assertEqual(send.call_count, 1)
+		fanout.refresh_from_db()
+		self.assertEqual((fanout.status, fanout.sent_count), (ExamNotificationFanout.STATUS_RUNNING, 0))
+
+
+class ExamQuestionTotalsTests(TestCase):
+	def setUp(self):
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Totals Test",
+			description="",
+			duration_minutes=30,
+			start_time=now,
+			end_time=now + timezone.timedelta(hours=1),
+		)
+
+	def test_totals_follow_question_changes(self):
+		q1 = Question.objects.create(exam=self.exam, text="Q1", marks=2)
+		Question.objects.create(exam=self.exam, text="Q2", marks=3)
+		self.exam.refresh_from_db()
+		self.assertEqual((self.exam.question_count, self.exam.total_marks), (2, 5))
+
+		q1.marks = 4
+		q1.save()
+		self.exam.refresh_from_db()
+		self.assertEqual((self.exam.question_count, self.exam.total_marks), (2, 7))
+
+		q1.delete()
+		self.exam.refresh_from_db()
+		self.assertEqual((self.exam.question_count, self.exam.total_marks), (1, 3))
+
+	def test_bulk_delete_refreshes_totals(self):
+		Question.objects.create(exam=self.exam, text="Q1", marks=2)
+		Question.objects.create(exam=self.exam, text="Q2", marks=3)
+		Question.objects.create(exam=self.exam, text="Q3", marks=4)
+		self.exam.questions.filter(marks__lt=4).delete()
+		self.exam.refresh_from_db()
+		self.assertEqual((self.exam.question_count, self.exam.total_marks), (1, 4))
+
+		self.exam.questions.all().delete()
+		self.exam.refresh_from_db()
+		self.assertEqual((self.exam.question_count, self.exam.total_marks), (0, 0))
+
+	def test_stale_exam_save_keeps_denormalized_columns(self):
+		stale = Exam.objects.get(pk=self.exam.pk)
+		Question.objects.create(exam=self.exam, text="Q1", marks=2)
+		stale.title = "Renamed"
+		stale.save()
+
+		self.exam.refresh_from_db()
+		self.assertEqual(self.exam.title, "Renamed")
+		self.assertEqual((self.exam.question_count, self.exam.total_marks, self.exam.content_version), (1, 2, 2))
+
+	def _delete_cost(self, count):
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		questions = Question.objects.bulk_create([Question(exam=self.exam, text=f"Q{i}", marks=1) for i in range(count)])
+		Choice.objects.bulk_create([
+			Choice(question=question, text=text, is_correct=text == "a")
+			for question in questions for text in "abcd"
+		])
+		with CaptureQueriesContext(connection) as queries:
+			self.exam.questions.all().delete()
+		return len(queries)
+
+	def test_bulk_delete_refreshes_each_exam_once(self):
+		self.assertEqual(self._delete_cost(3), self._delete_cost(20))
+		self.exam.refresh_from_db()
+		self.assertEqual((self.exam.question_count, self.exam.total_marks), (0, 0))
+
+	def test_deleting_exam_skips_question_bookkeeping(self):
+		Question.objects.bulk_create([Question(exam=self.exam, text=f"Q{i}", marks=1) for i in range(5)])
+		with mock.patch.object(Exam, 'refresh_question_totals') as refresh:
+			self.exam.delete()
+		refresh.assert_not_called()
+
+	def test_moving_question_refreshes_both_exams(self):
+		other = Exam.objects.create(
+			title="Other",
+			description="",
+			duration_minutes=30,
+			start_time=self.exam.start_time,
+			end_time=self.exam.end_time,
+		)
+		question = Question.objects.create(exam=self.exam, text="Q1", marks=2)
+		Question.objects.create(exam=self.exam, text="Q2", marks=3)
+
+		question.exam = other
+		question.save()
+		self.exam.refresh_from_db()
+		other.refresh_from_db()
+		self.assertEqual((self.exam.question_count, self.exam.total_marks), (1, 3))
+		self.assertEqual((other.question_count, other.total_marks), (1, 2))
+
+	def test_reading_totals_does_not_query(self):
+		Question.objects.create(exam=self.exam, text="Q1", marks=2)
+		exam = Exam.objects.get(pk=self.exam.pk)
+		with self.assertNumQueries(0):
+			self.assertEqual(exam.total_questions(), 1)
+			self.assertEqual(exam.total_marks, 2)
+
+	def test_recompute_command_repairs_drift(self):
+		Question.objects.create(exam=self.exam, text="Q1", marks=2)
+		Exam.objects.filter(pk=self.exam.pk).update(question_count=9, total_marks=0)
+
+		with self.assertRaises(CommandError):
+			call_command('recompute_exam_totals', '--check', stdout=StringIO())
+
+		call_command('recompute_exam_totals', stdout=StringIO())
+		self.exam.refresh_from_db()
+		self.assertEqual((self.exam.question_count, self.exam.total_marks), (1, 2))
+		call_command('recompute_exam_totals', '--check', stdout=StringIO())
+
+
+
+class ExamSnapshotTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username="student", password="test123")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Snapshot Test",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(minutes=5),
+			end_time=now + timezone.timedelta(minutes=25),
+			is_published=True,
+		)
+		self.question = Question.objects.create(exam=self.exam, text="What is 2 + 2?", marks=1)
+		self.correct = Choice.objects.create(question=self.question, text="4", is_correct=True)
+		Choice.objects.create(question=self.question, text="5", is_correct=False)
+		Attempt.objects.create(student=self.user, exam=self.exam, start_time=now)
+		self.client.login(username="student", password="test123")
+
+	def test_snapshot_hides_correct_answers(self):
+		snapshot = build_exam_snapshot(self.exam)
+		self.assertEqual([q['text'] for q in snapshot['questions']], ["What is 2 + 2?"])
+		self.assertEqual(snapshot['questions'][0]['choices'][0], {'id': self.correct.id, 'text': "4"})
+		self.assertNotIn('is_correct', str(snapshot))
+
+	def test_snapshot_is_reused_until_content_changes(self):
+		self.exam.refresh_from_db()
+		first = get_exam_snapshot(self.exam)
+		with self.assertNumQueries(0):
+			self.assertIs(get_exam_snapshot(self.exam), first)
+
+		self.question.text = "What is 3 + 3?"
+		self.question.save()
+		self.exam.refresh_from_db()
+		self.assertEqual(get_exam_snapshot(self.exam)['questions'][0]['text'], "What is 3 + 3?")
+
+	def test_choice_edits_bump_version(self):
+		self.exam.refresh_from_db()
+		version = self.exam.content_version
+		Choice.objects.create(question=self.question, text="6", is_correct=False)
+		self.exam.refresh_from_db()
+		self.assertEqual(self.exam.content_version, version + 1)
+
+	def test_admin_question_edit_bumps_version_once(self):
+		User.objects.create_superuser(username="boss", password="test123", email="boss@example.com")
+		self.client.login(username="boss", password="test123")
+		self.exam.refresh_from_db()
+		version = self.exam.content_version
+		data = {
+			'text': "What is 3 + 3?",
+			'marks': 1,
+			'explanation': "",
+			'form-TOTAL_FORMS': 4,
+			'form-INITIAL_FORMS': 0,
+		}
+		for i, text in enumerate("5678"):
+			data[f'form-{i}-text'] = text
+			if text == "6":
+				data[f'form-{i}-is_correct'] = 'on'
+		response = self.client.post(reverse('admin-panel:question_edit', args=[self.question.id]), data)
+		self.assertRedirects(response, reverse('admin-panel:question_list', args=[self.exam.id]))
+		self.exam.refresh_from_db()
+		self.assertEqual(self.exam.content_version, version + 1)
+		self.assertEqual(self.question.choices.get(is_correct=True).text, "6")
+
+	def test_bulk_deletes_bump_version(self):
+		self.exam.refresh_from_db()
+		self.assertEqual(len(get_exam_snapshot(self.exam)['questions'][0]['choices']), 2)
+
+		self.question.choices.filter(is_correct=False).delete()
+		self.exam.refresh_from_db()
+		self.assertEqual(len(get_exam_snapshot(self.exam)['questions'][0]['choices']), 1)
+
+		Question.objects.filter(exam=self.exam).delete()
+		self.exam.refresh_from_db()
+		self.assertEqual(get_exam_snapshot(self.exam)['questions'], [])
+
+	def test_take_exam_renders_from_snapshot(self):
+		url = reverse('student:take_exam', args=[self.exam.id])
+		response = self.client.get(url)
+		self.assertContains(response, "What is 2 + 2?")
+		self.assertEqual(Answer.objects.filter(question=self.question).count(), 1)
+
+		response = self.client.get(reverse('student:review_exam', args=[self.exam.id]))
+		self.assertContains(response, "No answer selected")
+
+
+class SinglePageDeliveryTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username="student", password="test123")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Single Page Test",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(minutes=5),
+			end_time=now + timezone.timedelta(minutes=25),
+			is_published=True,
+			single_page_delivery=True,
+		)
+		self.questions = []
+		for i in range(3):
+			question = Question.objects.create(exam=self.exam, text=f"Q{i}", marks=1)
+			Choice.objects.create(question=question, text="right", is_correct=True)
+			Choice.objects.create(question=question, text="wrong", is_correct=False)
+			self.questions.append(question)
+		self.attempt = Attempt.objects.create(student=self.user, exam=self.exam, start_time=now)
+		answered = self.questions[1]
+		Answer.objects.create(attempt=self.attempt, question=answered, selected_choice=answered.choices.first())
+		self.client.login(username="student", password="test123")
+
+	def test_take_exam_renders_single_page_shell(self):
+		response = self.client.get(reverse('student:take_exam', args=[self.exam.id]))
+		self.assertTemplateUsed(response, 'exams/take_exam_single.html')
+		self.assertContains(response, reverse('student:exam_payload', args=[self.exam.id]))
+
+	def test_payload_contains_whole_exam_and_answers(self):
+		response = self.client.get(reverse('student:exam_payload', args=[self.exam.id]))
+		data = response.json()
+
+		self.assertTrue(data['success'])
+		self.assertEqual([q['text'] for q in data['questions']], ["Q0", "Q1", "Q2"])
+		self.assertNotIn('is_correct', response.content.decode())
+		answered = self.questions[1]
+		self.assertEqual(data['answers'], {str(answered.id): answered.choices.first().id})
+		self.assertEqual(data['deadline'], self.attempt.deadline.isoformat())
+		self.assertGreater(data['time_remaining'], 0)
+
+	def test_payload_points_submitted_attempts_to_results(self):
+		self.attempt.finalize()
+		data = self.client.get(reverse('student:exam_payload', args=[self.exam.id])).json()
+		self.assertFalse(data['success'])
+		self.assertEqual(data['redirect'], reverse('results:result_detail', args=[self.attempt.id]))
+
+
+class SyncAnswersTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username="student", password="test123")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Sync Test",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(minutes=5),
+			end_time=now + timezone.timedelta(minutes=25),
+			is_published=True,
+		)
+		self.q1 = Question.objects.create(exam=self.exam, text="Q1", marks=1)
+		self.q1_a = Choice.objects.create(question=self.q1, text="A", is_correct=True)
+		self.q1_b = Choice.objects.create(question=self.q1, text="B")
+		self.q2 = Question.objects.create(exam=self.exam, text="Q2", marks=1)
+		self.q2_a = Choice.objects.create(question=self.q2, text="A", is_correct=True)
+		self.attempt = Attempt.objects.create(student=self.user, exam=self.exam, start_time=now)
+		Answer.objects.create(attempt=self.attempt, question=self.q1)
+		self.url = reverse('student:sync_answers', args=[self.exam.id])
+		self.client.login(username="student", password="test123")
+
+	def _sync(self, changes):
+		return self.client.post(self.url, data=json.dumps({'changes': changes}), content_type='application/json').json()
+
+	def _selected(self):
+		return dict(self.attempt.answers.values_list('question_id', 'selected_choice_id'))
+
+	def test_batch_applies_newest_change_per_question(self):
+		data = self._sync([
+			{'question_id': self.q1.id, 'choice_id': self.q1_a.id, 'seq': 1},
+			{'question_id': self.q2.id, 'choice_id': self.q2_a.id, 'seq': 2},
+			{'question_id': self.q1.id, 'choice_id': self.q1_b.id, 'seq': 3},
+		])
+		self.assertEqual((data['success'], data['ack'], data['applied']), (True, 3, 2))
+		self.assertEqual(self._selected(), {self.q1.id: self.q1_b.id, self.q2.id: self.q2_a.id})
+
+	def test_replayed_changes_are_ignored(self):
+		self._sync([{'question_id': self.q1.id, 'choice_id': self.q1_b.id, 'seq': 5}])
+		data = self._sync([{'question_id': self.q1.id, 'choice_id': self.q1_a.id, 'seq': 4}])
+		self.assertEqual((data['ack'], data['applied']), (5, 0))
+		self.assertEqual(self._selected()[self.q1.id], self.q1_b.id)
+
+	def test_stale_batch_from_racing_request_is_skipped(self):
+		# Both requests loaded the attempt before either wrote; the newer batch commits first
+		stale_view = Attempt.objects.get(pk=self.attempt.pk)
+		self.assertEqual(self.attempt.apply_answer_batch({self.q1.id: self.q1_b.id}, seq=5, change_seqs={self.q1.id: 5}), (5, 1))
+		self.assertEqual(stale_view.apply_answer_batch({self.q1.id: self.q1_a.id}, seq=4, change_seqs={self.q1.id: 4}), (5, 0))
+		self.assertEqual(self._selected()[self.q1.id], self.q1_b.id)
+
+	def test_choice_from_other_question_is_rejected(self):
+		data = self._sync([
+			{'question_id': self.q1.id, 'choice_id': self.q2_a.id, 'seq': 1},
+			{'question_id': self.q2.id, 'choice_id': None, 'seq': 2},
+		])
+		self.assertEqual((data['ack'], data['rejected']), (2, [1]))
+		self.assertEqual(self._selected(), {self.q1.id: None, self.q2.id: None})
+
+	def test_submitted_attempt_is_not_changed(self):
+		self.attempt.finalize()
+		data = self._sync([{'question_id': self.q1.id, 'choice_id': self.q1_a.id, 'seq': 1}])
+		self.assertFalse(data['success'])
+		self.assertEqual(self._selected(), {self.q1.id: None})
+
+
+class GlobalLeaderboardTests(TestCase):
+	def setUp(self):
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Board",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(hours=1),
+			end_time=now + timezone.timedelta(hours=1),
+			is_published=True,
+		)
+		self.questions = []
+		for i in range(2):
+			q = Question.objects.create(exam=self.exam, text=f"Q{i}", marks=5)
+			self.questions.append((q, Choice.objects.create(question=q, text="Right", is_correct=True)))
+
+	def _finish(self, username, correct):
+		user = User.objects.create_user(username=username, password="test123")
+		attempt = Attempt.objects.create(student=user, exam=self.exam, start_time=timezone.now())
+		for question, choice in self.questions[:correct]:
+			Answer.objects.create(attempt=attempt, question=question, selected_choice=choice)
+		attempt.finalize()
+		return user, attempt
+
+	def test_finalize_updates_entry_once(self):
+		user, attempt = self._finish("alice", 1)
+		attempt.finalize()
+		entry = LeaderboardEntry.objects.get(student=user)
+		self.assertEqual((entry.total_score, entry.exams_taken, entry.average_percentage), (5, 1, 50.0))
+
+	def test_page_shows_own_rank_beyond_first_page(self):
+		self._finish("top", 2)
+		self._finish("middle", 1)
+		me, _ = self._finish("me", 0)
+
+		with mock.patch('exams.views.LEADERBOARD_PAGE_SIZE', 2):
+			self.client.login(username="me", password="test123")
+			response = self.client.get(reverse('student:global_leaderboard'))
+			self.assertEqual(response.context['my_rank'], 3)
+			self.assertEqual([row['rank'] for row in response.context['entries']], [1, 2])
+
+			response = self.client.get(reverse('student:global_leaderboard') + '?page=me')
+			self.assertEqual([row['display_name'] for row in response.context['entries']], ["me"])
+			self.assertTrue(response.context['entries'][0]['is_me'])
+
+	def test_rebuild_command_matches_incremental_rows(self):
+		self._finish("alice", 2)
+		self._finish("bob", 1)
+		before = list(LeaderboardEntry.objects.order_by('student_id').values_list('student_id', 'total_score', 'exams_taken', 'average_percentage'))
+		LeaderboardEntry.objects.all().delete()
+
+		out = StringIO()
+		call_command('rebuild_leaderboard', stdout=out)
+		self.assertIn("Rebuilt 2 leaderboard entries", out.getvalue())
+		after = list(LeaderboardEntry.objects.order_by('student_id').values_list('student_id', 'total_score', 'exams_taken', 'average_percentage'))
+		self.assertEqual(before, after)
+
+
+class ExamLeaderboardRankingTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Ranked",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(days=2),
+			end_time=now - timezone.timedelta(days=1),
+			is_published=True,
+		)
+		for username, score in [("ann", 9), ("bob", 7), ("cat", 7), ("dan", 3)]:
+			user = User.objects.create_user(username=username, password="test123")
+			Attempt.objects.create(student=user, exam=self.exam, start_time=now, is_submitted=True, score=score)
+
+	def test_window_ranks_and_percentiles(self):
+		rows = [(a.student.username, a.rank, a.dense_rank) for a in rankings.ranked_attempts(self.exam)]
+		self.assertEqual(rows, [("ann", 1, 1), ("bob", 2, 2), ("cat", 2, 2), ("dan", 4, 3)])
+
+	def test_distribution_lookup_matches_window(self):
+		distribution = rankings.get_score_distribution(self.exam)
+		for attempt in rankings.ranked_attempts(self.exam):
+			position = rankings.score_position(distribution, attempt.score)
+			self.assertEqual(position['rank'], attempt.rank)
+			self.assertEqual(position['dense_rank'], attempt.dense_rank)
+			self.assertEqual(position['percentile'], round(100 * (1 - attempt.percent_rank), 1))
+
+	def test_open_exam_position_counted_without_distribution(self):
+		Exam.objects.filter(pk=self.exam.pk).update(end_time=timezone.now() + timezone.timedelta(hours=1))
+		self.exam.refresh_from_db()
+		with mock.patch.object(rankings, 'get_score_distribution') as distribution:
+			for attempt in rankings.ranked_attempts(self.exam):
+				with self.assertNumQueries(3):
+					position = rankings.exam_position(self.exam, attempt.score)
+				self.assertEqual(position['rank'], attempt.rank)
+				self.assertEqual(position['dense_rank'], attempt.dense_rank)
+				self.assertEqual(position['percentile'], round(100 * (1 - attempt.percent_rank), 1))
+		distribution.assert_not_called()
+
+	def test_closed_exam_distribution_cached_until_finalize(self):
+		rankings.get_score_distribution(self.exam)
+		with self.assertNumQueries(0):
+			rankings.get_score_distribution(self.exam)
+
+		user = User.objects.create_user(username="eve", password="test123")
+		attempt = Attempt.objects.create(student=user, exam=self.exam, start_time=timezone.now())
+		attempt.finalize()
+		scores, _ = rankings.get_score_distribution(self.exam)
+		self.assertEqual(len(scores), 5)
+
+	def test_my_position_and_page(self):
+		self.client.login(username="dan", password="test123")
+		with mock.patch('exams.views.LEADERBOARD_PAGE_SIZE', 2):
+			response = self.client.get(reverse('student:exam_leaderboard', args=[self.exam.id]) + '?page=me')
+		self.assertEqual(response.context['my_position']['rank'], 4)
+		self.assertEqual(response.context['page_obj'].number, 2)
+		self.assertEqual([row['display_name'] for row in response.context['rows']], ["cat", "dan"])
+
+
+class ExamStatsTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.admin = User.objects.create_superuser(username="boss", password="test123", email="boss@example.com")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Stats",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(hours=1),
+			end_time=now + timezone.timedelta(hours=1),
+			is_published=True,
+		)
+		self.choices = []
+		for i in range(3):
+			q = Question.objects.create(exam=self.exam, text=f"Q{i}", marks=1)
+			right = Choice.objects.create(question=q, text="Right", is_correct=True)
+			wrong = Choice.objects.create(question=q, text="Wrong", is_correct=False)
+			self.choices.append((q, right, wrong))
+
+	def _submit(self, username, picks):
+		user = User.objects.create_user(username=username, password="test123")
+		attempt = Attempt.objects.create(student=user, exam=self.exam, start_time=timezone.now())
+		for (question, right, wrong), pick in zip(self.choices, picks):
+			Answer.objects.create(attempt=attempt, question=question, selected_choice=right if pick else wrong)
+		attempt.finalize()
+
+	def test_per_question_and_choice_counts(self):
+		self._submit("a", [True, True, False])
+		self._submit("b", [True, False, False])
+		stats = compute_exam_stats(self.exam)
+
+		first, second, third = stats['question_stats']
+		self.assertEqual((first['attempted'], first['correct'], first['difficulty']), (2, 2, 100.0))
+		self.assertEqual((second['attempted'], second['correct']), (2, 1))
+		self.assertEqual([c['selected'] for c in third['choices']], [0, 2])
+		self.assertEqual(third['choices'][1]['share'], 100.0)
+		self.assertEqual(stats['total_submitted'], 2)
+		self.assertEqual(stats['pass_rate'], 50.0)
+
+	def test_query_count_independent_of_question_count(self):
+		self._submit("a", [True, True, True])
+		with self.assertNumQueries(4):
+			compute_exam_stats(self.exam)
+
+	def test_page_cached_until_attempt_finalized(self):
+		self.client.login(username="boss", password="test123")
+		url = reverse('admin-panel:exam_stats', args=[self.exam.id])
+		self.client.get(url)
+		response = self.client.get(url)
+		self.assertEqual(response.context['total_submitted'], 0)
+
+		self._submit("a", [True, False, False])
+		response = self.client.get(url)
+		self.assertEqual(response.context['total_submitted'], 1)
+		self.assertEqual(response.context['question_stats'][0]['correct'], 1)
+
+
+@unittest.skipUnless(item_analysis.is_available(), "numpy is not installed")
+class ItemAnalysisTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Items",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(hours=1),
+			end_time=now + timezone.timedelta(hours=1),
+			is_published=True,
+		)
+		self.items = []
+		for i in range(2):
+			q = Question.objects.create(exam=self.exam, text=f"Q{i}", marks=1)
+			self.items.append((
+				q,
+				Choice.objects.create(question=q, text="Right", is_correct=True),
+				Choice.objects.create(question=q, text="Wrong", is_correct=False),
+			))
+
+	def _submit(self, username, picks):
+		user = User.objects.create_user(username=username, password="test123")
+		attempt = Attempt.objects.create(student=user, exam=self.exam, start_time=timezone.now())
+		for (question, right, wrong), pick in zip(self.items, picks):
+			Answer.objects.create(attempt=attempt, question=question, selected_choice=right if pick else wrong)
+		attempt.finalize()
+
+	def test_statistics_for_known_matrix(self):
+		for username, picks in [("a", [1, 1]), ("b", [1, 0]), ("c", [0, 1]), ("d", [0, 0])]:
+			self._submit(username, picks)
+
+		analysis = item_analysis.compute_item_analysis(self.exam)
+		self.assertEqual((analysis['attempts'], analysis['questions']), (4, 2))
+		self.assertEqual(analysis['alpha'], 0.0)
+		first = analysis['items'][0]
+		self.assertEqual(first['question_id'], self.items[0][0].id)
+		self.assertEqual((first['difficulty'], first['upper'], first['lower'], first['discrimination']), (0.5, 1.0, 0.0, 1.0))
+		self.assertEqual(first['point_biserial'], 0.0)
+
+	def test_cached_analysis_refreshed_after_finalize(self):
+		self._submit("a", [1, 1])
+		self.assertEqual(item_analysis.get_item_analysis(self.exam)['attempts'], 1)
+		self._submit("b", [0, 1])
+		self.assertEqual(item_analysis.get_item_analysis(self.exam)['attempts'], 2)
+
+	def test_command_prints_item_table(self):
+		self._submit("a", [1, 0])
+		self._submit("b", [0, 0])
+		out = StringIO()
+		call_command('analyze_exam', str(self.exam.id), stdout=out)
+		self.assertIn("2 attempt(s) x 2 question(s)", out.getvalue())
+		self.assertIn(str(self.items[0][0].id), out.getvalue())
+
+
+class QuestionBulkUploadTests(TestCase):
+	HEADER = "question,option1,option2,option3,option4,correct,marks,explanation,time_limit_seconds\n"
+
+	def setUp(self):
+		self.admin = User.objects.create_superuser(username="boss", password="test123", email="boss@example.com")
+		self.client.login(username="boss", password="test123")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Bank",
+			description="",
+			duration_minutes=30,
+			start_time=now,
+			end_time=now + timezone.timedelta(hours=1),
+		)
+		self.url = reverse('admin-panel:question_bulk_upload', args=[self.exam.id])
+
+	def _upload(self, body, clear_existing=False):
+		from django.core.files.uploadedfile import SimpleUploadedFile
+		data = {'file': SimpleUploadedFile("bank.csv", body.encode('utf-8'), content_type="text/csv")}
+		if clear_existing:
+			data['clear_existing'] = 'on'
+		return self.client.post(self.url, data)
+
+	def test_bulk_import_with_constant_queries(self):
+		rows = "".join(f"Q{i},a,b,c,d,{i % 4 + 1},2,,\n" for i in range(50))
+		from .question_import import import_questions
+		with self.assertNumQueries(9):
+			created, errors = import_questions(self.exam, StringIO(self.HEADER + rows), chunk_size=25)
+		self.assertEqual((created, errors), (50, []))
+		self.exam.refresh_from_db()
+		self.assertEqual((self.exam.question_count, self.exam.total_marks), (50, 100))
+		self.assertEqual(Choice.objects.filter(question__exam=self.exam, is_correct=True).count(), 50)
+
+	def test_invalid_rows_reported_by_line(self):
+		body = self.HEADER + "Good,a,b,c,d,b,1,,\n,a,b,c,d,1,,,\nBad,a,b,c,d,7,,,\nMarks,a,b,c,d,1,x,,\n"
+		response = self._upload(body)
+		self.assertEqual(response.status_code, 200)
+		errors = response.context['report']['errors']
+		self.assertEqual([error['line'] for error in errors], [3, 4, 5])
+		self.assertIn("correct must be between 1 and 4", errors[1]['error'])
+		self.assertEqual(self.exam.questions.get().choices.get(is_correct=True).text, "b")
+
+	def test_missing_columns_rejected_without_clearing(self):
+		Question.objects.create(exam=self.exam, text="Keep me", marks=1)
+		response = self._upload("question,option1\nQ,a\n", clear_existing=True)
+		self.assertRedirects(response, self.url)
+		self.assertTrue(self.exam.questions.filter(text="Keep me").exists())
+
+	def test_database_error_rolls_back_whole_import(self):
+		from .question_import import import_questions
+		rows = "".join(f"Q{i},a,b,c,d,1,,,\n" for i in range(4))
+		with mock.patch('exams.question_import.Choice.objects.bulk_create', side_effect=[None, RuntimeError("boom")]):
+			with self.assertRaises(RuntimeError):
+				import_questions(self.exam, StringIO(self.HEADER + rows), chunk_size=2)
+		self.assertEqual(self.exam.questions.count(), 0)
+
+
+class QuestionImportJobTests(TestCase):
+	HEADER = QuestionBulkUploadTests.HEADER
+
+	def setUp(self):
+		import tempfile
+		media = tempfile.TemporaryDirectory()
+		self.addCleanup(media.cleanup)
+		settings_override = override_settings(MEDIA_ROOT=media.name, QUESTION_IMPORT_SYNC_MAX_BYTES=10)
+		settings_override.enable()
+		self.addCleanup(settings_override.disable)
+
+		User.objects.create_superuser(username="boss", password="test123", email="boss@example.com")
+		self.client.login(username="boss", password="test123")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Big bank",
+			description="",
+			duration_minutes=30,
+			start_time=now,
+			end_time=now + timezone.timedelta(hours=1),
+		)
+
+	def _upload(self, rows):
+		from django.core.files.uploadedfile import SimpleUploadedFile
+		body = self.HEADER + "".join(rows)
+		return self.client.post(
+			reverse('admin-panel:question_bulk_upload', args=[self.exam.id]),
+			{'file': SimpleUploadedFile("bank.csv", body.encode('utf-8'), content_type="text/csv")},
+		)
+
+	def test_large_upload_becomes_job_and_reports_progress(self):
+		response = self._upload([f"Q{i},a,b,c,d,1,,,\n" for i in range(5)] + ["Broken,a,b,c,,1,,,\n"])
+		job = QuestionImportJob.objects.get()
+		self.assertRedirects(response, reverse('admin-panel:question_import_job', args=[self.exam.id, job.id]))
+		self.assertEqual(self.exam.questions.count(), 0)
+
+		status_url = reverse('admin-panel:question_import_status', args=[self.exam.id, job.id])
+		self.assertEqual(self.client.get(status_url).json()['status'], 'pending')
+
+		call_command('run_question_imports', '--chunk-size', '2', stdout=StringIO())
+		progress = self.client.get(status_url).json()
+		self.assertEqual(
+			(progress['status'], progress['total_rows'], progress['rows_processed'], progress['questions_created']),
+			('done', 6, 6, 5),
+		)
+		self.assertEqual(progress['errors'], [{'line': 7, 'error': 'option4 empty'}])
+		self.exam.refresh_from_db()
+		self.assertEqual(self.exam.question_count, 5)
+
+	def test_resume_after_crash_does_not_duplicate(self):
+		from . import question_import
+		self._upload([f"Q{i},a,b,c,d,1,,,\n" for i in range(5)])
+		job = QuestionImportJob.objects.get()
+
+		original = question_import._import_chunk
+		calls = []
+
+		def crash_on_second_chunk(exam, chunk):
+			calls.append(chunk)
+			if len(calls) == 2:
+				raise RuntimeError("worker died")
+			return original(exam, chunk)
+
+		with mock.patch('exams.question_import._import_chunk', side_effect=crash_on_second_chunk):
+			call_command('run_question_imports', '--chunk-size', '2', stdout=StringIO(), stderr=StringIO())
+		job.refresh_from_db()
+		self.assertEqual((job.status, job.rows_processed), ('running', 2))
+
+		# The stalled job is reclaimed once it goes stale
+		QuestionImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timezone.timedelta(hours=1))
+		call_command('run_question_imports', '--chunk-size', '2', stdout=StringIO())
+		job.refresh_from_db()
+		self.assertEqual((job.status, job.questions_created), ('done', 5))
+		self.assertEqual(
+			sorted(self.exam.questions.values_list('text', flat=True)),
+			["Q0", "Q1", "Q2", "Q3", "Q4"],
+		)
+
+	def test_worker_stops_when_job_is_taken_over(self):
+		from . import question_import
+		self._upload([f"Q{i},a,b,c,d,1,,,\n" for i in range(5)])
+		job = QuestionImportJob.objects.get()
+		original = question_import._import_chunk
+
+		def reclaimed_meanwhile(exam, chunk):
+			# A second worker reclaims the job and checkpoints the next chunk while this one runs
+			QuestionImportJob.objects.filter(pk=job.pk).update(rows_processed=F('rows_processed') + 2)
+			return original(exam, chunk)
+
+		stderr = StringIO()
+		with mock.patch('exams.question_import._import_chunk', side_effect=reclaimed_meanwhile):
+			call_command('run_question_imports', '--chunk-size', '2', stdout=StringIO(), stderr=stderr)
+		self.assertIn('resumed by another worker', stderr.getvalue())
+		job.refresh_from_db()
+		self.assertEqual((job.status, job.rows_processed), ('running', 4))
+		# Only the first chunk was imported by this worker; the second was left to the new owner
+		self.assertEqual(list(self.exam.questions.values_list('text', flat=True)), ["Q0", "Q1"])
+
+	def test_unreadable_file_marks_job_failed(self):
+		from django.core.files.uploadedfile import SimpleUploadedFile
+		self.client.post(
+			reverse('admin-panel:question_bulk_upload', args=[self.exam.id]),
+			{'file': SimpleUploadedFile("bank.csv", b"question,option1\nQ,a\n", content_type="text/csv")},
+		)
+		call_command('run_question_imports', stdout=StringIO())
+		job = QuestionImportJob.objects.get()
+		self.assertEqual(job.status, 'failed')
+		self.assertIn("Missing required columns", job.error_message)
+
+
+class ExamExportTests(TestCase):
+	def setUp(self):
+		User.objects.create_superuser(username="boss", password="test123", email="boss@example.com")
+		self.client.login(username="boss", password="test123")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Export me",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(hours=1),
+			end_time=now + timezone.timedelta(hours=1),
+			is_published=True,
+		)
+		self.questions = []
+		for i in range(2):
+			q = Question.objects.create(exam=self.exam, text=f"Q{i}", marks=2)
+			choices = [Choice.objects.create(question=q, text=t, is_correct=(t == "b")) for t in "abcd"]
+			self.questions.append((q, choices))
+		self.student = User.objects.create_user(username="stu", password="test123", first_name="Stu")
+		attempt = Attempt.start(self.student, self.exam)
+		Answer.objects.filter(attempt=attempt, question=self.questions[0][0]).update(selected_choice=self.questions[0][1][1])
+		attempt.finalize()
+		self.attempt = attempt
+
+	def _csv(self, response):
+		import csv as csv_module
+		body = b"".join(response.streaming_content).decode('utf-8')
+		return list(csv_module.reader(StringIO(body)))
+
+	def test_attempts_export_streams_rows(self):
+		response = self.client.get(reverse('admin-panel:attempt_export', args=[self.exam.id]))
+		self.assertTrue(response.streaming)
+		self.assertIn('export-me-', response['Content-Disposition'])
+		rows = self._csv(response)
+		self.assertEqual(rows[0][:3], ['attempt_id', 'username', 'first_name'])
+		self.assertEqual(rows[1][1], 'stu')
+		self.assertEqual(rows[1][-4:], ['2', '4', '1', '50.0'])
+
+	def test_answer_grid_export(self):
+		response = self.client.get(reverse('admin-panel:answer_export', args=[self.exam.id]))
+		rows = self._csv(response)
+		self.assertEqual(rows[0], ['attempt_id', 'username', 'submitted', 'score'] + [f'q{q.id}' for q, _ in self.questions])
+		self.assertEqual(rows[1], [str(self.attempt.id), 'stu', '1', '2', '2', ''])
+
+	def test_gzip_export(self):
+		import gzip
+		response = self.client.get(reverse('admin-panel:answer_export', args=[self.exam.id]) + '?gzip=1')
+		self.assertEqual(response['Content-Type'], 'application/gzip')
+		self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+		body = gzip.decompress(b"".join(response.streaming_content)).decode('utf-8')
+		self.assertIn('stu', body)
+
+
+class KeysetPaginationTests(TestCase):
+	def setUp(self):
+		User.objects.create_superuser(username="boss", password="test123", email="boss@example.com")
+		self.client.login(username="boss", password="test123")
+		now = timezone.now()
+		for i in range(7):
+			Exam.objects.create(
+				title=f"Exam {i}",
+				description="",
+				duration_minutes=30,
+				start_time=now,
+				end_time=now + timezone.timedelta(hours=1),
+			)
+		# Ties on created_at must still page deterministically by id
+		Exam.objects.update(created_at=now)
+		self.url = reverse('admin-panel:exam_list')
+
+	def _walk(self, start_url, link):
+		seen, url = [], start_url
+		while url:
+			response = self.client.get(url)
+			page = response.context['exams']
+			seen.append([exam.id for exam in page])
+			url = getattr(page, link) and self.url + getattr(page, link)
+		return seen
+
+	def test_forward_and_backward_walks_cover_every_exam_once(self):
+		expected = list(Exam.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+		with mock.patch('exams.pagination.PAGE_SIZE', 3):
+			forward = self._walk(self.url, 'next_url')
+			self.assertEqual([len(page) for page in forward], [3, 3, 1])
+			self.assertEqual(sum(forward, []), expected)
+
+			last_page = self.client.get(self.url).context['exams']
+			response = self.client.get(self.url + last_page.next_url)
+			backward = self._walk(self.url + response.context['exams'].previous_url, 'previous_url')
+		self.assertEqual(backward[0], expected[:3])
+
+	def test_exam_list_queries_do_not_grow_with_rows(self):
+		with self.assertNumQueries(4):
+			self.client.get(self.url)
+		for i in range(5):
+			Exam.objects.create(
+				title=f"More {i}",
+				description="",
+				duration_minutes=30,
+				start_time=timezone.now(),
+				end_time=timezone.now() + timezone.timedelta(hours=1),
+			)
+		with self.assertNumQueries(4):
+			self.client.get(self.url)
+
+	def test_bad_cursor_shows_first_page(self):
+		response = self.client.get(self.url + '?cursor=garbage')
+		self.assertEqual(len(response.context['exams']), 7)
+		self.assertFalse(response.context['exams'].has_previous)
+
+	def test_question_numbers_continue_across_pages(self):
+		exam = Exam.objects.first()
+		for i in range(4):
+			Question.objects.create(exam=exam, text=f"Q{i}", marks=1)
+		url = reverse('admin-panel:question_list', args=[exam.id])
+		with mock.patch('exams.pagination.PAGE_SIZE', 3):
+			first = self.client.get(url).context['questions']
+			response = self.client.get(url + first.next_url)
+		self.assertEqual(response.context['first_number'], 3)
+		self.assertContains(response, "Question 4")
+
+
+class ConditionalGetTests(TestCase):
+	def setUp(self):
+		now = timezone.now()
+		self.user = User.objects.create_user(username="cond", password="test123")
+		self.exam = Exam.objects.create(
+			title="Conditional",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(hours=1),
+			end_time=now + timezone.timedelta(hours=1),
+			is_published=True,
+		)
+		self.closed = Exam.objects.create(
+			title="Closed",
+			description="",
+			duration_minutes=30,
+			start_time=now - timezone.timedelta(days=2),
+			end_time=now - timezone.timedelta(days=1),
+			is_published=True,
+		)
+		Attempt.objects.create(student=self.user, exam=self.closed, start_time=now - timezone.timedelta(days=2), end_time=now - timezone.timedelta(days=2), is_submitted=True, score=3)
+		self.client.login(username="cond", password="test123")
+
+	def revalidate(self, url):
+		etag = self.client.get(url)['ETag']
+		return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+	def test_exam_detail_not_modified_until_exam_changes(self):
+		url = reverse('student:exam_detail', args=[self.exam.id])
+		first = self.client.get(url)
+		self.assertEqual(first.status_code, 200)
+		self.assertIn('private', first['Cache-Control'])
+
+		# session, user, exam stamp, attempt check
+		with self.assertNumQueries(4):
+			response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+		self.assertEqual(response.status_code, 304)
+
+		self.exam.description = "Now with rules"
+		self.exam.save()
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+	def test_exam_detail_redirects_once_attempt_started(self):
+		url = reverse('student:exam_detail', args=[self.exam.id])
+		etag = self.client.get(url)['ETag']
+		Attempt.start(self.user, self.exam)
+
+		response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 302)
+		self.assertFalse(response.has_header('ETag'))
+
+	def test_closed_leaderboard_not_modified_until_finalize(self):
+		url = reverse('student:exam_leaderboard', args=[self.closed.id])
+		etag = self.client.get(url)['ETag']
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+		late = User.objects.create_user(username="late", password="test123")
+		Attempt.objects.create(student=late, exam=self.closed, start_time=timezone.now()).finalize()
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+	def test_open_leaderboard_is_not_validated(self):
+		response = self.client.get(reverse('student:exam_leaderboard', args=[self.exam.id]))
+		self.assertFalse(response.has_header('ETag'))
+
+	def test_landing_etag_depends_on_viewer(self):
+		url = reverse('landing')
+		self.assertEqual(self.revalidate(url).status_code, 304)
+		etag = self.client.get(url)['ETag']
+		self.client.logout()
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@read_from_replica
+def routed_view(request):
+	return HttpResponse(router.db_for_read(Exam))
+
+
+@read_from_replica
+def routed_stream(request):
+	return StreamingHttpResponse(router.db_for_read(Exam) for _ in range(2))
+
+
+@read_from_replica
+def routed_primary_block(request):
+	with use_primary():
+		return HttpResponse(router.db_for_read(Exam))
+
+
+@override_settings(DATABASE_REPLICA_ALIAS='replica')
+class ReplicaRoutingTests(SimpleTestCase):
+	def setUp(self):
+		self.factory = RequestFactory()
+
+	def test_decorated_view_reads_from_replica(self):
+		self.assertEqual(routed_view(self.factory.get('/')).content, b'replica')
+		# Outside the view everything is back on the primary
+		self.assertEqual(router.db_for_read(Exam), 'default')
+
+	def test_streamed_body_reads_from_replica(self):
+		response = routed_stream(self.factory.get('/'))
+		self.assertEqual(b''.join(response.streaming_content), b'replicareplica')
+
+	def test_pinned_browser_reads_from_primary(self):
+		request = self.factory.get('/')
+		request.COOKIES[PIN_COOKIE] = '1'
+		self.assertEqual(routed_view(request).content, b'default')
+
+	def test_writes_and_migrations_stay_on_primary(self):
+		replica_router = ReplicaRouter()
+		self.assertEqual(replica_router.db_for_write(Exam), 'default')
+		self.assertFalse(replica_router.allow_migrate('replica', 'exams'))
+		self.assertTrue(replica_router.allow_migrate('default', 'exams'))
+
+	def test_unsafe_requests_pin_the_browser(self):
+		middleware = ReplicaPinningMiddleware(lambda request: HttpResponse())
+		self.assertIn(PIN_COOKIE, middleware(self.factory.post('/')).cookies)
+		self.assertNotIn(PIN_COOKIE, middleware(self.factory.get('/')).cookies)
+
+	def test_cached_results_are_computed_on_primary(self):
+		self.assertEqual(routed_primary_block(self.factory.get('/')).content, b'default')
+
+	@override_settings(DATABASE_REPLICA_ALIAS=None)
+	def test_no_replica_configured(self):
+		self.assertEqual(routed_view(self.factory.get('/')).content, b'default')
+		middleware = ReplicaPinningMiddleware(lambda request: HttpResponse())
+		self.assertNotIn(PIN_COOKIE, middleware(self.factory.post('/')).cookies)
+
+
+class HotQueryPlanTests(QueryPlanAssertions, TestCase):
+	def setUp(self):
+		now = timezone.now()
+		self.user = User.objects.create_user(username="planner", password="test123")
+		self.exam = Exam.objects.create(
+			title="Plans",
+			description="",
+			duration_minutes=10,
+			start_time=now,
+			end_time=now + timezone.timedelta(hours=1),
+			is_published=True,
+		)
+		self.question = Question.objects.create(exam=self.exam, text="Q1")
+
+	def test_exam_leaderboard_uses_rank_index(self):
+		self.assertIndexed(rankings.ranked_attempts(self.exam), index='attempt_exam_rank_idx')
+		self.assertIndexed(rankings.submitted_scores(self.exam), index='attempt_exam_rank_idx')
+		self.assertIndexed(rankings.attempts_above(self.exam, 5), index='attempt_exam_rank_idx')
+
+	def test_recent_attempts_use_student_index(self):
+		self.assertIndexed(Attempt.recent_for(self.user), index='attempt_student_recent_idx')
+
+	def test_profile_history_pages_use_history_index(self):
+		history = Attempt.history_for(self.user)
+		self.assertIndexed(page_queryset(history, Attempt.HISTORY_ORDER), index='attempt_student_history_idx')
+		later_page = page_queryset(history, Attempt.HISTORY_ORDER, values=[timezone.now(), 10])
+		self.assertIndexed(later_page, index='attempt_student_history_idx')
+
+	def test_dashboard_exam_list_uses_published_index(self):
+		self.assertIndexed(Exam.published_recent(), index='exam_published_recent_idx')
+
+	def test_correct_choice_lookups_use_partial_index(self):
+		self.assertIndexed(self.question.correct_choices(), index='choice_correct_idx')
+		self.assertIndexed(Choice.correct_for_exams([self.exam.id]), index='choice_correct_idx')
+
+	def test_unindexed_filter_is_reported(self):
+		self.assertEqual(full_table_scans(Exam.objects.filter(description="x")), ['exams_exam'])
+
+	def test_unsupported_database_skips(self):
+		from django.db import connection
+		from unittest import SkipTest
+		with mock.patch.object(connection, 'vendor', 'oracle'):
+			self.assertIsNone(full_table_scans(Exam.published_recent()))
+			with self.assertRaises(SkipTest):
+				self.assertIndexed(Exam.published_recent())
@@ -11,7 +11,9 @@ urlpatterns = [
     path('exam/<int:exam_id>/', views.exam_detail, name='exam_detail'),
     path('exam/<int:exam_id>/start/', views.start_exam, name='start_exam'),
     path('exam/<int:exam_id>/take/', views.take_exam, name='take_exam'),
+    path('exam/<int:exam_id>/payload/', views.exam_payload, name='exam_payload'),
     path('exam/<int:exam_id>/review/', views.review_exam, name='review_exam'),
     path('exam/<int:exam_id>/save-answer/', views.save_answer, name='save_answer'),
+    path('exam/<int:exam_id>/sync-answers/', views.sync_answers, name='sync_answers'),
     path('exam/<int:exam_id>/submit/', views.submit_exam, name='submit_exam'),
 ]
\ No newline at end of file
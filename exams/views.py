@@ -2,16 +2,32 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.urls import reverse
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 import json
 
 from .models import Exam, Question, Choice, Category
 from .email_utils import send_exam_completed_email
-from attempts.models import Attempt, Answer
-from django.db.models import Sum, Count, F
+from .snapshots import get_exam_snapshot
+from . import rankings
+from .pagination import keyset_paginate
+from .conditional import conditional_page
+from .replica import read_from_replica
+from attempts.models import Attempt, Answer, LeaderboardEntry
+from attempts import buffer as answer_buffer
+from django.core.paginator import Paginator
+from django.db.models import Count, Max
 
+LEADERBOARD_PAGE_SIZE = 50
 
+
+def _landing_stamp(request):
+    # Static apart from the viewer's role, which the ETag already includes
+    return (), None
+
+
+@conditional_page(_landing_stamp)
 def landing(request):
     """Public landing page with role-based CTAs.
 
@@ -24,44 +40,49 @@ def landing(request):
 
 @login_required
 def student_dashboard(request):
-    """Student dashboard showing available exams"""
-    exams = Exam.objects.filter(is_published=True).order_by('-created_at')
+    """Student dashboard showing available exams.
+
+    Exam rows and the student's attempts are each loaded once, so the number
+    of queries does not grow with the number of published exams.
+    """
+    exams = Exam.published_recent()
     category_id = request.GET.get('category')
     if category_id:
         exams = exams.filter(category_id=category_id)
+    exams = list(exams)
+
+    attempts_by_exam = {
+        attempt.exam_id: attempt
+        for attempt in Attempt.objects.filter(student=request.user, exam__in=[exam.id for exam in exams], start_time__isnull=False)
+    }
     exam_statuses = []
-    
+
     for exam in exams:
-        try:
-            attempt = Attempt.objects.get(student=request.user, exam=exam)
+        attempt = attempts_by_exam.get(exam.id)
+        if attempt is not None:
+            # Reuse the exam row already loaded above instead of refetching it
+            attempt.exam = exam
             if attempt.is_submitted:
                 status = 'Completed'
             elif attempt.is_expired():
                 # Auto-submit expired attempt
-                attempt.is_submitted = True
-                attempt.end_time = timezone.now()
-                attempt.calculate_score()
-                send_exam_completed_email(attempt)
+                if attempt.finalize():
+                    send_exam_completed_email(attempt)
                 status = 'Completed'
             else:
                 status = 'In Progress'
-        except Attempt.DoesNotExist:
-            if exam.is_active():
-                status = 'Available'
-            else:
-                status = 'Not Available'
-        
+        elif exam.is_active():
+            status = 'Available'
+        else:
+            status = 'Not Available'
+
         exam_statuses.append({
             'exam': exam,
             'status': status,
-            'attempt': attempt if 'attempt' in locals() else None
+            'attempt': attempt,
         })
-        
-        # Clear attempt variable for next iteration
-        if 'attempt' in locals():
-            del attempt
-    
-    recent_attempts = Attempt.objects.filter(student=request.user).select_related('exam').order_by('-end_time', '-start_time')[:5]
+
+    recent_attempts = Attempt.recent_for(request.user)
     categories = Category.objects.all()
 
     return render(request, 'exams/student_dashboard.html', {
@@ -74,8 +95,8 @@ def student_dashboard(request):
 
 @login_required
 def student_profile(request):
-    """Student profile with basic info and exam history"""
-    attempts = Attempt.objects.filter(student=request.user).select_related('exam').order_by('-end_time', '-start_time')
+    """Student profile with basic info and exam history, newest first"""
+    attempts = keyset_paginate(request, Attempt.history_for(request.user), Attempt.HISTORY_ORDER)
 
     return render(request, 'exams/profile.html', {
         'attempts': attempts,
@@ -83,61 +104,94 @@ def student_profile(request):
 
 
 @login_required
+@read_from_replica
 def global_leaderboard(request):
     """Global leaderboard across all submitted attempts.
 
     Ranks students by total score across all exams, then by average percentage.
+    Reads the materialized ``LeaderboardEntry`` table one page at a time, and
+    shows the current student's own rank even when it is off the page.
     """
 
-    submitted = Attempt.objects.filter(is_submitted=True).select_related('student', 'exam')
+    paginator = Paginator(LeaderboardEntry.ranked(), LEADERBOARD_PAGE_SIZE)
 
-    leaderboard = (
-        submitted.values('student_id', 'student__username', 'student__first_name', 'student__last_name')
-        .annotate(
-            exams_taken=Count('id'),
-            total_score=Sum('score'),
-        )
-        .order_by('-total_score', 'student__username')[:50]
-    )
+    my_entry = LeaderboardEntry.objects.filter(student=request.user).first()
+    my_rank = my_entry.rank() if my_entry else None
+    page_number = request.GET.get('page')
+    if page_number == 'me' and my_rank:
+        page_number = (my_rank - 1) // LEADERBOARD_PAGE_SIZE + 1
+    page = paginator.get_page(page_number)
 
-    # Attach a simple display name
     entries = []
-    for rank, row in enumerate(leaderboard, start=1):
-        full_name = (row.get('student__first_name') or '').strip()
-        if row.get('student__last_name'):
-            full_name = (full_name + ' ' + row.get('student__last_name')).strip()
-        display_name = full_name or row.get('student__username')
+    for rank, entry in enumerate(page, start=page.start_index()):
         entries.append({
             'rank': rank,
-            'display_name': display_name,
-            'exams_taken': row['exams_taken'],
-            'total_score': row['total_score'],
+            'display_name': entry.student.get_full_name() or entry.student.username,
+            'exams_taken': entry.exams_taken,
+            'total_score': entry.total_score,
+            'average_percentage': entry.average_percentage,
+            'is_me': entry.student_id == request.user.id,
         })
 
     return render(request, 'exams/global_leaderboard.html', {
         'entries': entries,
+        'page_obj': page,
+        'my_entry': my_entry,
+        'my_rank': my_rank,
     })
 
 
+def _exam_leaderboard_stamp(request, exam_id):
+    """Version of a closed exam's leaderboard; open exams are not validated"""
+    exam = Exam.objects.filter(id=exam_id).first()
+    if exam is None or not rankings.is_closed(exam):
+        return None
+    results = Attempt.objects.filter(exam_id=exam_id, is_submitted=True).aggregate(
+        submitted=Count('id'),
+        last_end=Max('end_time'),
+        last_result=Max('result__created_at'),
+    )
+    stamps = (exam.updated_at, exam.total_marks, results['submitted'], results['last_end'], results['last_result'])
+    return stamps, max(stamp for stamp in (exam.updated_at, results['last_end'], results['last_result']) if stamp)
+
+
 @login_required
+@read_from_replica
+@conditional_page(_exam_leaderboard_stamp)
 def exam_leaderboard(request, exam_id):
-    """Leaderboard for a specific exam (submitted attempts only)."""
+    """Leaderboard for a specific exam (submitted attempts only).
+
+    Ranks and percentiles come from window functions over all submitted
+    attempts; the current student's own position comes from indexed counts
+    while the exam is open and from the cached score distribution once it has
+    closed. ``?page=me`` opens the page containing that student.
+    """
 
     exam = get_object_or_404(Exam, id=exam_id)
 
-    attempts = (
-        Attempt.objects.filter(exam=exam, is_submitted=True)
-        .select_related('student')
-        .order_by('-score', 'student__username')[:50]
+    my_attempt = (
+        Attempt.objects.filter(exam=exam, student=request.user, is_submitted=True)
+        .select_related('exam', 'student')
+        .first()
     )
+    my_position = None
+    if my_attempt is not None:
+        my_position = rankings.exam_position(exam, my_attempt.score)
+
+    page_number = request.GET.get('page')
+    if page_number == 'me' and my_attempt is not None:
+        page_number = rankings.position_in_order(my_attempt) // LEADERBOARD_PAGE_SIZE + 1
+    page = Paginator(rankings.ranked_attempts(exam), LEADERBOARD_PAGE_SIZE).get_page(page_number)
 
-    total_marks = exam.total_marks() or 1
+    total_marks = exam.total_marks or 1
     rows = []
-    for rank, attempt in enumerate(attempts, start=1):
+    for attempt in page:
         percentage = round((attempt.score / total_marks) * 100, 2)
         full_name = attempt.student.get_full_name() or attempt.student.username
         rows.append({
-            'rank': rank,
+            'rank': attempt.rank,
+            'dense_rank': attempt.dense_rank,
+            'percentile': round(100 * (1 - attempt.percent_rank), 1),
             'student': attempt.student,
             'display_name': full_name,
             'score': attempt.score,
@@ -148,25 +202,43 @@ def exam_leaderboard(request, exam_id):
     return render(request, 'exams/exam_leaderboard.html', {
         'exam': exam,
         'rows': rows,
+        'page_obj': page,
+        'my_attempt': my_attempt,
+        'my_position': my_position,
     })
 
 
+def _exam_detail_stamp(request, exam_id):
+    """Version of the pre-start page; students with an attempt are redirected instead"""
+    row = (
+        Exam.objects.filter(id=exam_id, is_published=True)
+        .values_list('updated_at', 'content_version', 'question_count', 'start_time', 'end_time', 'category__name')
+        .first()
+    )
+    if row is None or Attempt.objects.filter(student=request.user, exam_id=exam_id, start_time__isnull=False).exists():
+        return None
+    start_time, end_time = row[3], row[4]
+    now = timezone.now()
+    # No Last-Modified: the page also turns into a redirect when the exam window
+    # opens or closes, which only the ETag captures
+    return row + (start_time <= now <= end_time,), None
+
+
 @login_required
+@conditional_page(_exam_detail_stamp)
 def exam_detail(request, exam_id):
     """Show exam details before starting"""
     exam = get_object_or_404(Exam, id=exam_id, is_published=True)
     
     # Check if user already has an attempt
     try:
-        attempt = Attempt.objects.get(student=request.user, exam=exam)
+        attempt = Attempt.objects.get(student=request.user, exam=exam, start_time__isnull=False)
         if attempt.is_submitted:
             return redirect('results:result_detail', attempt_id=attempt.id)
         elif attempt.is_expired():
             # Auto-submit expired attempt
-            attempt.is_submitted = True
-            attempt.end_time = timezone.now()
-            attempt.calculate_score()
-            send_exam_completed_email(attempt)
+            if attempt.finalize():
+                send_exam_completed_email(attempt)
             return redirect('results:result_detail', attempt_id=attempt.id)
         else:
             # Continue existing attempt
@@ -191,9 +263,10 @@ def start_exam(request, exam_id):
         messages.error(request, 'This exam is not currently available.')
         return redirect('student:dashboard')
     
-    # Check if user already has an attempt
+    # Check if user already has a started attempt; pre-provisioned ones
+    # are started below like a new attempt
     try:
-        attempt = Attempt.objects.get(student=request.user, exam=exam)
+        attempt = Attempt.objects.get(student=request.user, exam=exam, start_time__isnull=False)
         if attempt.is_submitted:
             messages.info(request, 'You have already completed this exam.')
             return redirect('results:result_detail', attempt_id=attempt.id)
@@ -203,20 +276,7 @@ def start_exam(request, exam_id):
         pass
     
     if request.method == 'POST':
-        # Create new attempt
-        attempt = Attempt.objects.create(
-            student=request.user,
-            exam=exam,
-            start_time=timezone.now()
-        )
-        
-        # Create answer objects for all questions
-        for question in exam.questions.all():
-            Answer.objects.create(
-                attempt=attempt,
-                question=question
-            )
-        
+        Attempt.start(request.user, exam)
         messages.success(request, 'Exam started! Good luck!')
         return redirect('student:take_exam', exam_id=exam.id)
     
@@ -230,7 +290,7 @@ def take_exam(request, exam_id):
     
     # Get the attempt
     try:
-        attempt = Attempt.objects.get(student=request.user, exam=exam)
+        attempt = Attempt.objects.get(student=request.user, exam=exam, start_time__isnull=False)
     except Attempt.DoesNotExist:
         messages.error(request, 'No active attempt found. Please start the exam first.')
         return redirect('student:exam_detail', exam_id=exam.id)
@@ -241,34 +301,41 @@ def take_exam(request, exam_id):
     
     # Check if expired
     if attempt.is_expired():
-        attempt.is_submitted = True
-        attempt.end_time = timezone.now()
-        attempt.calculate_score()
-        send_exam_completed_email(attempt)
+        if attempt.finalize():
+            send_exam_completed_email(attempt)
         messages.info(request, 'Time is up! Your exam has been auto-submitted.')
         return redirect('results:result_detail', attempt_id=attempt.id)
+
+    if exam.single_page_delivery:
+        # Questions and answers are fetched once by the page from exam_payload
+        return render(request, 'exams/take_exam_single.html', {
+            'exam': exam,
+            'attempt': attempt,
+            'time_remaining': attempt.time_remaining(),
+        })
     
     # Get current question (from GET parameter, default to first)
     current_question_index = int(request.GET.get('q', 1)) - 1
-    questions = list(exam.questions.all())
+    questions = get_exam_snapshot(exam)['questions']
     
     if current_question_index >= len(questions) or current_question_index < 0:
         current_question_index = 0
     
     current_question = questions[current_question_index]
     
-    # Get existing answer for this question
-    try:
-        answer = Answer.objects.get(attempt=attempt, question=current_question)
-    except Answer.DoesNotExist:
-        answer = Answer.objects.create(attempt=attempt, question=current_question)
-    
     # Get all answers for progress tracking
-    answers = {a.question_id: a.selected_choice_id for a in attempt.answers.all()}
+    answers = dict(attempt.answers.values_list('question_id', 'selected_choice_id'))
+    answers.update(answer_buffer.buffered_selections(attempt))
+
+    # Make sure an answer row exists for this question
+    if current_question['id'] not in answers:
+        Answer.objects.get_or_create(attempt=attempt, question_id=current_question['id'])
+        answers[current_question['id']] = None
     
     context = {
         'exam': exam,
         'attempt': attempt,
+        'questions': questions,
         'current_question': current_question,
         'current_index': current_question_index,
         'total_questions': len(questions),
@@ -279,13 +346,55 @@ def take_exam(request, exam_id):
     return render(request, 'exams/take_exam.html', context)
 
 
+@login_required
+def exam_payload(request, exam_id):
+    """Return the whole exam for single-page delivery in one JSON response.
+
+    Includes the answer-free question snapshot, the student's current answers
+    and the server-side deadline, so the browser can navigate and review
+    without further page loads.
+    """
+    exam = get_object_or_404(Exam, id=exam_id, is_published=True)
+
+    try:
+        attempt = Attempt.objects.get(student=request.user, exam=exam, start_time__isnull=False)
+    except Attempt.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'No active attempt found'})
+
+    if not attempt.is_submitted and attempt.is_expired():
+        if attempt.finalize():
+            send_exam_completed_email(attempt)
+
+    if attempt.is_submitted:
+        return JsonResponse({
+            'success': False,
+            'error': 'Exam already submitted',
+            'redirect': reverse('results:result_detail', args=[attempt.id]),
+        })
+
+    snapshot = get_exam_snapshot(exam)
+    answers = dict(attempt.answers.exclude(selected_choice__isnull=True).values_list('question_id', 'selected_choice_id'))
+    answers.update(answer_buffer.buffered_selections(attempt))
+
+    return JsonResponse({
+        'success': True,
+        'exam': {'id': exam.id, 'title': exam.title, 'version': snapshot['version']},
+        'questions': snapshot['questions'],
+        'answers': {str(question_id): choice_id for question_id, choice_id in answers.items() if choice_id},
+        'deadline': attempt.deadline.isoformat() if attempt.deadline else None,
+        'time_remaining': attempt.time_remaining(),
+        # Client sequence numbers for sync_answers continue from here
+        'ack': answer_buffer.acknowledged_seq(attempt),
+    })
+
+
 @login_required
 def review_exam(request, exam_id):
     """Review all answers before final submission"""
     exam = get_object_or_404(Exam, id=exam_id, is_published=True)
 
     try:
-        attempt = Attempt.objects.get(student=request.user, exam=exam)
+        attempt = Attempt.objects.get(student=request.user, exam=exam, start_time__isnull=False)
     except Attempt.DoesNotExist:
         messages.error(request, 'No active attempt found. Please start the exam first.')
         return redirect('student:exam_detail', exam_id=exam.id)
@@ -293,14 +402,16 @@ def review_exam(request, exam_id):
     if attempt.is_submitted:
         return redirect('results:result_detail', attempt_id=attempt.id)
 
-    questions = list(exam.questions.all())
+    questions = get_exam_snapshot(exam)['questions']
+    choices_by_id = {choice['id']: choice for q in questions for choice in q['choices']}
     # Map question -> selected choice
-    answers_by_qid = {a.question_id: a.selected_choice for a in attempt.answers.select_related('selected_choice', 'question')}
+    answers_by_qid = dict(attempt.answers.values_list('question_id', 'selected_choice_id'))
+    answers_by_qid.update(answer_buffer.buffered_selections(attempt))
 
     questions_with_answers = [
         {
             'question': q,
-            'selected_choice': answers_by_qid.get(q.id),
+            'selected_choice': choices_by_id.get(answers_by_qid.get(q['id'])),
         }
         for q in questions
     ]
@@ -319,7 +430,7 @@ def save_answer(request, exam_id):
     exam = get_object_or_404(Exam, id=exam_id, is_published=True)
 
     try:
-        attempt = Attempt.objects.get(student=request.user, exam=exam)
+        attempt = Attempt.objects.get(student=request.user, exam=exam, start_time__isnull=False)
     except Attempt.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'No active attempt found'})
 
@@ -335,15 +446,13 @@ def save_answer(request, exam_id):
         question = get_object_or_404(Question, id=question_id, exam=exam)
         choice = get_object_or_404(Choice, id=choice_id, question=question) if choice_id else None
 
-        answer, created = Answer.objects.get_or_create(
-            attempt=attempt,
-            question=question,
-            defaults={'selected_choice': choice}
-        )
+        if answer_buffer.is_enabled():
+            answer_buffer.buffer_answers(attempt, {question.id: choice.id if choice else None})
+            return JsonResponse({'success': True})
 
-        if not created:
-            answer.selected_choice = choice
-            answer.save()
+        # One upsert, retried if SQLite reports the database as locked
+        if attempt.apply_answer_batch({question.id: choice.id if choice else None}) is None:
+            return JsonResponse({'success': False, 'error': 'Exam already submitted'})
 
         return JsonResponse({'success': True})
 
@@ -351,6 +460,78 @@ def save_answer(request, exam_id):
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+@require_POST
+@login_required
+def sync_answers(request, exam_id):
+    """Apply a batch of answer changes sent by the client in one request.
+
+    Expects ``{"changes": [{"question_id", "choice_id", "seq"}, ...]}`` where
+    ``seq`` increases with every click on the client. The newest change per
+    question wins, changes already covered by the acknowledged sequence are
+    ignored (checked by ``Attempt.apply_answer_batch`` with the attempt
+    locked), and the response carries the sequence the server has now applied.
+    """
+    exam = get_object_or_404(Exam, id=exam_id, is_published=True)
+
+    try:
+        attempt = Attempt.objects.get(student=request.user, exam=exam, start_time__isnull=False)
+    except Attempt.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'No active attempt found'})
+
+    if attempt.is_submitted:
+        return JsonResponse({'success': False, 'error': 'Exam already submitted', 'ack': attempt.last_answer_seq})
+
+    if attempt.is_expired():
+        if attempt.finalize():
+            send_exam_completed_email(attempt)
+        return JsonResponse({'success': False, 'error': 'Exam time expired', 'ack': attempt.last_answer_seq})
+
+    try:
+        changes = json.loads(request.body).get('changes') or []
+        changes = [
+            (int(change['seq']), int(change['question_id']), int(change['choice_id']) if change.get('choice_id') else None)
+            for change in changes
+        ]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Malformed answer batch'}, status=400)
+
+    # Last write wins: keep only the newest change per question
+    latest = {}
+    for seq, question_id, choice_id in sorted(changes, key=lambda change: change[0]):
+        latest[question_id] = (seq, choice_id)
+
+    question_ids = {q['id'] for q in get_exam_snapshot(exam)['questions']}
+    choice_ids = [choice_id for _, choice_id in latest.values() if choice_id]
+    valid_choices = set(
+        Choice.objects.filter(id__in=choice_ids, question__exam=exam).values_list('id', 'question_id')
+    )
+
+    selections = {}
+    change_seqs = {}
+    rejected = []
+    for question_id, (seq, choice_id) in latest.items():
+        if question_id not in question_ids or (choice_id and (choice_id, question_id) not in valid_choices):
+            rejected.append(seq)
+            continue
+        selections[question_id] = choice_id
+        change_seqs[question_id] = seq
+
+    max_seq = max((seq for seq, _, _ in changes), default=0)
+    if answer_buffer.is_enabled():
+        try:
+            applied = answer_buffer.buffer_answers(attempt, selections, seq=max_seq, change_seqs=change_seqs)
+        except answer_buffer.BufferLockTimeout as exc:
+            # Nothing was recorded; the client keeps the batch and retries
+            return JsonResponse({'success': False, 'error': str(exc), 'ack': attempt.last_answer_seq}, status=503)
+    else:
+        applied = attempt.apply_answer_batch(selections, seq=max_seq, change_seqs=change_seqs)
+    if applied is None:
+        return JsonResponse({'success': False, 'error': 'Exam already submitted'})
+
+    ack, written = applied
+    return JsonResponse({'success': True, 'ack': ack, 'applied': written, 'rejected': sorted(rejected)})
+
+
 @require_POST
 @login_required
 def submit_exam(request, exam_id):
@@ -358,7 +539,7 @@ def submit_exam(request, exam_id):
     exam = get_object_or_404(Exam, id=exam_id, is_published=True)
 
     try:
-        attempt = Attempt.objects.get(student=request.user, exam=exam)
+        attempt = Attempt.objects.get(student=request.user, exam=exam, start_time__isnull=False)
     except Attempt.DoesNotExist:
         messages.error(request, 'No active attempt found. Please start the exam first.')
         return redirect('student:exam_detail', exam_id=exam.id)
@@ -367,10 +548,10 @@ def submit_exam(request, exam_id):
         messages.info(request, 'This exam has already been submitted.')
         return redirect('results:result_detail', attempt_id=attempt.id)
 
-    # Finalize attempt
-    attempt.is_submitted = True
-    attempt.end_time = timezone.now()
-    attempt.calculate_score()
+    # Finalize attempt; a concurrent double-submit loses the race and is a no-op
+    if not attempt.finalize():
+        messages.info(request, 'This exam has already been submitted.')
+        return redirect('results:result_detail', attempt_id=attempt.id)
     send_exam_completed_email(attempt)
 
     messages.success(request, 'Exam submitted successfully!')
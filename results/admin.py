@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import AttemptResult
 
-# Register your models here.
+
+@admin.register(AttemptResult)
+class AttemptResultAdmin(admin.ModelAdmin):
+    list_display = ('attempt', 'score', 'total_marks', 'percentage', 'passed', 'created_at')
+    list_filter = ('passed',)
+    search_fields = ('attempt__student__username', 'attempt__exam__title')
+    raw_id_fields = ('attempt', 'content')
+    readonly_fields = ('content', 'score', 'total_marks', 'correct_count', 'total_questions', 'percentage', 'passed', 'outcomes', 'created_at')
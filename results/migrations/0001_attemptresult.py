@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('attempts', '0006_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptResult',
+            fields=[
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='result', serialize=False, to='attempts.attempt')),
+                ('score', models.PositiveIntegerField(default=0)),
+                ('total_marks', models.PositiveIntegerField(default=0)),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('total_questions', models.PositiveIntegerField(default=0)),
+                ('percentage', models.FloatField(default=0)),
+                ('passed', models.BooleanField(default=False)),
+                ('outcomes', models.JSONField(default=list, help_text='One entry per question: the question, selected and correct option')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
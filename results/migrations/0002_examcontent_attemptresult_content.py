@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-17 23:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_results(apps, schema_editor):
+    # Results with full-text outcomes are rebuilt on their next view by AttemptResult.for_attempt
+    apps.get_model('results', 'AttemptResult').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0013_hot_query_indexes'),
+        ('results', '0001_attemptresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_version', models.PositiveIntegerField()),
+                ('questions', models.JSONField(default=list, help_text='Questions in order, each with its options and correct option id')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='frozen_contents', to='exams.exam')),
+            ],
+            options={
+                'unique_together': {('exam', 'content_version')},
+            },
+        ),
+        migrations.RunPython(drop_results, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='attemptresult',
+            name='content',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='results.examcontent'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='attemptresult',
+            name='outcomes',
+            field=models.JSONField(default=list, help_text='One entry per question: question id, selected and correct option ids, is_correct'),
+        ),
+    ]
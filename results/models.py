@@ -1,3 +1,199 @@
+from django.core.files.storage import default_storage
 from django.db import models
+from django.db.models import F, Q
+from attempts.models import Attempt, Answer
+from exams.models import Exam, Question, Choice
 
-# Create your models here.
+PASS_PERCENTAGE = 60
+
+
+class ExamContent(models.Model):
+    """One frozen copy of an exam's questions and options per content version.
+
+    Results point at the copy that was current when they were captured, so
+    each result stores ids only and later edits to the exam do not rewrite
+    past results.
+    """
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='frozen_contents')
+    content_version = models.PositiveIntegerField()
+    questions = models.JSONField(default=list, help_text="Questions in order, each with its options and correct option id")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('exam', 'content_version')
+
+    def __str__(self):
+        return f"Content of exam {self.exam_id} v{self.content_version}"
+
+    @classmethod
+    def current_for_exams(cls, exam_ids):
+        """Return ``{exam_id: ExamContent}`` for the exams' current versions.
+
+        One joined read when every version is already frozen; otherwise the
+        missing ones are built from two reads and stored with one INSERT.
+        """
+        found = {
+            content.exam_id: content
+            for content in cls.objects.filter(exam_id__in=exam_ids, content_version=F('exam__content_version'))
+        }
+        missing = set(exam_ids) - set(found)
+        if not missing:
+            return found
+
+        # Versions are read before the content, so a concurrent edit can only
+        # label newer content with the older version, never the reverse
+        versions = dict(Exam.objects.filter(id__in=missing).values_list('id', 'content_version'))
+        questions = {}
+        by_id = {}
+        for row in (
+            Question.objects.filter(exam_id__in=missing)
+            .order_by('id')
+            .values('id', 'exam_id', 'text', 'image', 'explanation', 'marks')
+        ):
+            question = dict(row, choices=[], correct_choice_id=None)
+            questions.setdefault(question.pop('exam_id'), []).append(question)
+            by_id[question['id']] = question
+        for choice_id, question_id, text, is_correct in (
+            Choice.objects.filter(question__exam_id__in=missing)
+            .order_by('question_id', 'id')
+            .values_list('id', 'question_id', 'text', 'is_correct')
+        ):
+            question = by_id[question_id]
+            question['choices'].append({'id': choice_id, 'text': text})
+            # Lowest correct id wins, like Question.get_correct_choice()
+            if is_correct and question['correct_choice_id'] is None:
+                question['correct_choice_id'] = choice_id
+
+        # A racing capture may have frozen the same version already
+        cls.objects.bulk_create(
+            [
+                cls(exam_id=exam_id, content_version=version, questions=questions.get(exam_id, []))
+                for exam_id, version in versions.items()
+            ],
+            ignore_conflicts=True,
+        )
+        stored = Q()
+        for exam_id, version in versions.items():
+            stored |= Q(exam_id=exam_id, content_version=version)
+        if versions:
+            found.update((content.exam_id, content) for content in cls.objects.filter(stored))
+        return found
+
+
+class AttemptResult(models.Model):
+    """Frozen outcome of a submitted attempt, written once at finalization.
+
+    Everything the result page and the completion email show is stored in
+    this row and the exam content copy it points at. Outcomes hold ids only;
+    question and option texts come from the shared ``ExamContent`` copy, so
+    reading a result never touches questions, choices or answers and later
+    edits to the exam do not rewrite past results.
+    """
+    attempt = models.OneToOneField(Attempt, on_delete=models.CASCADE, primary_key=True, related_name='result')
+    content = models.ForeignKey(ExamContent, on_delete=models.CASCADE, related_name='results')
+    score = models.PositiveIntegerField(default=0)
+    total_marks = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    total_questions = models.PositiveIntegerField(default=0)
+    percentage = models.FloatField(default=0)
+    passed = models.BooleanField(default=False)
+    outcomes = models.JSONField(default=list, help_text="One entry per question: question id, selected and correct option ids, is_correct")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Result of {self.attempt_id}: {self.score}/{self.total_marks}"
+
+    @property
+    def wrong_count(self):
+        return self.total_questions - self.correct_count
+
+    def question_results(self):
+        """Outcomes joined to the frozen question and option texts, with image URLs"""
+        questions = {question['id']: question for question in self.content.questions}
+        results = []
+        for outcome in self.outcomes:
+            question = questions[outcome['question_id']]
+            choices = {choice['id']: choice for choice in question['choices']}
+            image = question['image']
+            results.append({
+                'question': dict(question, image_url=default_storage.url(image) if image else ''),
+                'selected_choice': choices.get(outcome['selected_choice_id']),
+                'correct_choice': choices.get(outcome['correct_choice_id']),
+                'is_correct': outcome['is_correct'],
+            })
+        return results
+
+    @classmethod
+    def capture(cls, attempts, replace=False):
+        """Build and store the snapshots of submitted ``attempts``.
+
+        Reads the frozen exam contents (one query once frozen) and the
+        answers for the whole batch, then runs one INSERT. Existing snapshots
+        are kept unless ``replace`` is set, which is only done when an
+        attempt is explicitly re-scored. The stored result is attached to
+        each attempt as ``attempt.result``.
+        """
+        attempts = [attempt for attempt in attempts if attempt.is_submitted]
+        if not attempts:
+            return []
+        contents = ExamContent.current_for_exams({attempt.exam_id for attempt in attempts})
+
+        selected = {}
+        for attempt_id, question_id, choice_id, is_correct in (
+            Answer.objects.filter(attempt__in=attempts, selected_choice__isnull=False)
+            .values_list('attempt_id', 'question_id', 'selected_choice_id', 'selected_choice__is_correct')
+        ):
+            selected[attempt_id, question_id] = (choice_id, is_correct)
+
+        results = []
+        for attempt in attempts:
+            content = contents[attempt.exam_id]
+            outcomes = []
+            for question in content.questions:
+                choice_id, is_correct = selected.get((attempt.pk, question['id']), (None, False))
+                outcomes.append({
+                    'question_id': question['id'],
+                    'selected_choice_id': choice_id,
+                    'correct_choice_id': question['correct_choice_id'],
+                    'is_correct': is_correct,
+                })
+            total_marks = sum(question['marks'] for question in content.questions)
+            percentage = round(attempt.score / total_marks * 100, 2) if total_marks else 0
+            results.append(cls(
+                attempt=attempt,
+                content=content,
+                score=attempt.score,
+                total_marks=total_marks,
+                correct_count=attempt.correct_count,
+                total_questions=len(content.questions),
+                percentage=percentage,
+                passed=percentage >= PASS_PERCENTAGE,
+                outcomes=outcomes,
+            ))
+
+        if replace:
+            cls.objects.bulk_create(
+                results,
+                update_conflicts=True,
+                unique_fields=['attempt'],
+                # created_at doubles as the snapshot's version stamp for conditional GET
+                update_fields=['content', 'score', 'total_marks', 'correct_count', 'total_questions', 'percentage', 'passed', 'outcomes', 'created_at'],
+            )
+        else:
+            # A racing finalizer may have stored the same snapshot already
+            cls.objects.bulk_create(results, ignore_conflicts=True)
+        for result in results:
+            result.attempt.result = result
+        return results
+
+    @classmethod
+    def for_attempt(cls, attempt):
+        """Return the attempt's snapshot, building it for attempts submitted before snapshots existed"""
+        try:
+            return attempt.result
+        except cls.DoesNotExist:
+            pass
+        if not attempt.is_submitted:
+            return None
+        cls.capture([attempt])
+        return attempt.result
@@ -4,7 +4,9 @@ from django.utils import timezone
 from django.urls import reverse
 
 from exams.models import Exam, Question, Choice
+from attempts.expiry import finalize_expired_attempts
 from attempts.models import Attempt, Answer
+from .models import AttemptResult, ExamContent
 
 
 class ResultViewTests(TestCase):
@@ -49,3 +51,129 @@ class ResultViewTests(TestCase):
 		self.assertContains(response, "Result Test")
 		self.assertContains(response, "Q1")
 
+
+
+class AttemptResultSnapshotTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username="snap", password="test123", email="snap@example.com")
+		now = timezone.now()
+		self.exam = Exam.objects.create(
+			title="Snapshot Test",
+			description="",
+			duration_minutes=10,
+			start_time=now - timezone.timedelta(minutes=5),
+			end_time=now + timezone.timedelta(minutes=5),
+			is_published=True,
+		)
+		self.questions = []
+		self.correct = []
+		for index in range(3):
+			question = Question.objects.create(exam=self.exam, text=f"Question {index}", marks=index + 1)
+			self.correct.append(Choice.objects.create(question=question, text=f"Right {index}", is_correct=True))
+			Choice.objects.create(question=question, text=f"Wrong {index}", is_correct=False)
+			self.questions.append(question)
+		self.attempt = Attempt.start(self.user, self.exam)
+		Answer.objects.filter(attempt=self.attempt, question=self.questions[0]).update(selected_choice=self.correct[0])
+		Answer.objects.filter(attempt=self.attempt, question=self.questions[2]).update(selected_choice=self.correct[2])
+
+	def test_finalize_stores_snapshot(self):
+		self.assertTrue(self.attempt.finalize())
+
+		result = AttemptResult.objects.get(attempt=self.attempt)
+		self.assertEqual(result.score, 4)
+		self.assertEqual(result.total_marks, 6)
+		self.assertEqual(result.correct_count, 2)
+		self.assertEqual(result.total_questions, 3)
+		self.assertEqual(result.percentage, 66.67)
+		self.assertTrue(result.passed)
+		self.assertEqual([outcome['is_correct'] for outcome in result.outcomes], [True, False, True])
+		self.assertEqual(result.outcomes[1], {
+			'question_id': self.questions[1].id,
+			'selected_choice_id': None,
+			'correct_choice_id': self.correct[1].id,
+			'is_correct': False,
+		})
+		self.assertEqual(result.question_results()[1]['correct_choice']['text'], "Right 1")
+
+	def test_snapshot_is_not_rewritten_by_later_edits(self):
+		self.attempt.finalize()
+		self.questions[0].text = "Edited"
+		self.questions[0].save()
+		self.assertFalse(self.attempt.finalize())
+
+		result = AttemptResult.objects.get(attempt=self.attempt)
+		self.assertEqual(result.question_results()[0]['question']['text'], "Question 0")
+
+	def test_results_share_one_content_copy_per_version(self):
+		other = User.objects.create_user(username="other", password="test123")
+		second = Attempt.start(other, self.exam)
+		self.attempt.finalize()
+		Attempt.objects.filter(pk=second.pk).update(is_submitted=True, end_time=timezone.now())
+		second.refresh_from_db()
+
+		# frozen content, answers, insert
+		with self.assertNumQueries(3):
+			AttemptResult.capture([second])
+		self.assertEqual(ExamContent.objects.filter(exam=self.exam).count(), 1)
+		self.assertEqual(
+			AttemptResult.objects.get(attempt=self.attempt).content_id,
+			AttemptResult.objects.get(attempt=second).content_id,
+		)
+
+		self.questions[0].text = "Edited"
+		self.questions[0].save()
+		self.attempt.calculate_score()
+		self.assertEqual(ExamContent.objects.filter(exam=self.exam).count(), 2)
+		self.assertEqual(AttemptResult.objects.get(attempt=self.attempt).question_results()[0]['question']['text'], "Edited")
+		self.assertEqual(AttemptResult.objects.get(attempt=second).question_results()[0]['question']['text'], "Question 0")
+
+	def test_result_page_reads_only_the_snapshot(self):
+		self.attempt.finalize()
+		self.client.login(username="snap", password="test123")
+		url = reverse('results:result_detail', args=[self.attempt.id])
+
+		# session, user, conditional GET stamp, attempt joined to exam and result
+		with self.assertNumQueries(4):
+			response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+		self.assertContains(response, "Right 1")
+		self.assertEqual(response.context['percentage'], 66.67)
+		self.assertEqual(response.context['correct_answers'], 2)
+
+	def test_missing_snapshot_is_built_on_first_view(self):
+		Attempt.objects.filter(pk=self.attempt.pk).update(is_submitted=True, end_time=timezone.now(), score=4, correct_count=2)
+		self.client.login(username="snap", password="test123")
+
+		response = self.client.get(reverse('results:result_detail', args=[self.attempt.id]))
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(AttemptResult.objects.filter(attempt=self.attempt).exists())
+
+	def test_expiry_sweeper_stores_snapshots(self):
+		Attempt.objects.filter(pk=self.attempt.pk).update(deadline=timezone.now() - timezone.timedelta(seconds=1))
+
+		self.assertEqual(finalize_expired_attempts(send_emails=False), (1, 1))
+		self.assertEqual(AttemptResult.objects.get(attempt=self.attempt).score, 4)
+
+	def test_rescoring_replaces_snapshot(self):
+		self.attempt.finalize()
+		Answer.objects.filter(attempt=self.attempt, question=self.questions[1]).update(selected_choice=self.correct[1])
+
+		self.attempt.calculate_score()
+		result = AttemptResult.objects.get(attempt=self.attempt)
+		self.assertEqual(result.score, 6)
+		self.assertEqual(result.correct_count, 3)
+
+	def test_result_page_not_modified_until_rescored(self):
+		self.attempt.finalize()
+		self.client.login(username="snap", password="test123")
+		url = reverse('results:result_detail', args=[self.attempt.id])
+		etag = self.client.get(url)['ETag']
+
+		# session, user, result stamp
+		with self.assertNumQueries(3):
+			response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 304)
+
+		Answer.objects.filter(attempt=self.attempt, question=self.questions[1]).update(selected_choice=self.correct[1])
+		self.attempt.calculate_score()
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -1,50 +1,49 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from attempts.models import Attempt
+from exams.conditional import conditional_page
+from .models import AttemptResult
+
+
+def _result_stamp(request, attempt_id):
+    """Version of a submitted result page: one indexed lookup, no answers or questions"""
+    row = (
+        Attempt.objects.filter(id=attempt_id, student=request.user, is_submitted=True)
+        .values_list('end_time', 'result__created_at', 'exam__updated_at')
+        .first()
+    )
+    if row is None:
+        return None
+    # end_time, snapshot (re)build time, exam row edit time
+    return row, max(stamp for stamp in row if stamp is not None)
 
 
 @login_required
+@conditional_page(_result_stamp)
 def result_detail(request, attempt_id):
-    """Show exam results to student"""
-    attempt = get_object_or_404(Attempt, id=attempt_id, student=request.user)
+    """Show exam results to student, read from the attempt's stored snapshot"""
+    attempt = get_object_or_404(
+        Attempt.objects.select_related('exam', 'result__content'),
+        id=attempt_id,
+        student=request.user,
+    )
     
     if not attempt.is_submitted:
         # If somehow they access this without submitting, redirect to exam
         from django.shortcuts import redirect
         return redirect('student:take_exam', exam_id=attempt.exam.id)
     
-    # Calculate statistics
-    total_questions = attempt.exam.total_questions()
-    total_marks = attempt.exam.total_marks()
-    correct_answers = 0
-    question_results = []
-
-    for answer in attempt.answers.select_related('question', 'selected_choice'):
-        is_correct = bool(answer.selected_choice and answer.selected_choice.is_correct)
-        if is_correct:
-            correct_answers += 1
-
-        question = answer.question
-        correct_choice = question.get_correct_choice()
-
-        question_results.append({
-            'question': question,
-            'selected_choice': answer.selected_choice,
-            'correct_choice': correct_choice,
-            'is_correct': is_correct,
-        })
-    
-    percentage = (attempt.score / total_marks * 100) if total_marks > 0 else 0
-    passed = percentage >= 60  # 60% pass criteria
+    result = AttemptResult.for_attempt(attempt)
     
     context = {
         'attempt': attempt,
-        'total_questions': total_questions,
-        'correct_answers': correct_answers,
-        'total_marks': total_marks,
-        'percentage': round(percentage, 2),
-        'passed': passed,
-        'question_results': question_results,
+        'result': result,
+        'total_questions': result.total_questions,
+        'correct_answers': result.correct_count,
+        'total_marks': result.total_marks,
+        'percentage': result.percentage,
+        'passed': result.passed,
+        'question_results': result.question_results(),
     }
     
     return render(request, 'results/result_detail.html', context)